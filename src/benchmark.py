@@ -0,0 +1,236 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Load generation benchmark of the Temporal cluster.
+
+The `run-benchmark` action runs a worker for a lightweight workflow and
+starts as many of them as it can for a set duration, with a bounded number
+in flight, then reports the throughput and start-to-complete latencies. The
+worker and the load generator run in the charm, next to the server, so that
+shard counts and pool settings can be compared on the same hardware. The
+action holds the hooks of the unit while it runs, so its duration is bounded.
+"""
+
+# The Temporal SDK is slow to import and only needed by the action, so it is
+# imported where it is used.
+# pylint: disable=import-outside-toplevel
+
+import asyncio
+import collections
+import logging
+import math
+import time
+import uuid
+from datetime import timedelta
+
+from ops import framework
+
+from literals import SERVICE_PORTS
+from log import log_event_handler
+
+logger = logging.getLogger(__name__)
+
+# Longest benchmark, the hooks of the unit wait for the action to complete.
+MAX_DURATION_SECONDS = 300
+
+# Time given to the workflows in flight to complete once the duration elapsed,
+# those that did not are counted as timed out.
+DRAIN_SECONDS = 30
+
+
+def percentile(sorted_values, percent):
+    """Return a percentile of sorted values, by the nearest-rank method.
+
+    Args:
+        sorted_values: values in ascending order.
+        percent: the percentile, e.g. 95.
+
+    Returns:
+        The percentile, or 0 if there are no values.
+    """
+    if not sorted_values:
+        return 0
+    return sorted_values[max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)]
+
+
+def benchmark_stats(latencies, errors, elapsed):
+    """Summarize the results of a benchmark.
+
+    Args:
+        latencies: start-to-complete latencies of the completed workflows, in seconds.
+        errors: counter of the failed workflows by error type.
+        elapsed: duration of the benchmark, in seconds.
+
+    Returns:
+        Dict of the action results.
+    """
+    latencies = sorted(latencies)
+    stats = {
+        "completed": len(latencies),
+        "errors": sum(errors.values()),
+        "throughput": f"{len(latencies) / elapsed:.2f}" if elapsed else "0.00",
+        **{f"p{percent}-ms": round(percentile(latencies, percent) * 1000) for percent in (50, 95, 99)},
+        "elapsed-seconds": f"{elapsed:.1f}",
+    }
+    if errors:
+        stats["error-types"] = ", ".join(f"{error}={count}" for error, count in sorted(errors.items()))
+    return stats
+
+
+async def run_benchmark(address, namespace, tls, duration, concurrency, workflows, activities):
+    """Run the benchmark workflows against a cluster.
+
+    Workflows are started for `duration` seconds, and those still in flight
+    `DRAIN_SECONDS` later are counted as timed out.
+
+    Args:
+        address: frontend address of the cluster.
+        namespace: namespace to run the workflows in.
+        tls: whether to connect to the frontend over TLS.
+        duration: seconds during which workflows are started.
+        concurrency: maximum number of workflows in flight.
+        workflows: maximum number of workflows to run, unbounded if 0.
+        activities: number of activities run by each workflow.
+
+    Returns:
+        The start-to-complete latencies of the completed workflows, the
+        counter of the failed ones by error type, and the elapsed seconds.
+
+    Raises:
+        ValueError: if the cluster could not be reached or rejected the worker.
+    """
+    from temporalio.service import RPCError
+
+    try:
+        return await _run_workflows(address, namespace, tls, duration, concurrency, workflows, activities)
+    except (RuntimeError, RPCError) as err:
+        # RuntimeError is raised when the cluster cannot be reached, and
+        # RPCError when it rejects the worker, e.g. for an unknown namespace.
+        raise ValueError(f"failed to run the benchmark against {address}: {err}") from err
+
+
+async def _run_workflows(address, namespace, tls, duration, concurrency, workflows, activities):
+    """Run the benchmark workflows against a cluster, see `run_benchmark`.
+
+    Args:
+        address: frontend address of the cluster.
+        namespace: namespace to run the workflows in.
+        tls: whether to connect to the frontend over TLS.
+        duration: seconds during which workflows are started.
+        concurrency: maximum number of workflows in flight.
+        workflows: maximum number of workflows to run, unbounded if 0.
+        activities: number of activities run by each workflow.
+
+    Returns:
+        The start-to-complete latencies of the completed workflows, the
+        counter of the failed ones by error type, and the elapsed seconds.
+    """
+    from temporalio.client import Client
+    from temporalio.worker import UnsandboxedWorkflowRunner, Worker
+
+    from benchmark_workflows import BenchmarkWorkflow, noop
+
+    client = await Client.connect(address, namespace=namespace, tls=tls)
+    task_queue = f"charm-benchmark-{uuid.uuid4()}"
+    latencies = []
+    errors = collections.Counter()
+    started = 0
+    in_flight = 0
+
+    async def generate(deadline):
+        nonlocal started, in_flight
+        while time.monotonic() < deadline and (not workflows or started < workflows):
+            started += 1
+            in_flight += 1
+            start = time.monotonic()
+            try:
+                await client.execute_workflow(
+                    BenchmarkWorkflow.run,
+                    activities,
+                    id=f"{task_queue}-{started}",
+                    task_queue=task_queue,
+                    execution_timeout=timedelta(seconds=duration + DRAIN_SECONDS),
+                )
+            except Exception as err:  # pylint: disable=broad-except
+                # Failures are part of the results, whatever their cause.
+                errors[type(err).__name__] += 1
+            else:
+                latencies.append(time.monotonic() - start)
+            finally:
+                in_flight -= 1
+
+    # The workflow sandbox would add its own overhead to the measurements.
+    async with Worker(
+        client,
+        task_queue=task_queue,
+        workflows=[BenchmarkWorkflow],
+        activities=[noop],
+        workflow_runner=UnsandboxedWorkflowRunner(),
+    ):
+        start = time.monotonic()
+        deadline = start + duration
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(generate(deadline) for _ in range(concurrency))),
+                timeout=duration + DRAIN_SECONDS,
+            )
+        except asyncio.TimeoutError:
+            errors["TimeoutError"] += in_flight
+        elapsed = min(time.monotonic(), deadline + DRAIN_SECONDS) - start
+
+    return latencies, errors, elapsed
+
+
+class Benchmark(framework.Object):
+    """Action benchmarking the Temporal cluster."""
+
+    def __init__(self, charm):
+        """Construct.
+
+        Args:
+            charm: The charm to attach the hooks to.
+        """
+        super().__init__(charm, "benchmark")
+        self.charm = charm
+        charm.framework.observe(charm.on.run_benchmark_action, self._on_run_benchmark_action)
+
+    @log_event_handler(logger)
+    def _on_run_benchmark_action(self, event):
+        """Run the benchmark and report its results.
+
+        Args:
+            event: The event triggered when the action is performed.
+        """
+        params = event.params
+        for param in ("duration", "concurrency", "activities"):
+            if params[param] < 1:
+                event.fail(f"{param} must be >= 1")
+                return
+        if params["duration"] > MAX_DURATION_SECONDS:
+            event.fail(f"duration must be <= {MAX_DURATION_SECONDS}")
+            return
+        if params["workflows"] < 0:
+            event.fail("workflows must be >= 0")
+            return
+
+        address = params.get("address") or f"{self.charm.app.name}:{SERVICE_PORTS['frontend']['grpc']}"
+        event.log(f"running benchmark workflows against {address} for {params['duration']}s")
+        try:
+            latencies, errors, elapsed = asyncio.run(
+                run_benchmark(
+                    address,
+                    params["namespace"],
+                    params["tls"],
+                    params["duration"],
+                    params["concurrency"],
+                    params["workflows"],
+                    params["activities"],
+                )
+            )
+        except ValueError as err:
+            event.fail(str(err))
+            return
+
+        results = benchmark_stats(latencies, errors, elapsed)
+        logger.info("benchmark results: %s", results)
+        event.set_results(results)
@@ -0,0 +1,28 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Workflow and activity run by the `run-benchmark` action."""
+
+from datetime import timedelta
+
+from temporalio import activity, workflow
+
+
+@activity.defn
+async def noop() -> None:
+    """Complete at once, so that only the server is measured."""
+
+
+@workflow.defn
+class BenchmarkWorkflow:
+    """Lightweight workflow running a number of no-op activities in sequence."""
+
+    @workflow.run
+    async def run(self, activities: int) -> None:
+        """Workflow execution method.
+
+        Args:
+            activities: number of activities to run.
+        """
+        for _ in range(activities):
+            await workflow.execute_activity(noop, start_to_close_timeout=timedelta(seconds=30))
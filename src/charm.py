@@ -11,9 +11,13 @@ import logging
 import os
 import re
 import socket
+import time
 from typing import Optional
 
-from charms.data_platform_libs.v0.data_interfaces import DatabaseRequires
+from charms.data_platform_libs.v0.data_interfaces import (
+    DatabaseRequires,
+    OpenSearchRequires,
+)
 from charms.data_platform_libs.v0.s3 import S3Requirer
 from charms.grafana_k8s.v0.grafana_dashboard import GrafanaDashboardProvider
 from charms.loki_k8s.v1.loki_push_api import LogForwarder
@@ -33,71 +37,143 @@ from charms.traefik_k8s.v2.ingress import (
     IngressPerAppRequirer,
     IngressPerAppRevokedEvent,
 )
-from jinja2 import Environment, FileSystemLoader
 from ops import EventBase, main, pebble
 from ops.charm import CharmBase, RelationBrokenEvent
-from ops.model import ActiveStatus, BlockedStatus, MaintenanceStatus, WaitingStatus
+from ops.framework import StoredState
+from ops.model import (
+    ActiveStatus,
+    BlockedStatus,
+    MaintenanceStatus,
+    ModelError,
+    WaitingStatus,
+)
 from ops.pebble import CheckStatus
 
+from benchmark import Benchmark
+from connection_budget import budget_context, connection_budget
+from digest import changed_inputs, fingerprint
+from dynamic_config import (
+    DEFAULT_TASK_QUEUE_PARTITIONS,
+    dynamic_config_context,
+    parse_task_queue_partitions,
+    plan_task_queue_partitions,
+)
+from go_runtime import (
+    CGROUP_CPU_FILES,
+    CGROUP_CPU_PERIOD_V1_FILE,
+    CGROUP_MEMORY_FILES,
+    go_runtime_env,
+    parse_cpu_limit,
+    parse_memory_limit,
+    validate_go_runtime_options,
+)
+from k8s_resources import (
+    RESOURCE_OPTIONS,
+    patch_container_resources,
+    resource_requirements,
+)
 from literals import (
     DB_NAME,
+    DYNAMIC_CONFIG_OPTIONS,
+    FAILOVER_VERSION_INCREMENT,
+    MIN_DYNAMIC_CONFIG_POLL_INTERVAL_SECONDS,
+    OPENSEARCH_CA_PATH,
+    OPENSEARCH_RELATION_NAME,
+    OPENSEARCH_VISIBILITY_INDEX,
     PROMETHEUS_PORT,
     REQUIRED_OPENFGA_KEYS,
     REQUIRED_S3_PARAMETERS,
     SERVICE_PORTS,
+    VALID_ADVANCED_VISIBILITY_MODES,
     VALID_LOG_LEVELS,
+    VALID_POOLER_MODES,
+    VALID_VISIBILITY_MIGRATION_MODES,
     VISIBILITY_DB_NAME,
+    VISIBILITY_TARGET_DB_NAME,
+    VISIBILITY_TARGET_RELATION_NAME,
     WORKLOAD_VERSION,
     ValidServiceTypes,
 )
-from log import log_event_handler
+from log import ProfiledContainer, log_event_handler
 
 # import relations
+from pprof import Pprof
 from relations.admin import Admin
 from relations.openfga import OpenFGA
+from relations.opensearch import OpenSearch
 from relations.postgresql import Postgresql
 from relations.s3_archival import S3Integrator
 from relations.ui import UI
-from state import State
+from rendering import render
+from shard_migration import ShardMigration
+from shard_planner import (
+    is_power_of_two,
+    plan_history_shards,
+    shards_per_history_unit_warning,
+)
+from state import TransactionalState
 
 CERTIFICATE_NAME = "temporal-frontend.pem"
 CERTS_DIR_PATH = "/etc/temporal"
+# The server reads the frontend certificate and key through a symlink to the
+# directory of the current pair, which is swapped in one rename.
+FRONTEND_TLS_DIR_PATH = f"{CERTS_DIR_PATH}/frontend-tls"
 FRONTEND_CERTIFICATES_RELATION_NAME = "frontend-certificates"
 PRIVATE_KEY_NAME = "temporal-frontend.key"
 FRONTEND_TLS_CONFIGURATION = {
     "TEMPORAL_TLS_REQUIRE_CLIENT_AUTH": "false",
-    "TEMPORAL_TLS_FRONTEND_CERT": f"{CERTS_DIR_PATH}/{CERTIFICATE_NAME}",
-    "TEMPORAL_TLS_FRONTEND_KEY": f"{CERTS_DIR_PATH}/{PRIVATE_KEY_NAME}",
+    "TEMPORAL_TLS_FRONTEND_CERT": f"{FRONTEND_TLS_DIR_PATH}/{CERTIFICATE_NAME}",
+    "TEMPORAL_TLS_FRONTEND_KEY": f"{FRONTEND_TLS_DIR_PATH}/{PRIVATE_KEY_NAME}",
+}
+TLS_DURATION_OPTIONS = {
+    "tls-refresh-interval": "TEMPORAL_TLS_REFRESH_INTERVAL",
+    "tls-expiration-warning-window": "TEMPORAL_TLS_EXPIRATION_CHECKS_WARNING_WINDOW",
+    "tls-expiration-error-window": "TEMPORAL_TLS_EXPIRATION_CHECKS_ERROR_WINDOW",
+    "tls-expiration-check-interval": "TEMPORAL_TLS_EXPIRATION_CHECKS_CHECK_INTERVAL",
 }
 logger = logging.getLogger(__name__)
 
 
-def render(template_name, context):
-    """Render the template with the given name using the given context dict.
+def is_valid_time_duration(duration_str):
+    """Validate time duration.
 
     Args:
-        template_name: File name to read the template from.
-        context: Dict used for rendering.
+        duration_str: time duration string.
 
     Returns:
-        A dict containing the rendered template.
+        True if the time duration is valid, False otherwise.
     """
-    charm_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
-    loader = FileSystemLoader(os.path.join(charm_dir, "templates"))
-    return Environment(loader=loader, autoescape=True).get_template(template_name).render(**context)
+    allowed_pattern = r"^[1-9]\d*[smh]$"
+    return bool(re.match(allowed_pattern, duration_str))
 
 
-def is_valid_time_duration(duration_str):
-    """Validate time duration.
+def time_duration_seconds(duration_str):
+    """Convert a valid time duration to seconds.
 
     Args:
-        duration_str: time duration string.
+        duration_str: time duration string, see `is_valid_time_duration`.
 
     Returns:
-        True if the time duration is valid, False otherwise.
+        The duration in seconds.
     """
-    allowed_pattern = r"^[1-9]\d*[smh]$"
-    return bool(re.match(allowed_pattern, duration_str))
+    return int(duration_str[:-1]) * {"s": 1, "m": 60, "h": 3600}[duration_str[-1]]
+
+
+def format_elapsed_time(seconds):
+    """Format an elapsed time for the unit status.
+
+    Args:
+        seconds: elapsed time in seconds.
+
+    Returns:
+        The elapsed time in its two largest units, e.g. `2d3h` or `5m`.
+    """
+    minutes, hours, days = seconds // 60 % 60, seconds // 3600 % 24, seconds // 86400
+    if days:
+        return f"{days}d{hours}h"
+    if hours:
+        return f"{hours}h{minutes}m"
+    return f"{minutes}m"
 
 
 class TemporalK8SCharm(CharmBase):
@@ -105,13 +181,22 @@ class TemporalK8SCharm(CharmBase):
 
     Attrs:
         _state: used to store data that is persisted across invocations.
+        _stored: unit-local data that is persisted across invocations.
         external_hostname: DNS listing used for external connections.
     """
 
+    _stored = StoredState()
+
     def set_active_unit_status(self):
         """Set active unit status depending on relations."""
-        message = "auth enabled" if self.config["auth-enabled"] else ""
-        self.unit.status = ActiveStatus(message)
+        messages = ["auth enabled"] if self.config["auth-enabled"] else []
+        migration = self._state.visibility_migration if self._state.is_ready() else None
+        if migration and migration["mode"] == "complete":
+            messages.append("visibility migration: complete")
+        elif migration:
+            elapsed = format_elapsed_time(int(time.time()) - migration["since"])
+            messages.append(f"visibility migration: {migration['mode']} for {elapsed}")
+        self.unit.status = ActiveStatus(", ".join(messages))
 
     @property
     def external_hostname(self):
@@ -125,20 +210,32 @@ class TemporalK8SCharm(CharmBase):
             args: Ignore.
         """
         super().__init__(*args)
-        self._state = State(self.app, lambda: self.model.get_relation("peer"))
+        self._state = TransactionalState(self.app, lambda: self.model.get_relation("peer"))
+        self._stored.set_default(applied_digests={}, certificate_request={}, certificate_digests={}, cgroup_limits={})
         self.name = "temporal"
-        self.container = self.unit.get_container("temporal")
+        self.container = ProfiledContainer(self.unit.get_container("temporal"))
         self._extra_context = {}
         self._dns_entries = [
             dns.strip() for dns in self.config.get("frontend-cert-sans-dns", "").split(",") if dns.strip()
         ]
 
+        # Write the peer relation state once, at the end of the hook.
+        self.framework.observe(self.framework.on.pre_commit, self._on_pre_commit)
+
         # Handle basic charm lifecycle.
         self.framework.observe(self.on.install, self._on_install)
         self.framework.observe(self.on.temporal_pebble_ready, self._on_temporal_pebble_ready)
         self.framework.observe(self.on.config_changed, self._on_config_changed)
+        self.framework.observe(self.on.upgrade_charm, self._on_upgrade_charm)
         self.framework.observe(self.on.restart_action, self._on_restart_action)
+        self.framework.observe(self.on.set_task_queue_partitions_action, self._on_set_task_queue_partitions_action)
+        self.framework.observe(self.on.plan_history_shards_action, self._on_plan_history_shards_action)
+        self.shard_migration = ShardMigration(self)
+        self.pprof = Pprof(self)
+        self.benchmark = Benchmark(self)
         self.framework.observe(self.on.peer_relation_changed, self._on_peer_relation_changed)
+        self.framework.observe(self.on.peer_relation_joined, self._on_peer_units_changed)
+        self.framework.observe(self.on.peer_relation_departed, self._on_peer_units_changed)
         self.framework.observe(self.on.update_status, self._on_update_status)
 
         # Handle postgresql relation.
@@ -149,43 +246,65 @@ class TemporalK8SCharm(CharmBase):
             database_name=VISIBILITY_DB_NAME,
             extra_user_roles="admin",
         )
+        self.visibility_target = DatabaseRequires(
+            self,
+            relation_name=VISIBILITY_TARGET_RELATION_NAME,
+            database_name=VISIBILITY_TARGET_DB_NAME,
+            extra_user_roles="admin",
+        )
         self.postgresql = Postgresql(self)
 
         # Handle admin and ui relations.
         self.admin = Admin(self)
         self.ui = UI(self)
 
+        # The libraries of optional relations below are only constructed when
+        # the relation exists or the hook is about it, so that the hooks of
+        # units without them do not pay for their setup.
+
         # Handle openfga relation
-        self.openfga = OpenFGARequires(self, self.name)
+        self.openfga = OpenFGARequires(self, self.name) if self._relation_in_scope("openfga") else None
         self.openfga_relation = OpenFGA(self)
 
         # Handle S3 integrator relation
-        self.s3_client = S3Requirer(self, "s3-parameters")
+        self.s3_client = S3Requirer(self, "s3-parameters") if self._relation_in_scope("s3-parameters") else None
         self.s3_relation = S3Integrator(self)
 
+        # Handle OpenSearch relation
+        self.opensearch = None
+        if self._relation_in_scope(OPENSEARCH_RELATION_NAME):
+            self.opensearch = OpenSearchRequires(self, OPENSEARCH_RELATION_NAME, index=OPENSEARCH_VISIBILITY_INDEX)
+        self.opensearch_relation = OpenSearch(self)
+
         # Handle Ingress (Nginx)
         self._require_nginx_route()
 
         # Prometheus
-        self._prometheus_scraping = MetricsEndpointProvider(
-            self,
-            relation_name="metrics-endpoint",
-            jobs=[{"static_configs": [{"targets": [f"*:{PROMETHEUS_PORT}"]}]}],
-            refresh_event=self.on.config_changed,
-        )
+        self._prometheus_scraping = None
+        if self._relation_in_scope("metrics-endpoint"):
+            self._prometheus_scraping = MetricsEndpointProvider(
+                self,
+                relation_name="metrics-endpoint",
+                jobs=[{"static_configs": [{"targets": [f"*:{PROMETHEUS_PORT}"]}]}],
+                refresh_event=self.on.config_changed,
+            )
 
         # Loki
-        self._log_forwarder = LogForwarder(self, relation_name="logging")
+        self._log_forwarder = None
+        if self._relation_in_scope("logging"):
+            self._log_forwarder = LogForwarder(self, relation_name="logging")
 
         # Grafana
-        self._grafana_dashboards = GrafanaDashboardProvider(self, relation_name="grafana-dashboard")
+        self._grafana_dashboards = None
+        if self._relation_in_scope("grafana-dashboard"):
+            self._grafana_dashboards = GrafanaDashboardProvider(self, relation_name="grafana-dashboard")
 
         # Frontend TLS certificates
         # Only frontend TLS will be configured
         self.certificates = TLSCertificatesRequiresV4(
             charm=self,
             relationship_name=FRONTEND_CERTIFICATES_RELATION_NAME,
-            certificate_requests=[self._get_certificate_request_attributes()],
+            certificate_requests=self._get_certificate_requests(),
             mode=Mode.UNIT,
             refresh_events=[self.on.upgrade_charm, self.on.config_changed],
         )
@@ -207,18 +326,34 @@ class TemporalK8SCharm(CharmBase):
                 self.framework.observe(self.ingress.on.ready, self._on_ingress_ready)
                 self.framework.observe(self.ingress.on.revoked, self._on_ingress_revoked)
 
+    def _relation_in_scope(self, relation_name):
+        """Check whether a relation library is needed in the current hook.
+
+        Args:
+            relation_name: name of the relation endpoint.
+
+        Returns:
+            True if the relation exists or the current hook is one of its events.
+        """
+        return bool(self.model.relations[relation_name]) or os.environ.get("JUJU_RELATION") == relation_name
+
     # Frontend TLS handler
-    def _handle_frontend_tls(self):
+    def _handle_frontend_tls(self) -> bool:
+        """Push the frontend certificate and key to the workload when they changed.
+
+        Returns:
+            True if a new certificate or key was pushed, False otherwise.
+        """
         # Block if the unit is not configured as a frontend service but has the relation
         if "frontend" not in self.config["services"] and self.model.get_relation(FRONTEND_CERTIFICATES_RELATION_NAME):
             self.unit.status = BlockedStatus(
                 f"Not a frontend service, please remove {FRONTEND_CERTIFICATES_RELATION_NAME} integration."
             )
-            return
+            return False
 
         # Pre-flight checks
         if not self._relation_created(FRONTEND_CERTIFICATES_RELATION_NAME):
-            return
+            return False
 
         # Fetch the assigned certificate and key
         provider_certificate, private_key = self.certificates.get_assigned_certificate(
@@ -229,13 +364,15 @@ class TemporalK8SCharm(CharmBase):
         if not provider_certificate or not private_key:
             logger.info("The certificate is not available yet.")
             self.unit.status = WaitingStatus("Waiting for certificates to be available")
-            return
+            return False
+
+        self._extra_context.update(FRONTEND_TLS_CONFIGURATION)
 
         # If either the certificate or key is outdated or missing, update both
         if self._update_certificates_required(provider_certificate, private_key):
-            self._extra_context.update(FRONTEND_TLS_CONFIGURATION)
-            self._store_certificate(certificate=provider_certificate.certificate)
-            self._store_private_key(private_key=private_key)
+            self._store_certificate_and_key(provider_certificate.certificate, private_key)
+            return True
+        return False
 
     def _remove_certificates(self, event: EventBase) -> None:
         """Remove frontend certificates from the workload container.
@@ -245,8 +382,8 @@ class TemporalK8SCharm(CharmBase):
         """
         if not isinstance(event, RelationBrokenEvent) or not event.relation.name == FRONTEND_CERTIFICATES_RELATION_NAME:
             return
-        self._delete_certificate()
-        self._delete_private_key()
+        self._delete_certificate_and_key()
+        self._stored.certificate_digests = {}
 
     def _on_ingress_ready(self, event: IngressPerAppReadyEvent):
         logger.info("This app's ingress URL: %s", event.url)
@@ -254,6 +391,15 @@ class TemporalK8SCharm(CharmBase):
     def _on_ingress_revoked(self, event: IngressPerAppRevokedEvent):
         logger.info("This app no longer has ingress")
 
+    def _on_pre_commit(self, event):
+        """Flush the changes made to the peer relation state during the hook.
+
+        Args:
+            event: The framework pre-commit event.
+        """
+        if self._state.is_ready():
+            self._state.commit()
+
     @log_event_handler(logger)
     def _on_peer_relation_changed(self, event):
         """Handle peer relation changes.
@@ -267,6 +413,21 @@ class TemporalK8SCharm(CharmBase):
         self.unit.status = WaitingStatus("configuring temporal")
         self._update(event)
 
+    @log_event_handler(logger)
+    def _on_peer_units_changed(self, event):
+        """Resize the database connection pools when units join or leave.
+
+        The leader publishes the new budget, the other units pick it up on
+        peer relation changed.
+
+        Args:
+            event: The event triggered when a unit joined or departed.
+        """
+        if not self.unit.is_leader() or not self.config["database-connection-ceiling"]:
+            return
+
+        self._update(event)
+
     def _require_nginx_route(self):
         """Require nginx-route relation based on current configuration."""
         if self.model.get_relation("ingress") and self.model.get_relation("nginx-route"):
@@ -345,6 +506,12 @@ class TemporalK8SCharm(CharmBase):
         Args:
             event: The event triggered when the relation changed.
         """
+        # The workload container was (re)started, so any previously pushed
+        # files and layers must be applied again.
+        self._stored.applied_digests = {}
+        self._stored.certificate_digests = {}
+        # The container limits can only change along with a new pod.
+        self._stored.cgroup_limits = {}
         self._update(event)
 
     @log_event_handler(logger)
@@ -361,9 +528,42 @@ class TemporalK8SCharm(CharmBase):
             logger.info(f"Invalid frontend-cert-sans-dns: {invalid_dns}")
             return
 
+        if self.unit.is_leader():
+            self._apply_container_resources()
+
         self.unit.status = WaitingStatus("configuring temporal")
         self._update(event)
 
+    def _apply_container_resources(self):
+        """Apply the compute resources of the services to the workload container.
+
+        The resources are only managed once one of the resource options is
+        set, as patching the StatefulSet restarts every pod of the application.
+        """
+        if not any(self.config[option] for option in RESOURCE_OPTIONS):
+            return
+
+        try:
+            resources = resource_requirements(self.config["services"].split(","), self.config)
+        except (KeyError, ValueError):
+            # Reported by the validation of the config.
+            return
+
+        if patch_container_resources(self.app.name, self.model.name, self.name, resources):
+            logger.info("temporal container resources updated, the pods are being restarted")
+
+    @log_event_handler(logger)
+    def _on_upgrade_charm(self, event):
+        """Drop the cached certificate request, the unit may have been rescheduled.
+
+        This runs before the TLS certificates library refreshes its requests.
+
+        Args:
+            event: The event triggered when the charm is upgraded.
+        """
+        self._stored.certificate_request = {}
+        self.certificates.certificate_requests = self._get_certificate_requests()
+
     @log_event_handler(logger)
     def _on_restart_action(self, event):
         """Restart the temporal server, even if there are no changes.
@@ -371,13 +571,303 @@ class TemporalK8SCharm(CharmBase):
         Args:
             event: The event triggered when the relation changed.
         """
-        container = self.unit.get_container(self.name)
+        container = self.container
 
         logger.info("restarting temporal")
         self.unit.status = MaintenanceStatus("restarting temporal")
         container.restart(self.name)
         self.set_active_unit_status()
 
+    @log_event_handler(logger)
+    def _on_set_task_queue_partitions_action(self, event):
+        """Set the matching partitions of a task queue, reducing them in steps.
+
+        Args:
+            event: The event triggered when the action is performed.
+        """
+        if not self.unit.is_leader():
+            event.fail("set-task-queue-partitions must be run on the leader unit")
+            return
+        if not self._state.is_ready():
+            event.fail("peer relation not ready")
+            return
+        if not self.container.can_connect():
+            event.fail("temporal container not ready")
+            return
+
+        task_queue = f"{event.params['namespace']}/{event.params.get('task-queue', '')}"
+        targets = self._state.task_queue_partition_targets or {}
+        if event.params.get("reset"):
+            targets.pop(task_queue, None)
+        else:
+            target = event.params.get("partitions")
+            if target is None or target < 1:
+                event.fail("partitions must be >= 1, unless reset is set")
+                return
+            targets[task_queue] = {"read": target, "write": target}
+        self._state.task_queue_partition_targets = targets
+
+        try:
+            partitions = self._task_queue_partitions(force=[task_queue])
+        except ValueError as err:
+            event.fail(str(err))
+            return
+
+        default = {"read": DEFAULT_TASK_QUEUE_PARTITIONS, "write": DEFAULT_TASK_QUEUE_PARTITIONS}
+        updated = partitions.get(task_queue, default)
+        if updated["read"] == updated["write"]:
+            result = f"task queue partitions set to {updated['read']}"
+        else:
+            result = (
+                f"write partitions reduced to {updated['write']}, read partitions are reduced once the backlog "
+                "of the removed partitions has drained, or when the action is run again"
+            )
+        event.set_results({"result": result, "read-partitions": updated["read"], "write-partitions": updated["write"]})
+        self._update(event)
+
+    @log_event_handler(logger)
+    def _on_plan_history_shards_action(self, event):
+        """Recommend a number of history shards for the expected load.
+
+        Args:
+            event: The event triggered when the action is performed.
+        """
+        history_units = event.params["history-units"]
+        try:
+            plan = plan_history_shards(
+                event.params["workflow-start-rate"], event.params.get("state-transitions-per-second", 0), history_units
+            )
+        except ValueError as err:
+            event.fail(str(err))
+            return
+
+        warnings = plan["warnings"]
+        results = {
+            "recommended-shards": plan["shards"],
+            "shards-per-history-unit": f"{plan['shards_per_history_unit']:g}",
+        }
+        current = self._state.num_history_shards if self._state.is_ready() else None
+        if current:
+            results["current-shards"] = current
+            current_warning = shards_per_history_unit_warning(current, history_units)
+            if current_warning:
+                warnings.append(f"current shards: {current_warning}")
+
+        for warning in warnings:
+            logger.warning("plan-history-shards: %s", warning)
+        if warnings:
+            results["warnings"] = "; ".join(warnings)
+        event.set_results(results)
+
+    def _dynamic_config_context(self):
+        """Build the dynamic config template context from the dynamic options.
+
+        Returns:
+            The template context.
+
+        Raises:
+            ValueError: if a dynamic option is not valid.
+        """
+        options = {option: self.config[option] for option in DYNAMIC_CONFIG_OPTIONS}
+        services = self.config["services"].split(",")
+        return dynamic_config_context(options, self._task_queue_partitions(), services, self._secondary_visibility())
+
+    def _connection_budget(self):
+        """Return the connection pool sizes of the unit, if a connection ceiling is set.
+
+        The leader computes the budget from the number of peer units and
+        publishes it in the peer relation. Other units use the published
+        budget unless it was computed for fewer units than they can see, in
+        which case they size their pools themselves until the leader catches up.
+
+        Returns:
+            Dict of pool name, see `_database_pools`, to its `max_conns` and
+            `max_idle_conns`, or None if pools are sized from the config.
+
+        Raises:
+            ValueError: if the ceiling would be oversubscribed.
+        """
+        ceiling = self.config["database-connection-ceiling"]
+        if ceiling < 0:
+            raise ValueError("value of 'database-connection-ceiling' must be >= 0")
+        if not ceiling:
+            if self.unit.is_leader() and self._state.connection_budget is not None:
+                del self._state.connection_budget
+            return None
+
+        units = len(self.model.get_relation("peer").units) + 1
+        pools = self._database_pools()
+        published = self._state.connection_budget
+        if (
+            not self.unit.is_leader()
+            and published
+            and published["units"] >= units
+            and published["pools"].keys() == pools.keys()
+        ):
+            return published["pools"]
+
+        budget = connection_budget(ceiling, units, self._server_services(), pools)
+        if self.unit.is_leader() and published != {"units": units, "pools": budget}:
+            self._state.connection_budget = {"units": units, "pools": budget}
+        return budget
+
+    def _database_pools(self):
+        """Return the configured connection pools opened by each service to the SQL stores.
+
+        The visibility replica is counted as soon as reads from replicas are
+        enabled, so that the budget does not depend on the replica being
+        published yet.
+
+        Returns:
+            Dict of pool name to its configured `max_conns` and `max_idle_conns`.
+        """
+        pools = {
+            db_type: {
+                "max_conns": self.config[f"{db_type}-max-conns"],
+                "max_idle_conns": self.config[f"{db_type}-max-idle-conns"],
+            }
+            for db_type in ("persistence", "visibility")
+        }
+        if (
+            self.config["visibility-read-from-replicas"]
+            and self.config["advanced-visibility-mode"] == "off"
+            and self.config["visibility-migration-mode"] == "off"
+        ):
+            pools["visibility-replica"] = dict(pools["visibility"])
+        if self.config["visibility-migration-mode"] != "off":
+            pools["visibility-target"] = {
+                "max_conns": self.config["visibility-target-max-conns"],
+                "max_idle_conns": self.config["visibility-target-max-idle-conns"],
+            }
+        return pools
+
+    def _server_services(self):
+        """Return the Temporal services started by the unit.
+
+        Returns:
+            The configured services, and the internal frontend next to the frontend.
+        """
+        services = self.config["services"].split(",")
+        if ValidServiceTypes.FRONTEND.value in services:
+            services.append("internal-frontend")
+        return services
+
+    def _database_connection(self, db_type):
+        """Return the connection of a store, routed through its pooler if configured.
+
+        Args:
+            db_type: `persistence` or `visibility`.
+
+        Returns:
+            The connection from the relation, with the endpoint override applied.
+            Its `endpoints` are the comma-separated `<host>:<port>` to connect to.
+        """
+        db_conn = dict(self._state.database_connections["db" if db_type == "persistence" else "visibility"])
+        override = self.config[f"{db_type}-endpoint-override"]
+        if override:
+            db_conn["host"], db_conn["port"] = override.rsplit(":", 1)
+            db_conn["endpoints"] = [override]
+        db_conn["endpoints"] = ",".join(db_conn.get("endpoints") or [f"{db_conn['host']}:{db_conn['port']}"])
+        return db_conn
+
+    def _secondary_visibility(self):
+        """Return the use of the secondary visibility store.
+
+        Returns:
+            `dual-write` or `dual-read` while migrating to advanced visibility
+            or to the visibility target database, `replica` if reads are served
+            by a replica of the visibility database, or None if there is no
+            secondary store.
+        """
+        for option in ("advanced-visibility-mode", "visibility-migration-mode"):
+            if self.config[option] in ("dual-write", "dual-read"):
+                return self.config[option]
+        if self._visibility_replica():
+            return "replica"
+        return None
+
+    def _visibility_replica(self):
+        """Return the read-only visibility endpoint that serves visibility queries.
+
+        Returns:
+            The `(host, port)` of the replica, or None if visibility reads are
+            served by the primary, or no replica is published.
+        """
+        if (
+            not self.config["visibility-read-from-replicas"]
+            or self.config["advanced-visibility-mode"] != "off"
+            or self.config["visibility-migration-mode"] != "off"
+        ):
+            return None
+        visibility_conn = (self._state.database_connections or {}).get("visibility") or {}
+        if not visibility_conn.get("read_only_host"):
+            return None
+        return visibility_conn["read_only_host"], visibility_conn["read_only_port"]
+
+    def _cgroup_limits(self, container):
+        """Return the CPU and memory limits of the workload container.
+
+        The limits are read from the cgroup filesystem of the container once
+        per pod, and cached in the unit state.
+
+        Args:
+            container: application container
+
+        Returns:
+            Dict of the `cpu` cores and `memory` bytes the container may use,
+            None when unlimited.
+        """
+        if self._stored.cgroup_limits:
+            return dict(self._stored.cgroup_limits)
+
+        def read(paths):
+            for path in paths:
+                try:
+                    return container.pull(path).read()
+                except pebble.PathError:
+                    continue
+            return ""
+
+        cpu_max = read(CGROUP_CPU_FILES)
+        # Only cgroup v1 keeps the period of the quota in a separate file.
+        cfs_period = read([CGROUP_CPU_PERIOD_V1_FILE]) if len(cpu_max.split()) == 1 else None
+        limits = {
+            "cpu": parse_cpu_limit(cpu_max, cfs_period),
+            "memory": parse_memory_limit(read(CGROUP_MEMORY_FILES)),
+        }
+        logger.info("temporal container limits: %s cores, %s bytes", limits["cpu"], limits["memory"])
+        self._stored.cgroup_limits = limits
+        return limits
+
+    def _task_queue_partitions(self, force=()):
+        """Return the task queue partitions to apply.
+
+        The partitions to reach are those of the config option, overridden by
+        the set-task-queue-partitions action. The leader steps the applied
+        partitions towards them and stores them in the peer relation, so that
+        every unit applies the same partitions.
+
+        Args:
+            force: task queues whose read partitions are reduced without
+                waiting for their backlog to drain.
+
+        Returns:
+            Dict of `<namespace>/<task queue>` to `read` and `write` partitions.
+
+        Raises:
+            ValueError: if the config option is not valid.
+        """
+        targets = parse_task_queue_partitions(self.config["task-queue-partitions"])
+        if not self._state.is_ready():
+            return targets
+
+        applied = self._state.task_queue_partitions or {}
+        if self.unit.is_leader():
+            targets.update(self._state.task_queue_partition_targets or {})
+            applied = plan_task_queue_partitions(applied, targets, time.time(), force)
+            self._state.task_queue_partitions = applied
+        return {task_queue: {"read": p["read"], "write": p["write"]} for task_queue, p in applied.items()}
+
     @log_event_handler(logger)
     def _on_update_status(self, event):
         """Handle `update-status` events.
@@ -385,17 +875,23 @@ class TemporalK8SCharm(CharmBase):
         Args:
             event: The `update-status` event triggered at intervals.
         """
+        partitions = self._state.task_queue_partitions if self._state.is_ready() else None
         try:
             self._validate()
         except ValueError:
             return
 
+        if self._state.is_ready() and self._state.task_queue_partitions != partitions:
+            # The leader took the next step of a task queue partitions change.
+            self._update(event)
+            return
+
         should_update = self.postgresql.update_db_relation_data_in_state(event)
         if should_update:
             self._update(event)
             return
 
-        container = self.unit.get_container(self.name)
+        container = self.container
         valid_pebble_plan = self._validate_pebble_plan(container)
         if not valid_pebble_plan:
             self._update(event)
@@ -462,7 +958,7 @@ class TemporalK8SCharm(CharmBase):
 
         num_history_shards = self._state.num_history_shards
         if num_history_shards is None:
-            if self.config.get("num-history-shards", "") == "" or self.config.get("num-history-shards") <= 0:
+            if not is_power_of_two(self.config.get("num-history-shards")):
                 raise ValueError(
                     "value of 'num-history-shards' config must be set to a positive power of 2 (e.g. 1, 2, 4)"
                 )
@@ -475,9 +971,40 @@ class TemporalK8SCharm(CharmBase):
             logger.error(message)
             raise ValueError(message)
 
+        cluster_name = self._state.cluster_name
+        if cluster_name is None:
+            if not re.fullmatch(r"[a-z0-9]([a-z0-9-]*[a-z0-9])?", self.config["cluster-name"]):
+                raise ValueError("value of 'cluster-name' must consist of lower case alphanumeric characters or '-'")
+            if self.unit.is_leader():
+                self._state.cluster_name = self.config["cluster-name"]
+        elif cluster_name != self.config["cluster-name"]:
+            raise ValueError(
+                f"value of 'cluster-name' config cannot be changed after deployment. Value should be {cluster_name}"
+            )
+
+        # Failover versions of global namespaces derive from the initial
+        # failover version, so it cannot change once namespaces replicate.
+        initial_failover_version = self._state.initial_failover_version
+        if initial_failover_version is None:
+            if not 0 < self.config["initial-failover-version"] < FAILOVER_VERSION_INCREMENT:
+                raise ValueError(
+                    f"value of 'initial-failover-version' must be between 1 and {FAILOVER_VERSION_INCREMENT - 1}"
+                )
+            if self.unit.is_leader():
+                self._state.initial_failover_version = self.config["initial-failover-version"]
+        elif initial_failover_version != self.config["initial-failover-version"]:
+            raise ValueError(
+                "value of 'initial-failover-version' config cannot be changed after deployment. "
+                f"Value should be {initial_failover_version}"
+            )
+
         if self.config["global-rps-limit"] < 0:
             raise ValueError("`global-rps-limit` must be grater than 0")
 
+        for option in ("visibility-target-max-conns", "visibility-target-max-idle-conns"):
+            if self.config[option] < 1:
+                raise ValueError(f"value of '{option}' must be >= 1")
+
         db_types = ["persistence", "visibility"]
         for db_type in db_types:
             if self.config[f"{db_type}-max-conns"] < 1:
@@ -486,6 +1013,50 @@ class TemporalK8SCharm(CharmBase):
                 raise ValueError(f"value of '{db_type}-max-idle-conns' must be >= 1")
             if not is_valid_time_duration(self.config[f"{db_type}-max-conn-time"]):
                 raise ValueError(f"value of '{db_type}-max-conn-time' must be a valid time duration e.g. 1h")
+            if self.config[f"{db_type}-pooler-mode"] not in VALID_POOLER_MODES:
+                raise ValueError(f"value of '{db_type}-pooler-mode' must be one of {', '.join(VALID_POOLER_MODES)}")
+            override = self.config[f"{db_type}-endpoint-override"]
+            if override and not re.fullmatch(r"[^\s:]+:\d+", override):
+                raise ValueError(f"value of '{db_type}-endpoint-override' must be <host>:<port>")
+
+        self._dynamic_config_context()
+        self._connection_budget()
+        validate_go_runtime_options(self.config)
+        if not 0 <= self.config["pprof-port"] <= 65535:
+            raise ValueError("value of 'pprof-port' must be a port number, or 0 to disable profiling")
+        if any(self.config[option] for option in RESOURCE_OPTIONS):
+            resource_requirements(self.config["services"].split(","), self.config)
+
+        poll_interval = self.config["dynamic-config-poll-interval"]
+        if (
+            not is_valid_time_duration(poll_interval)
+            or time_duration_seconds(poll_interval) < MIN_DYNAMIC_CONFIG_POLL_INTERVAL_SECONDS
+        ):
+            raise ValueError(
+                "value of 'dynamic-config-poll-interval' must be a valid time duration of at least "
+                f"{MIN_DYNAMIC_CONFIG_POLL_INTERVAL_SECONDS}s"
+            )
+
+        for option in TLS_DURATION_OPTIONS:
+            if self.config[option] != "0s" and not is_valid_time_duration(self.config[option]):
+                raise ValueError(f"value of '{option}' must be a valid time duration e.g. 1h, or 0s")
+
+        # Validate advanced visibility.
+        advanced_visibility_mode = self.config["advanced-visibility-mode"]
+        if advanced_visibility_mode not in VALID_ADVANCED_VISIBILITY_MODES:
+            raise ValueError(
+                f"value of 'advanced-visibility-mode' must be one of {', '.join(VALID_ADVANCED_VISIBILITY_MODES)}"
+            )
+        if advanced_visibility_mode != "off":
+            if self.config["visibility-read-from-replicas"]:
+                raise ValueError("'visibility-read-from-replicas' cannot be combined with 'advanced-visibility-mode'")
+            if not self._state.opensearch:
+                raise ValueError("opensearch:temporal relation not ready")
+            if not self._state.opensearch["index_ready"]:
+                raise ValueError("opensearch:temporal relation: visibility index is not ready")
+
+        # Validate the migration to the visibility target database.
+        self._validate_visibility_migration()
 
         # Validate admin relation.
         self.database_connections()
@@ -511,6 +1082,35 @@ class TemporalK8SCharm(CharmBase):
             if not self._state.s3.get("bucket_created"):
                 raise ValueError("s3:archival failed to create s3 bucket.")
 
+    def _validate_visibility_migration(self):
+        """Validate the visibility migration, and record when its current step started.
+
+        Raises:
+            ValueError: in case of invalid configuration, or if the target database is not ready.
+        """
+        mode = self.config["visibility-migration-mode"]
+        if mode not in VALID_VISIBILITY_MIGRATION_MODES:
+            raise ValueError(
+                f"value of 'visibility-migration-mode' must be one of {', '.join(VALID_VISIBILITY_MIGRATION_MODES)}"
+            )
+
+        if mode == "off":
+            if self.unit.is_leader() and self._state.visibility_migration is not None:
+                del self._state.visibility_migration
+            return
+
+        if self.config["advanced-visibility-mode"] != "off":
+            raise ValueError("'visibility-migration-mode' cannot be combined with 'advanced-visibility-mode'")
+        if self.config["visibility-read-from-replicas"]:
+            raise ValueError("'visibility-migration-mode' cannot be combined with 'visibility-read-from-replicas'")
+        if not self._state.visibility_target:
+            raise ValueError(f"{VISIBILITY_TARGET_RELATION_NAME}:temporal relation not ready")
+
+        migration = self._state.visibility_migration
+        if self.unit.is_leader() and (not migration or migration["mode"] != mode):
+            logger.info("visibility migration: entering %s", mode)
+            self._state.visibility_migration = {"mode": mode, "since": int(time.time())}
+
     def _open_service_ports(self):
         """Open the respective ports based on Temporal service."""
         services = self.config["services"]
@@ -548,7 +1148,7 @@ class TemporalK8SCharm(CharmBase):
         if self.unit.is_leader():
             self._open_service_ports()
 
-        container = self.unit.get_container(self.name)
+        container = self.container
         if not container.can_connect():
             event.defer()
             return
@@ -558,22 +1158,27 @@ class TemporalK8SCharm(CharmBase):
             "log-level": "LOG_LEVEL",
         }
         context = {config_key: self.config[key] for key, config_key in options.items()}
-        db_conn = self._state.database_connections["db"]
-        visibility_conn = self._state.database_connections["visibility"]
+        db_conn = self._database_connection("persistence")
+        visibility_conn = self._database_connection("visibility")
         context.update(
             {
                 "DB_NAME": db_conn["dbname"],
                 "DB_HOST": db_conn["host"],
                 "DB_PORT": db_conn["port"],
+                "DB_ENDPOINTS": db_conn["endpoints"],
                 "DB_USER": db_conn["user"],
                 "DB_PSWD": db_conn["password"],
                 "VISIBILITY_NAME": visibility_conn["dbname"],
                 "VISIBILITY_HOST": visibility_conn["host"],
                 "VISIBILITY_PORT": visibility_conn["port"],
+                "VISIBILITY_ENDPOINTS": visibility_conn["endpoints"],
                 "VISIBILITY_USER": visibility_conn["user"],
                 "VISIBILITY_PSWD": visibility_conn["password"],
                 "TEMPORAL_BROADCAST_ADDRESS": str(self.model.get_binding("peer").network.bind_address),
                 "NUM_HISTORY_SHARDS": self._state.num_history_shards,
+                "CLUSTER_NAME": self.config["cluster-name"],
+                "INITIAL_FAILOVER_VERSION": self.config["initial-failover-version"],
+                "GLOBAL_NAMESPACE_ENABLED": self.config["enable-global-namespaces"],
                 "SQL_MAX_CONNS": self.config["persistence-max-conns"],
                 "SQL_MAX_IDLE_CONNS": self.config["persistence-max-idle-conns"],
                 "SQL_MAX_CONN_TIME": self.config["persistence-max-conn-time"],
@@ -581,9 +1186,56 @@ class TemporalK8SCharm(CharmBase):
                 "SQL_VIS_MAX_IDLE_CONNS": self.config["visibility-max-idle-conns"],
                 "SQL_VIS_MAX_CONN_TIME": self.config["visibility-max-conn-time"],
                 "SQL_TLS_ENABLED": db_conn.get("tls", False),
+                "SQL_VIS_TLS_ENABLED": visibility_conn.get("tls", False),
+                "SQL_TRANSACTION_POOLING": self.config["persistence-pooler-mode"] == "transaction",
+                "SQL_VIS_TRANSACTION_POOLING": self.config["visibility-pooler-mode"] == "transaction",
+                "DYNAMIC_CONFIG_POLL_INTERVAL": self.config["dynamic-config-poll-interval"],
+                "PPROF_PORT": self.config["pprof-port"],
             }
         )
 
+        visibility_replica = self._visibility_replica()
+        if visibility_replica:
+            context["VISIBILITY_REPLICA_HOST"], context["VISIBILITY_REPLICA_PORT"] = visibility_replica
+        elif self.config["visibility-read-from-replicas"]:
+            logger.warning("no read-only visibility endpoint available, visibility reads use the primary")
+
+        if self.config["visibility-migration-mode"] != "off":
+            target_conn = self._state.visibility_target
+            context.update(
+                {
+                    "VISIBILITY_MIGRATION_MODE": self.config["visibility-migration-mode"],
+                    "VISIBILITY_TARGET_NAME": target_conn["dbname"],
+                    "VISIBILITY_TARGET_ENDPOINTS": ",".join(target_conn["endpoints"]),
+                    "VISIBILITY_TARGET_USER": target_conn["user"],
+                    "VISIBILITY_TARGET_PSWD": target_conn["password"],
+                    "SQL_VIS_TARGET_TLS_ENABLED": target_conn["tls"],
+                    "SQL_VIS_TARGET_MAX_CONNS": self.config["visibility-target-max-conns"],
+                    "SQL_VIS_TARGET_MAX_IDLE_CONNS": self.config["visibility-target-max-idle-conns"],
+                }
+            )
+
+        opensearch_ca = None
+        if self.config["advanced-visibility-mode"] != "off":
+            opensearch = self._state.opensearch
+            opensearch_ca = opensearch["tls_ca"]
+            context.update(
+                {
+                    "ADVANCED_VISIBILITY_MODE": self.config["advanced-visibility-mode"],
+                    "ES_SCHEME": opensearch["scheme"],
+                    "ES_SEEDS": opensearch["host"],
+                    "ES_PORT": opensearch["port"],
+                    "ES_USER": opensearch["username"],
+                    "ES_PWD": opensearch["password"],
+                    "ES_VIS_INDEX": opensearch["index"],
+                    "ES_TLS_CA": OPENSEARCH_CA_PATH if opensearch_ca else "",
+                }
+            )
+
+        budget = self._connection_budget()
+        if budget:
+            context.update(budget_context(budget))
+
         if self.config["auth-enabled"]:
             openfga = self._state.openfga
             context.update(
@@ -626,28 +1278,22 @@ class TemporalK8SCharm(CharmBase):
                 }
             )
 
+        context.update({env: self.config[option] for option, env in TLS_DURATION_OPTIONS.items()})
+        context.update(go_runtime_env(self._cgroup_limits(container), self.config))
+
         # Handle frontend TLS
-        self._handle_frontend_tls()
+        certificates_updated = self._handle_frontend_tls()
         # If the relation is broken, remove certificates
         self._remove_certificates(event)
         context.update(self._extra_context)
 
         config = render("config.jinja", context)
-        container.push("/etc/temporal/config/charm.yaml", config, make_dirs=True)
 
-        dynamic_context = {
-            "GLOBAL_RPS_LIMIT": self.config["global-rps-limit"],
-            "NAMESPACE_RPS_LIMIT": self.config["namespace-rps-limit"],
-            "LONG_POLL_INTERVAL": self.config["long-poll-interval"],
-        }
-        dynamic_config = render("dynamic_config.jinja", dynamic_context)
-        container.push("/etc/temporal/config/dynamicconfig/docker.yaml", dynamic_config, make_dirs=True)
+        # Dynamic options are kept out of the service environment, the server
+        # polls the file they are rendered into.
+        dynamic_config = render("dynamic_config.jinja", self._dynamic_config_context())
 
-        logger.info("planning temporal execution")
-        services = self.config["services"].split(",")
-        services_args = " ".join(f"--service={service}" for service in services)
-        if ValidServiceTypes.FRONTEND.value in services:
-            services_args += " --service=internal-frontend"
+        services_args = " ".join(f"--service={service}" for service in self._server_services())
 
         pebble_layer = {
             "summary": "temporal server layer",
@@ -658,8 +1304,12 @@ class TemporalK8SCharm(CharmBase):
                     "startup": "enabled",
                     "override": "replace",
                     # Including config values here so that a change in the
-                    # config forces replanning to restart the service.
-                    "environment": context,
+                    # config forces replanning to restart the service. The
+                    # TLS file paths are left out, enabling or disabling TLS
+                    # restarts the service explicitly below.
+                    "environment": {
+                        key: value for key, value in context.items() if key not in FRONTEND_TLS_CONFIGURATION
+                    },
                     "on-check-failure": {"up": "ignore"},
                 }
             },
@@ -673,11 +1323,70 @@ class TemporalK8SCharm(CharmBase):
                 }
             },
         }
+
+        digests = {
+            "context": fingerprint(context),
+            "config": fingerprint(config),
+            "dynamic-config": fingerprint(dynamic_config),
+            "layer": fingerprint(pebble_layer),
+        }
+        if opensearch_ca:
+            digests["opensearch-ca"] = fingerprint(opensearch_ca)
+        changed = changed_inputs(self._stored.applied_digests, digests)
+
+        # Without a refresh interval, the server only loads the certificates
+        # on startup, so a renewed certificate requires a restart.
+        restart_required = certificates_updated and self.config["tls-refresh-interval"] == "0s"
+        if certificates_updated and not restart_required:
+            logger.info("frontend certificate renewed, relying on the server TLS refresh interval")
+
+        if not restart_required and changed in ([], ["dynamic-config"]) and self._validate_pebble_plan(container):
+            if changed:
+                logger.info("temporal dynamic configuration changed, skipping replan")
+                container.push("/etc/temporal/config/dynamicconfig/docker.yaml", dynamic_config, make_dirs=True)
+                self._stored.applied_digests = digests
+            else:
+                logger.info("temporal configuration unchanged, skipping replan")
+            self._set_status_from_health_check(container)
+            return
+
+        logger.info(f"temporal configuration changed: {', '.join(changed) or 'pebble plan'}")
+        if "config" in changed or not changed:
+            container.push("/etc/temporal/config/charm.yaml", config, make_dirs=True)
+        if "dynamic-config" in changed or not changed:
+            container.push("/etc/temporal/config/dynamicconfig/docker.yaml", dynamic_config, make_dirs=True)
+        if opensearch_ca and ("opensearch-ca" in changed or not changed):
+            container.push(OPENSEARCH_CA_PATH, opensearch_ca, make_dirs=True)
+
+        logger.info("planning temporal execution")
         container.add_layer(self.name, pebble_layer, combine=True)
         container.replan()
+        if "layer" not in changed and ("config" in changed or "opensearch-ca" in changed or restart_required):
+            # Replanning only restarts the service when its layer changed.
+            logger.info("restarting temporal to load the new configuration")
+            container.restart(self.name)
+        self._stored.applied_digests = digests
 
         self.unit.status = MaintenanceStatus("replanning application")
 
+    def _set_status_from_health_check(self, container):
+        """Set the unit status based on the Temporal server health check.
+
+        Args:
+            container: application container
+        """
+        try:
+            check = container.get_check("up")
+        except ModelError:
+            self.unit.status = MaintenanceStatus("replanning application")
+            return
+
+        if check.status != CheckStatus.UP:
+            self.unit.status = MaintenanceStatus("Status check: DOWN")
+            return
+
+        self.set_active_unit_status()
+
     # Helpers for frontend TLS
     def _relation_created(self, relation_name: str) -> bool:
         return bool(self.model.relations.get(relation_name))
@@ -710,11 +1419,39 @@ class TemporalK8SCharm(CharmBase):
         # If everything is alright, return True
         return True
 
+    def _get_certificate_requests(self) -> list:
+        """Return the certificate requests to hand to the TLS certificates library.
+
+        The unit's names are only resolved when the frontend-certificates
+        relation exists or the current hook is about it.
+
+        Returns:
+            A list with the certificate request of the unit, or an empty list.
+        """
+        if not self._relation_in_scope(FRONTEND_CERTIFICATES_RELATION_NAME):
+            return []
+        return [self._get_certificate_request_attributes()]
+
     def _get_certificate_request_attributes(self) -> CertificateRequestAttributes:
-        """Return the attributes of the certificate this charm will request."""
+        """Return the attributes of the certificate this charm will request.
+
+        Resolving the unit's FQDN and IP address requires DNS lookups, so the
+        result is cached in the unit's stored state. The cache is keyed on the
+        relevant config options and the unit hostname, and dropped on upgrade.
+        """
+        unit_hostname = socket.gethostname()
+        cache_key = fingerprint(
+            [self.config["frontend-cert-common-name"], self.config["frontend-cert-sans-dns"], unit_hostname]
+        )
+        cached = self._stored.certificate_request
+        if cached.get("key") == cache_key:
+            return CertificateRequestAttributes(
+                common_name=cached["common_name"],
+                sans_dns=frozenset(cached["sans_dns"]),
+            )
+
         # Generate CN - try using the unit's FQDN -> HOSTNAME -> IP in that order
         unit_fqdn = socket.getfqdn()
-        unit_hostname = socket.gethostname()
         unit_ip = socket.gethostbyname(unit_fqdn)
         for name in (unit_fqdn, unit_hostname, unit_ip):
             if len(name) <= 64:
@@ -725,6 +1462,11 @@ class TemporalK8SCharm(CharmBase):
         # Generate SANS_DNS - set to the unit hostname if not set in configuration
         sans_dns = self._dns_entries or [unit_fqdn]
 
+        self._stored.certificate_request = {
+            "key": cache_key,
+            "common_name": common_name,
+            "sans_dns": sorted(sans_dns),
+        }
         return CertificateRequestAttributes(
             common_name=common_name,
             sans_dns=frozenset(sans_dns),
@@ -760,6 +1502,10 @@ class TemporalK8SCharm(CharmBase):
         the charm's TLS relation. It checks whether the certificate or private key has changed
         or needs to be updated.
 
+        The digests of the last pushed pair are compared first, the files in
+        the workload container are only read when they differ, e.g. after a
+        container restart.
+
         Args:
             provider_certificate: the provider certificate given by the TLS provider.
             private_key: the private key given by the TLS provider.
@@ -772,8 +1518,14 @@ class TemporalK8SCharm(CharmBase):
             logger.debug("Certificate or private key is not available")
             return False
 
+        digests = _certificate_digests(provider_certificate.certificate, private_key)
+        if self._stored.certificate_digests == digests:
+            return False
+
         certificate_update_required = self._is_certificate_update_required(provider_certificate.certificate)
         private_key_update_required = self._is_private_key_update_required(private_key)
+        if not (certificate_update_required or private_key_update_required):
+            self._stored.certificate_digests = digests
 
         return certificate_update_required or private_key_update_required
 
@@ -790,43 +1542,80 @@ class TemporalK8SCharm(CharmBase):
         return self._get_stored_private_key() if self._private_key_is_stored() else None
 
     def _certificate_is_stored(self) -> bool:
-        return self.container.exists(path=f"{CERTS_DIR_PATH}/{CERTIFICATE_NAME}")
+        return self.container.exists(path=FRONTEND_TLS_CONFIGURATION["TEMPORAL_TLS_FRONTEND_CERT"])
 
     def _private_key_is_stored(self) -> bool:
-        return self.container.exists(path=f"{CERTS_DIR_PATH}/{PRIVATE_KEY_NAME}")
+        return self.container.exists(path=FRONTEND_TLS_CONFIGURATION["TEMPORAL_TLS_FRONTEND_KEY"])
 
     def _get_stored_certificate(self) -> Certificate:
-        cert_string = str(self.container.pull(path=f"{CERTS_DIR_PATH}/{CERTIFICATE_NAME}").read())
+        cert_string = str(self.container.pull(path=FRONTEND_TLS_CONFIGURATION["TEMPORAL_TLS_FRONTEND_CERT"]).read())
         return Certificate.from_string(cert_string)
 
     def _get_stored_private_key(self) -> PrivateKey:
-        key_string = str(self.container.pull(path=f"{CERTS_DIR_PATH}/{PRIVATE_KEY_NAME}").read())
+        key_string = str(self.container.pull(path=FRONTEND_TLS_CONFIGURATION["TEMPORAL_TLS_FRONTEND_KEY"]).read())
         return PrivateKey.from_string(key_string)
 
-    def _store_certificate(self, certificate: Certificate) -> None:
+    def _store_certificate_and_key(self, certificate: Certificate, private_key: PrivateKey) -> None:
+        """Store the certificate and private key in workload, and swap them in at once.
+
+        The pair is written to a new directory, then the symlink read by the
+        server is replaced in one rename, so that a server reloading its
+        certificates never reads the certificate of one pair with the key of
+        another.
+
+        Args:
+            certificate: the certificate to store.
+            private_key: the private key matching the certificate.
+        """
+        digests = _certificate_digests(certificate, private_key)
+        directory = f"{FRONTEND_TLS_DIR_PATH}-{fingerprint(digests)[:16]}"
+        self._store_private_key(private_key=private_key, directory=directory)
+        self._store_certificate(certificate=certificate, directory=directory)
+
+        link = f"{FRONTEND_TLS_DIR_PATH}.new"
+        self.container.exec(["ln", "-sfn", directory, link]).wait()
+        self.container.exec(["mv", "-Tf", link, FRONTEND_TLS_DIR_PATH]).wait()
+        logger.info("Swapped in the new frontend certificate and private key")
+
+        for previous in self.container.list_files(CERTS_DIR_PATH, pattern="frontend-tls-*"):
+            if previous.path != directory:
+                self.container.remove_path(previous.path, recursive=True)
+        self._stored.certificate_digests = digests
+
+    def _store_certificate(self, certificate: Certificate, directory: str) -> None:
         """Store certificate in workload."""
-        self.container.push(path=f"{CERTS_DIR_PATH}/{CERTIFICATE_NAME}", source=str(certificate))
+        self.container.push(path=f"{directory}/{CERTIFICATE_NAME}", source=str(certificate), make_dirs=True)
         logger.info("Pushed certificate pushed to workload")
 
-    def _store_private_key(self, private_key: PrivateKey) -> None:
+    def _store_private_key(self, private_key: PrivateKey, directory: str) -> None:
         """Store private key in workload."""
         self.container.push(
-            path=f"{CERTS_DIR_PATH}/{PRIVATE_KEY_NAME}",
+            path=f"{directory}/{PRIVATE_KEY_NAME}",
             source=str(private_key),
+            make_dirs=True,
         )
         logger.info("Pushed private key to workload")
 
-    def _delete_certificate(self):
-        """Delete certificate from workload container."""
-        if self._certificate_is_stored():
-            self.container.remove_path(path=f"{CERTS_DIR_PATH}/{CERTIFICATE_NAME}")
-            logger.info("Removed certificate from workload")
-
-    def _delete_private_key(self):
-        """Delete private key from workload container."""
-        if self._private_key_is_stored():
-            self.container.remove_path(path=f"{CERTS_DIR_PATH}/{PRIVATE_KEY_NAME}")
-            logger.info("Removed private key from workload")
+    def _delete_certificate_and_key(self):
+        """Delete the certificate and private key from workload container."""
+        if not self.container.exists(CERTS_DIR_PATH):
+            return
+        for path in self.container.list_files(CERTS_DIR_PATH, pattern="frontend-tls*"):
+            self.container.remove_path(path=path.path, recursive=True)
+            logger.info("Removed %s from workload", path.path)
+
+
+def _certificate_digests(certificate, private_key):
+    """Compute the digests of a certificate and private key pair.
+
+    Args:
+        certificate: the certificate.
+        private_key: the private key.
+
+    Returns:
+        Dict of the certificate and private key digests.
+    """
+    return {"certificate": fingerprint(str(certificate)), "private-key": fingerprint(str(private_key))}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,68 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Sizing of the database connection pools of the Temporal services.
+
+Each Temporal service run by a unit, including the internal frontend started
+next to the frontend, opens its own connection pool to every SQL store of the
+unit: persistence, visibility, and the visibility replica or target when they
+are configured. When a connection ceiling is configured, it is split evenly
+between the units and the services they run, then between the pools in
+proportion to their configured `max-conns`, which remain upper bounds.
+"""
+
+# Template variables of the `max_conns` and `max_idle_conns` of each pool.
+POOL_CONTEXT = {
+    "persistence": ("SQL_MAX_CONNS", "SQL_MAX_IDLE_CONNS"),
+    "visibility": ("SQL_VIS_MAX_CONNS", "SQL_VIS_MAX_IDLE_CONNS"),
+    "visibility-replica": ("SQL_VIS_REPLICA_MAX_CONNS", "SQL_VIS_REPLICA_MAX_IDLE_CONNS"),
+    "visibility-target": ("SQL_VIS_TARGET_MAX_CONNS", "SQL_VIS_TARGET_MAX_IDLE_CONNS"),
+}
+
+
+def connection_budget(ceiling, units, services, pools):
+    """Compute the connection pool sizes that fit in a connection ceiling.
+
+    Args:
+        ceiling: maximum number of connections opened by the application.
+        units: number of units of the application.
+        services: services run by each unit.
+        pools: dict of pool name, one of `POOL_CONTEXT`, to its configured
+            `max_conns` and `max_idle_conns`.
+
+    Returns:
+        Dict of pool name to its `max_conns` and `max_idle_conns`.
+
+    Raises:
+        ValueError: if the ceiling cannot fit one connection per pool.
+    """
+    per_service = ceiling // (units * len(services))
+    if per_service < len(pools):
+        raise ValueError(
+            f"database-connection-ceiling: {ceiling} connections cannot be shared by {units} units running "
+            f"{len(services)} services, at least {units * len(services) * len(pools)} are needed"
+        )
+
+    configured = sum(pool["max_conns"] for pool in pools.values())
+    budget = {}
+    for name, pool in pools.items():
+        max_conns = max(1, min(pool["max_conns"], per_service * pool["max_conns"] // configured))
+        budget[name] = {"max_conns": max_conns, "max_idle_conns": min(pool["max_idle_conns"], max_conns)}
+    return budget
+
+
+def budget_context(budget):
+    """Build the template context of the connection pool sizes.
+
+    Args:
+        budget: dict of pool name to its `max_conns` and `max_idle_conns`.
+
+    Returns:
+        The template context.
+    """
+    context = {}
+    for name, pool in budget.items():
+        max_conns_var, max_idle_conns_var = POOL_CONTEXT[name]
+        context[max_conns_var] = pool["max_conns"]
+        context[max_idle_conns_var] = pool["max_idle_conns"]
+    return context
@@ -0,0 +1,37 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Content fingerprinting helpers used to detect configuration changes."""
+
+import hashlib
+import json
+
+
+def fingerprint(content):
+    """Compute a stable SHA-256 digest of the given content.
+
+    Strings are hashed as-is, any other value is first serialized to JSON with
+    sorted keys so that equal dicts always produce the same digest.
+
+    Args:
+        content: string or JSON serializable value to fingerprint.
+
+    Returns:
+        The hex encoded digest.
+    """
+    if not isinstance(content, str):
+        content = json.dumps(content, sort_keys=True, default=str)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def changed_inputs(previous, current):
+    """List the inputs whose digest differs from the previously applied one.
+
+    Args:
+        previous: mapping of input name to the last applied digest.
+        current: mapping of input name to the current digest.
+
+    Returns:
+        Sorted list of input names that changed.
+    """
+    return sorted(name for name, digest in current.items() if previous.get(name) != digest)
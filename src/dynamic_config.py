@@ -0,0 +1,521 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Validation of the user-provided Temporal dynamic configuration.
+
+The `dynamic-config` option holds a YAML mapping of Temporal dynamic config
+keys to either a plain value, or a list of values with constraints in the
+same format as Temporal's dynamic config file:
+
+    matching.forwarderMaxOutstandingPolls:
+      - value: 2
+        constraints:
+          namespace: payments
+          taskQueueName: checkout
+    history.cacheMaxSize: 4096
+
+Keys are checked against a catalog of known Temporal keys so that typos and
+invalid values are rejected before they reach the server.
+"""
+
+import re
+
+import yaml
+
+# Structured rate limits of the `rate-limits` option, by section and name,
+# mapped to the dynamic config key they are rendered to.
+RATE_LIMIT_KEYS = {
+    "frontend": {
+        "rps": "frontend.rps",
+        "namespace-burst-ratio": "frontend.namespaceBurstRatio",
+        "persistence-max-qps": "frontend.persistenceMaxQPS",
+    },
+    "history": {"persistence-max-qps": "history.persistenceMaxQPS"},
+    "matching": {"persistence-max-qps": "matching.persistenceMaxQPS"},
+    "worker": {"persistence-max-qps": "worker.persistenceMaxQPS"},
+    "visibility": {
+        "max-read-qps": "system.visibilityPersistenceMaxReadQPS",
+        "max-write-qps": "system.visibilityPersistenceMaxWriteQPS",
+    },
+}
+NAMESPACE_RPS_KEY = "frontend.namespacerps"
+
+# Keys that the charm renders from its own config options.
+MANAGED_KEYS = {
+    NAMESPACE_RPS_KEY: "global-rps-limit, namespace-rps-limit or rate-limits",
+    **{key.lower(): "rate-limits" for section in RATE_LIMIT_KEYS.values() for key in section.values()},
+    **{
+        section["persistence-max-qps"].lower(): f"{service}-persistence-max-qps or rate-limits"
+        for service, section in RATE_LIMIT_KEYS.items()
+        if "persistence-max-qps" in section
+    },
+    "matching.longpollexpirationinterval": "long-poll-interval",
+    "system.secondaryvisibilitywritingmode": "visibility-read-from-replicas, advanced-visibility-mode or "
+    "visibility-migration-mode",
+    "system.enablereadfromsecondaryvisibility": "visibility-read-from-replicas, advanced-visibility-mode or "
+    "visibility-migration-mode",
+    "matching.numtaskqueuereadpartitions": "task-queue-partitions or the set-task-queue-partitions action",
+    "matching.numtaskqueuewritepartitions": "task-queue-partitions or the set-task-queue-partitions action",
+}
+
+# Writing mode of the secondary visibility store and whether reads are served
+# by it, by use of the secondary store: a read-only replica of the SQL
+# visibility database, or the steps of a migration to advanced visibility or
+# to another SQL visibility database.
+SECONDARY_VISIBILITY_MODES = {
+    "replica": ("off", True),
+    "dual-write": ("dual", False),
+    "dual-read": ("dual", True),
+}
+
+# Temporal's default number of partitions of a task queue.
+DEFAULT_TASK_QUEUE_PARTITIONS = 4
+
+# Time given to the backlog of the partitions that are no longer written to to
+# drain, before their read partitions are removed.
+TASK_QUEUE_DRAIN_SECONDS = 600
+
+NAMESPACE = ("namespace",)
+TASK_QUEUE = ("namespace", "taskQueueName", "taskType")
+SHARD = ("shardId",)
+
+# Known dynamic config keys, with the type of their value, optional bounds and
+# the constraints they can be scoped by.
+CATALOG = {
+    # Frontend.
+    "frontend.globalNamespaceRPS": {"type": "int", "min": 0, "constraints": NAMESPACE},
+    "frontend.namespaceCount": {"type": "int", "min": 1, "constraints": NAMESPACE},
+    "frontend.keepAliveMaxConnectionAge": {"type": "duration"},
+    "frontend.enableUpdateWorkflowExecution": {"type": "bool", "constraints": NAMESPACE},
+    # History.
+    "history.rps": {"type": "int", "min": 1},
+    "history.cacheInitialSize": {"type": "int", "min": 1},
+    "history.cacheMaxSize": {"type": "int", "min": 1},
+    "history.eventsCacheInitialSize": {"type": "int", "min": 1},
+    "history.eventsCacheMaxSize": {"type": "int", "min": 1},
+    "history.timerProcessorSchedulerWorkerCount": {"type": "int", "min": 1},
+    "history.transferProcessorSchedulerWorkerCount": {"type": "int", "min": 1},
+    "history.visibilityProcessorSchedulerWorkerCount": {"type": "int", "min": 1},
+    "history.shardUpdateMinInterval": {"type": "duration", "constraints": SHARD},
+    # Matching.
+    "matching.rps": {"type": "int", "min": 1},
+    "matching.forwarderMaxOutstandingPolls": {"type": "int", "min": 0, "constraints": TASK_QUEUE},
+    "matching.forwarderMaxOutstandingTasks": {"type": "int", "min": 0, "constraints": TASK_QUEUE},
+    "matching.forwarderMaxRatePerSecond": {"type": "int", "min": 0, "constraints": TASK_QUEUE},
+    "matching.forwarderMaxChildrenPerNode": {"type": "int", "min": 1, "constraints": TASK_QUEUE},
+    "matching.maxTaskBatchSize": {"type": "int", "min": 1, "constraints": TASK_QUEUE},
+    "matching.getTasksBatchSize": {"type": "int", "min": 1, "constraints": TASK_QUEUE},
+    "matching.updateAckInterval": {"type": "duration", "constraints": TASK_QUEUE},
+    "matching.maxTaskqueueIdleTime": {"type": "duration", "constraints": TASK_QUEUE},
+    # Worker.
+    "worker.perNamespaceWorkerCount": {"type": "int", "min": 1, "constraints": NAMESPACE},
+    "worker.batcherRPS": {"type": "int", "min": 1, "constraints": NAMESPACE},
+    "worker.batcherConcurrency": {"type": "int", "min": 1, "constraints": NAMESPACE},
+    "worker.executionsScannerEnabled": {"type": "bool"},
+    "worker.historyScannerEnabled": {"type": "bool"},
+    "worker.taskQueueScannerEnabled": {"type": "bool"},
+    "worker.scannerMaxConcurrentActivityExecutionSize": {"type": "int", "min": 1},
+    # Visibility.
+    "frontend.visibilityMaxPageSize": {"type": "int", "min": 1, "constraints": NAMESPACE},
+    "frontend.visibilityListMaxQPS": {"type": "int", "min": 1, "constraints": NAMESPACE},
+    "system.visibilityDisableOrderByClause": {"type": "bool", "constraints": NAMESPACE},
+    "system.visibilityEnableManualPagination": {"type": "bool", "constraints": NAMESPACE},
+    "system.visibilityPersistenceSlowQueryThreshold": {"type": "duration"},
+    # System and limits.
+    "system.enableActivityEagerExecution": {"type": "bool", "constraints": NAMESPACE},
+    "limit.maxIDLength": {"type": "int", "min": 1},
+    "limit.blobSize.error": {"type": "int", "min": 1, "constraints": NAMESPACE},
+    "limit.blobSize.warn": {"type": "int", "min": 1, "constraints": NAMESPACE},
+    "limit.historySize.error": {"type": "int", "min": 1, "constraints": NAMESPACE},
+    "limit.historySize.warn": {"type": "int", "min": 1, "constraints": NAMESPACE},
+    "limit.historyCount.error": {"type": "int", "min": 1, "constraints": NAMESPACE},
+    "limit.historyCount.warn": {"type": "int", "min": 1, "constraints": NAMESPACE},
+}
+
+# Temporal matches keys case-insensitively.
+_CATALOG_BY_LOWER_KEY = {key.lower(): key for key in CATALOG}
+
+_DURATION_PATTERN = re.compile(r"^(\d+(\.\d+)?(ns|us|ms|s|m|h))+$")
+
+
+def _load_mapping(option, raw):
+    """Load a config option holding a YAML mapping.
+
+    Args:
+        option: name of the option, used in errors.
+        raw: YAML string of the option.
+
+    Returns:
+        The mapping, empty if the option is not set.
+
+    Raises:
+        ValueError: if the option is not a valid YAML mapping.
+    """
+    if not raw.strip():
+        return {}
+    try:
+        value = yaml.safe_load(raw)
+    except yaml.YAMLError as err:
+        raise ValueError(f"{option}: invalid YAML") from err
+    if not isinstance(value, dict):
+        raise ValueError(f"{option}: must be a mapping")
+    return value
+
+
+def _validate_value(key, value):
+    """Validate a value against the catalog entry of its key.
+
+    Args:
+        key: catalog key.
+        value: value to validate.
+
+    Raises:
+        ValueError: if the value has the wrong type or is out of bounds.
+    """
+    spec = CATALOG[key]
+    value_type = spec["type"]
+    if value_type == "bool":
+        valid = isinstance(value, bool)
+    elif value_type == "int":
+        valid = isinstance(value, int) and not isinstance(value, bool)
+    else:
+        valid = isinstance(value, str) and bool(_DURATION_PATTERN.match(value))
+    if not valid:
+        raise ValueError(f"dynamic-config: value of {key!r} must be a {value_type}, got {value!r}")
+
+    if "min" in spec and value < spec["min"]:
+        raise ValueError(f"dynamic-config: value of {key!r} must be >= {spec['min']}")
+
+
+def _parse_entry(key, item):
+    """Validate one value of a key and its constraints.
+
+    Args:
+        key: catalog key.
+        item: dict with a `value` and optional `constraints`.
+
+    Returns:
+        The entry with its constraints defaulted to an empty dict.
+
+    Raises:
+        ValueError: if the entry is not valid.
+    """
+    if not isinstance(item, dict) or "value" not in item or set(item) - {"value", "constraints"}:
+        raise ValueError(f"dynamic-config: entries of {key!r} must have a value and optional constraints")
+    _validate_value(key, item["value"])
+
+    constraints = item.get("constraints") or {}
+    if not isinstance(constraints, dict):
+        raise ValueError(f"dynamic-config: constraints of {key!r} must be a mapping")
+    unknown = sorted(set(constraints) - set(CATALOG[key].get("constraints", ())))
+    if unknown:
+        raise ValueError(f"dynamic-config: {key!r} cannot be constrained by {', '.join(unknown)}")
+    return {"value": item["value"], "constraints": constraints}
+
+
+def parse_dynamic_config(raw):
+    """Parse and validate the `dynamic-config` option.
+
+    Args:
+        raw: YAML string of the option.
+
+    Returns:
+        Dict of catalog keys to the list of their values, each value being a
+        dict with a `value` and optional `constraints`.
+
+    Raises:
+        ValueError: if the option is not valid.
+    """
+    entries = _load_mapping("dynamic-config", raw)
+    parsed = {}
+    for name, values in entries.items():
+        lower_name = str(name).lower()
+        if lower_name in MANAGED_KEYS:
+            raise ValueError(
+                f"dynamic-config: {name!r} is managed by the charm, use {MANAGED_KEYS[lower_name]} instead"
+            )
+        key = _CATALOG_BY_LOWER_KEY.get(lower_name)
+        if key is None:
+            raise ValueError(f"dynamic-config: unknown key {name!r}")
+        if key in parsed:
+            raise ValueError(f"dynamic-config: duplicate key {name!r}")
+
+        if not isinstance(values, list):
+            values = [{"value": values}]
+
+        parsed[key] = [_parse_entry(key, item) for item in values]
+
+    return parsed
+
+
+def parse_task_queue_partitions(raw):
+    """Parse the `task-queue-partitions` option.
+
+    The option is a pipe-separated list of `<namespace>[/<task queue>]:<read>[,<write>]`
+    entries, the number of write partitions defaults to the read ones.
+
+    Args:
+        raw: value of the option.
+
+    Returns:
+        Dict of `<namespace>/<task queue>` to a dict of `read` and `write` partitions.
+
+    Raises:
+        ValueError: if the option is not valid.
+    """
+    partitions = {}
+    for entry in filter(None, (entry.strip() for entry in raw.split("|"))):
+        try:
+            task_queue, counts = entry.rsplit(":", 1)
+            namespace, _, task_queue_name = task_queue.partition("/")
+            read, _, write = counts.partition(",")
+            read = int(read)
+            write = int(write) if write else read
+        except ValueError as err:
+            raise ValueError(f"task-queue-partitions: invalid entry {entry!r}") from err
+        if not namespace or write < 1 or read < write:
+            raise ValueError(
+                f"task-queue-partitions: invalid entry {entry!r}, read partitions must be >= write partitions >= 1"
+            )
+        partitions[f"{namespace}/{task_queue_name}"] = {"read": read, "write": write}
+    return partitions
+
+
+def next_task_queue_partitions(current, target):
+    """Compute the next step to move a task queue to the target partitions.
+
+    Increasing is done in one step. When decreasing, write partitions are
+    reduced first. Read partitions are only reduced on the next step, once
+    the backlog of the partitions that are no longer written to was drained,
+    so that no task is stranded in a partition that is not read.
+
+    Args:
+        current: dict of the current `read` and `write` partitions.
+        target: dict of the `read` and `write` partitions to reach.
+
+    Returns:
+        Dict of the next `read` and `write` partitions.
+    """
+    if target["read"] >= current["read"]:
+        return {"read": target["read"], "write": target["write"]}
+    return {"read": max(target["read"], current["write"]), "write": target["write"]}
+
+
+def plan_task_queue_partitions(applied, targets, now, force=()):
+    """Step the applied task queue partitions towards their targets.
+
+    Each task queue takes the next step of `next_task_queue_partitions`,
+    except that read partitions are only reduced `TASK_QUEUE_DRAIN_SECONDS`
+    after the last change of the task queue, unless forced.
+
+    Args:
+        applied: dict of `<namespace>/<task queue>` to the applied `read` and
+            `write` partitions, and the time they were applied `since`.
+        targets: dict of `<namespace>/<task queue>` to the `read` and `write`
+            partitions to reach, the task queues that are not listed return
+            to Temporal's default.
+        now: the current time, in seconds since the epoch.
+        force: task queues whose read partitions are reduced without waiting.
+
+    Returns:
+        Dict like `applied` of the partitions to apply.
+    """
+    default = {"read": DEFAULT_TASK_QUEUE_PARTITIONS, "write": DEFAULT_TASK_QUEUE_PARTITIONS}
+    planned = {}
+    for task_queue in sorted(set(applied) | set(targets)):
+        current = applied.get(task_queue, {**default, "since": 0})
+        step = next_task_queue_partitions(current, targets.get(task_queue, default))
+        drained = task_queue in force or now - current["since"] >= TASK_QUEUE_DRAIN_SECONDS
+        if step["read"] < current["read"] and not drained:
+            step["read"] = current["read"]
+        if task_queue not in targets and step == default:
+            continue
+        changed = step != {"read": current["read"], "write": current["write"]}
+        planned[task_queue] = {**step, "since": now if changed else current["since"]}
+    return planned
+
+
+def task_queue_partitions_context(partitions):
+    """Convert task queue partitions to the template context.
+
+    Args:
+        partitions: dict of `<namespace>/<task queue>` to `read` and `write` partitions.
+
+    Returns:
+        List of dicts with the namespace, task queue, read and write partitions.
+    """
+    context = []
+    for task_queue, counts in sorted(partitions.items()):
+        namespace, _, task_queue_name = task_queue.partition("/")
+        context.append({"namespace": namespace, "task_queue": task_queue_name, **counts})
+    return context
+
+
+def _positive_number(name, value, integer=True):
+    """Validate a rate limit value.
+
+    Args:
+        name: name of the limit, used in errors.
+        value: value to validate.
+        integer: whether the value must be an integer.
+
+    Returns:
+        The value.
+
+    Raises:
+        ValueError: if the value is not a positive number.
+    """
+    types = int if integer else (int, float)
+    if isinstance(value, bool) or not isinstance(value, types) or value <= 0:
+        raise ValueError(f"rate-limits: {name} must be a positive {'integer' if integer else 'number'}")
+    return value
+
+
+def parse_namespace_rps_limit(raw):
+    """Parse the `namespace-rps-limit` option.
+
+    Args:
+        raw: pipe-separated `<namespace>:<rps>` pairs.
+
+    Returns:
+        Dict of namespace to requests per second.
+
+    Raises:
+        ValueError: if the option is not valid.
+    """
+    limits = {}
+    for pair in filter(None, (pair.strip() for pair in raw.split("|"))):
+        namespace, _, rps = pair.partition(":")
+        namespace = namespace.strip()
+        if not namespace or not rps.strip().isdigit():
+            raise ValueError(f"namespace-rps-limit: invalid entry {pair!r}, expected <namespace>:<rps>")
+        if namespace in limits:
+            raise ValueError(f"namespace-rps-limit: duplicate namespace {namespace!r}")
+        limits[namespace] = int(rps)
+    return limits
+
+
+def _merge_namespace_rps(namespace_rps, value):
+    """Merge the `frontend.namespace-rps` rate limits with the namespace-rps-limit ones.
+
+    Args:
+        namespace_rps: dict of namespace to requests per second, updated in place.
+        value: value of `frontend.namespace-rps`.
+
+    Raises:
+        ValueError: if the value is not valid or sets a namespace twice.
+    """
+    if not isinstance(value, dict):
+        raise ValueError("rate-limits: frontend.namespace-rps must be a mapping of namespace to rps")
+    for namespace, rps in value.items():
+        if namespace in namespace_rps:
+            raise ValueError(f"rate-limits: namespace {namespace!r} is also set in namespace-rps-limit")
+        namespace_rps[namespace] = _positive_number(f"frontend.namespace-rps.{namespace}", rps)
+
+
+def parse_rate_limits(raw, global_rps_limit, namespace_rps_limit):
+    """Parse and validate the rate limits into dynamic config entries.
+
+    The `rate-limits` option is a YAML mapping of the sections of
+    `RATE_LIMIT_KEYS`, the `frontend` section also accepts a `namespace-rps`
+    mapping of namespace to requests per second, merged with the
+    `global-rps-limit` and `namespace-rps-limit` options.
+
+    Args:
+        raw: YAML string of the `rate-limits` option.
+        global_rps_limit: value of the `global-rps-limit` option.
+        namespace_rps_limit: value of the `namespace-rps-limit` option.
+
+    Returns:
+        Dict of dynamic config keys to the list of their values, each value
+        being a dict with a `value` and optional `constraints`.
+
+    Raises:
+        ValueError: if the rate limits are not valid.
+    """
+    limits = _load_mapping("rate-limits", raw)
+    namespace_rps = parse_namespace_rps_limit(namespace_rps_limit)
+    entries = {}
+    for section, values in limits.items():
+        if section not in RATE_LIMIT_KEYS:
+            raise ValueError(f"rate-limits: unknown section {section!r}, expected one of {', '.join(RATE_LIMIT_KEYS)}")
+        if not isinstance(values, dict):
+            raise ValueError(f"rate-limits: {section} must be a mapping of limits")
+        for name, value in values.items():
+            if section == "frontend" and name == "namespace-rps":
+                _merge_namespace_rps(namespace_rps, value)
+                continue
+            if name not in RATE_LIMIT_KEYS[section]:
+                raise ValueError(f"rate-limits: unknown limit {section}.{name}")
+            value = _positive_number(f"{section}.{name}", value, integer=name != "namespace-burst-ratio")
+            entries[RATE_LIMIT_KEYS[section][name]] = [{"value": value, "constraints": {}}]
+
+    namespace_entries = [{"value": global_rps_limit, "constraints": {}}] if global_rps_limit else []
+    namespace_entries += [
+        {"value": rps, "constraints": {"namespace": namespace}} for namespace, rps in namespace_rps.items()
+    ]
+    if namespace_entries:
+        entries = {NAMESPACE_RPS_KEY: namespace_entries, **entries}
+    return entries
+
+
+def _merge_persistence_max_qps(rate_limits, options, services):
+    """Merge the per-role `<service>-persistence-max-qps` options into the rate limits.
+
+    Only the services run by the unit are rendered, so that applications
+    running different roles keep separate database budgets. An option set
+    together with its limit in `rate-limits` is rejected on every unit,
+    whichever services it runs, rather than one silently taking precedence.
+
+    Args:
+        rate_limits: dict of dynamic config keys to entries, updated in place.
+        options: dict of the dynamic config options.
+        services: services run by the unit.
+
+    Raises:
+        ValueError: if an option is negative or also set in `rate-limits`.
+    """
+    for service, section in RATE_LIMIT_KEYS.items():
+        if "persistence-max-qps" not in section:
+            continue
+        option = f"{service}-persistence-max-qps"
+        value = options.get(option, 0)
+        if value < 0:
+            raise ValueError(f"{option}: must be positive, or 0 to keep Temporal's default")
+        if not value:
+            continue
+        key = section["persistence-max-qps"]
+        if key in rate_limits:
+            raise ValueError(f"{option}: {service}.persistence-max-qps is also set in rate-limits")
+        if service in services:
+            rate_limits[key] = [{"value": value, "constraints": {}}]
+
+
+def dynamic_config_context(options, task_queue_partitions, services=(), secondary_visibility=None):
+    """Build the context of the dynamic config template.
+
+    Args:
+        options: dict of the dynamic config options, see `DYNAMIC_CONFIG_OPTIONS`.
+        task_queue_partitions: dict of `<namespace>/<task queue>` to `read` and `write` partitions.
+        services: services run by the unit, the per-role options of the others are ignored.
+        secondary_visibility: use of the secondary visibility store, one of
+            `SECONDARY_VISIBILITY_MODES`, or None if there is none.
+
+    Returns:
+        The template context.
+
+    Raises:
+        ValueError: if an option is not valid.
+    """
+    rate_limits = parse_rate_limits(options["rate-limits"], options["global-rps-limit"], options["namespace-rps-limit"])
+    _merge_persistence_max_qps(rate_limits, options, services)
+    if secondary_visibility:
+        writing_mode, read_from_secondary = SECONDARY_VISIBILITY_MODES[secondary_visibility]
+        rate_limits["system.secondaryVisibilityWritingMode"] = [{"value": writing_mode, "constraints": {}}]
+        rate_limits["system.enableReadFromSecondaryVisibility"] = [{"value": read_from_secondary, "constraints": {}}]
+    return {
+        "RATE_LIMITS": rate_limits,
+        "LONG_POLL_INTERVAL": options["long-poll-interval"],
+        "TASK_QUEUE_PARTITIONS": task_queue_partitions_context(task_queue_partitions),
+        "DYNAMIC_CONFIG": parse_dynamic_config(options["dynamic-config"]),
+    }
@@ -0,0 +1,109 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Tuning of the Go runtime of the Temporal server from its container limits.
+
+The Go runtime sizes itself from the host, not from the cgroup of its
+container: it runs as many threads as the node has cores, and only collects
+garbage once the heap has doubled. In a container with a CPU quota, this gets
+the server throttled, and with a memory limit, OOM killed before the garbage
+collector kicks in. The runtime is thus told the limits of the container.
+"""
+
+import math
+import re
+
+# cgroup v2 files, then their cgroup v1 equivalents.
+CGROUP_CPU_FILES = ("/sys/fs/cgroup/cpu.max", "/sys/fs/cgroup/cpu/cpu.cfs_quota_us")
+CGROUP_CPU_PERIOD_V1_FILE = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+CGROUP_MEMORY_FILES = ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes")
+
+# cgroup v1 reports an unlimited memory as the largest page aligned value.
+CGROUP_V1_UNLIMITED_MEMORY = 2**62
+
+# Share of the memory limit given to the Go heap, the rest is left to the
+# goroutine stacks, cgo and the page cache.
+GO_MEMORY_LIMIT_RATIO = 0.9
+
+GO_MEMORY_LIMIT_PATTERN = r"\d+(B|KiB|MiB|GiB|TiB)?"
+
+
+def parse_cpu_limit(cpu_max, cfs_period=None):
+    """Parse the CPU quota of a cgroup.
+
+    Args:
+        cpu_max: content of `cpu.max` (cgroup v2), e.g. `200000 100000`, or of
+            `cpu.cfs_quota_us` (cgroup v1), e.g. `200000`.
+        cfs_period: content of `cpu.cfs_period_us` with cgroup v1.
+
+    Returns:
+        The number of cores the cgroup may use, or None if unlimited.
+    """
+    fields = cpu_max.split()
+    if not fields or fields[0] in ("max", "-1"):
+        return None
+    period = fields[1] if len(fields) > 1 else (cfs_period or "100000").strip()
+    return int(fields[0]) / int(period)
+
+
+def parse_memory_limit(memory_max):
+    """Parse the memory limit of a cgroup.
+
+    Args:
+        memory_max: content of `memory.max` (cgroup v2) or of
+            `memory.limit_in_bytes` (cgroup v1).
+
+    Returns:
+        The limit in bytes, or None if unlimited.
+    """
+    value = memory_max.strip()
+    if not value or value == "max" or int(value) >= CGROUP_V1_UNLIMITED_MEMORY:
+        return None
+    return int(value)
+
+
+def validate_go_runtime_options(options):
+    """Validate the Go runtime overrides.
+
+    Args:
+        options: dict of the `go-max-procs`, `go-memory-limit` and `go-gc` options.
+
+    Raises:
+        ValueError: if an option is not valid.
+    """
+    if options["go-max-procs"] < 0:
+        raise ValueError("value of 'go-max-procs' must be >= 0")
+    if options["go-memory-limit"] and not re.fullmatch(GO_MEMORY_LIMIT_PATTERN, options["go-memory-limit"]):
+        raise ValueError("value of 'go-memory-limit' must be a size in bytes, e.g. 3GiB")
+    if options["go-gc"] and not (options["go-gc"] == "off" or options["go-gc"].isdigit()):
+        raise ValueError("value of 'go-gc' must be a percentage or 'off'")
+
+
+def go_runtime_env(cgroup_limits, options):
+    """Build the Go runtime environment of the server.
+
+    Args:
+        cgroup_limits: dict of the `cpu` cores and `memory` bytes the container
+            may use, None when unlimited.
+        options: dict of the `go-max-procs`, `go-memory-limit` and `go-gc`
+            overrides, unset when empty.
+
+    Returns:
+        Dict of the `GOMAXPROCS`, `GOMEMLIMIT` and `GOGC` variables to set.
+    """
+    env = {}
+    if options["go-max-procs"]:
+        env["GOMAXPROCS"] = options["go-max-procs"]
+    elif cgroup_limits.get("cpu"):
+        # Like the runtime with the host cores, a fractional quota is rounded
+        # down, so that the threads do not outrun it.
+        env["GOMAXPROCS"] = max(1, math.floor(cgroup_limits["cpu"]))
+
+    if options["go-memory-limit"]:
+        env["GOMEMLIMIT"] = options["go-memory-limit"]
+    elif cgroup_limits.get("memory"):
+        env["GOMEMLIMIT"] = f"{int(cgroup_limits['memory'] * GO_MEMORY_LIMIT_RATIO) // 2**20}MiB"
+
+    if options["go-gc"]:
+        env["GOGC"] = options["go-gc"]
+    return env
@@ -0,0 +1,89 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Prometheus metrics of the charm event handlers.
+
+The last profile of every handler is kept as gauges in a textfile in the agent
+directory of the unit which, unlike the charm directory, is not replaced when
+the charm is upgraded, for a textfile collector to pick up.
+"""
+
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+HOOK_METRICS_FILE = "hook-metrics.prom"
+HOOK_METRICS_PREFIX = "temporal_charm_handler_"
+HOOK_METRICS = {
+    "wall_time_seconds": "Wall time of the last run of the charm event handler.",
+    "pebble_calls": "Pebble API calls made by the last run of the charm event handler.",
+    "relation_reads": "Peer relation state keys read by the last run of the charm event handler.",
+    "relation_writes": "Peer relation state keys set or deleted by the last run of the charm event handler.",
+    "http_calls": "HTTP requests made by the last run of the charm event handler.",
+}
+
+
+def metrics_path():
+    """Return the path of the metrics textfile of the unit.
+
+    Returns:
+        The path of the textfile in the agent directory, or None outside of a hook.
+    """
+    charm_dir = os.environ.get("JUJU_CHARM_DIR")
+    if not charm_dir:
+        return None
+    return os.path.join(os.path.dirname(os.path.abspath(charm_dir)), HOOK_METRICS_FILE)
+
+
+def write_sample(path, handler, profile):
+    """Update the handler samples in a Prometheus textfile.
+
+    The file uses the Prometheus text exposition format and keeps the last
+    sample of every handler that ran on this unit.
+
+    Args:
+        path: path of the textfile.
+        handler: name of the event handler.
+        profile: dict of the handler's measurements.
+    """
+    samples = {}
+    try:
+        with open(path, encoding="utf-8") as metrics_file:
+            for line in metrics_file:
+                if line.strip() and not line.startswith("#"):
+                    series, value = line.rsplit(" ", 1)
+                    samples[series] = value.strip()
+    except FileNotFoundError:
+        pass
+
+    for metric in HOOK_METRICS:
+        samples[f'{HOOK_METRICS_PREFIX}{metric}{{handler="{handler}"}}'] = str(profile[metric])
+
+    lines = []
+    for metric, description in HOOK_METRICS.items():
+        name = f"{HOOK_METRICS_PREFIX}{metric}"
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(f"{series} {value}" for series, value in sorted(samples.items()) if series.startswith(name + "{"))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as metrics_file:
+        metrics_file.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+
+
+def record(handler, profile):
+    """Record the profile of a handler in the metrics textfile of the unit.
+
+    Args:
+        handler: name of the event handler.
+        profile: dict of the handler's measurements.
+    """
+    path = metrics_path()
+    if not path:
+        return
+    try:
+        write_sample(path, handler, profile)
+    except OSError as err:
+        logger.debug("could not write hook metrics: %s", err)
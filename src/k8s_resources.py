@@ -0,0 +1,162 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Kubernetes compute resources of the Temporal server container.
+
+Juju does not set the resources of the workload container, so the charm
+patches the StatefulSet of the application once one of the resource options
+is set. Each Temporal service has its own defaults, the history service being
+the heaviest, and a unit running several services gets the sum of their
+resources for the options that are not set.
+"""
+
+# lightkube, whose package also imports its client and httpx, is only needed
+# when the resources are applied, so it is imported where it is used.
+# pylint: disable=import-outside-toplevel
+
+import decimal
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Resource requests and limits of each service.
+SERVICE_RESOURCES = {
+    "frontend": {"cpu-request": "500m", "memory-request": "512Mi", "cpu-limit": "2", "memory-limit": "2Gi"},
+    "history": {"cpu-request": "1", "memory-request": "2Gi", "cpu-limit": "4", "memory-limit": "8Gi"},
+    "matching": {"cpu-request": "500m", "memory-request": "1Gi", "cpu-limit": "2", "memory-limit": "4Gi"},
+    "worker": {"cpu-request": "250m", "memory-request": "256Mi", "cpu-limit": "1", "memory-limit": "1Gi"},
+}
+
+RESOURCE_OPTIONS = ("cpu-request", "cpu-limit", "memory-request", "memory-limit")
+
+QUANTITY_PATTERNS = {
+    "cpu": r"(\d+(\.\d+)?)(m?)",
+    "memory": r"(\d+(\.\d+)?)(([KMGT]i?)?)",
+}
+
+# Multiplier of each quantity suffix allowed by `QUANTITY_PATTERNS`.
+QUANTITY_SUFFIXES = {
+    "": 1,
+    "m": decimal.Decimal("0.001"),
+    **{suffix: 1000**power for power, suffix in enumerate("KMGT", 1)},
+    **{f"{suffix}i": 1024**power for power, suffix in enumerate("KMGT", 1)},
+}
+
+
+def _parse_quantity(option, value):
+    """Parse a Kubernetes quantity.
+
+    Args:
+        option: name of the option holding the quantity.
+        value: the quantity, e.g. `500m` or `2Gi`.
+
+    Returns:
+        The quantity in cores or bytes, as a Decimal.
+
+    Raises:
+        ValueError: if the quantity is not valid.
+    """
+    match = re.fullmatch(QUANTITY_PATTERNS[option.split("-")[0]], value)
+    if not match:
+        raise ValueError(f"value of '{option}' must be a Kubernetes quantity, e.g. 500m or 2Gi")
+    return decimal.Decimal(match.group(1)) * QUANTITY_SUFFIXES[match.group(3)]
+
+
+def _format_quantity(option, quantity):
+    """Format a quantity of cores or bytes for Kubernetes.
+
+    Args:
+        option: name of the option holding the quantity.
+        quantity: the quantity in cores or bytes.
+
+    Returns:
+        The quantity in millicores or mebibytes.
+    """
+    if option.startswith("cpu"):
+        return f"{int(quantity * 1000)}m"
+    return f"{int(quantity) // 2**20}Mi"
+
+
+def resource_requirements(services, options):
+    """Compute the resources of the container running some services.
+
+    Args:
+        services: services run by the unit.
+        options: dict of the `cpu-request`, `cpu-limit`, `memory-request` and
+            `memory-limit` options, the service defaults apply when empty.
+
+    Returns:
+        Dict of `requests` and `limits` to their `cpu` and `memory`.
+
+    Raises:
+        ValueError: if an option is not valid, or a request exceeds its limit.
+    """
+    quantities = {}
+    for option in RESOURCE_OPTIONS:
+        if options[option]:
+            quantities[option] = _parse_quantity(option, options[option])
+        else:
+            quantities[option] = sum(
+                _parse_quantity(option, SERVICE_RESOURCES[service][option]) for service in services
+            )
+
+    for resource in ("cpu", "memory"):
+        if quantities[f"{resource}-request"] > quantities[f"{resource}-limit"]:
+            raise ValueError(f"value of '{resource}-request' must not exceed '{resource}-limit'")
+
+    return {
+        kind: {
+            resource: _format_quantity(resource, quantities[f"{resource}-{kind[:-1]}"])
+            for resource in ("cpu", "memory")
+        }
+        for kind in ("requests", "limits")
+    }
+
+
+def patch_container_resources(app_name, namespace, container_name, resources):
+    """Apply resources to a container of the StatefulSet of an application.
+
+    The StatefulSet is only patched when the resources differ, as patching
+    it restarts every pod of the application. Failures are logged rather than
+    raised, the server keeps running with its current resources, e.g. when the
+    application was deployed without `--trust`.
+
+    Args:
+        app_name: name of the application, and of its StatefulSet.
+        namespace: Kubernetes namespace of the model.
+        container_name: name of the container.
+        resources: dict of `requests` and `limits` to their `cpu` and `memory`.
+
+    Returns:
+        True if the StatefulSet was patched, False if it was up to date or
+        could not be patched.
+    """
+    # lightkube sends its requests with httpx2, whose transport errors are
+    # not wrapped in ApiError.
+    import httpx2 as httpx
+    from lightkube import ApiError, Client, ConfigError
+    from lightkube.resources.apps_v1 import StatefulSet
+    from lightkube.utils.quantity import equals_canonically
+
+    try:
+        client = Client(field_manager=app_name)
+        statefulset = client.get(StatefulSet, name=app_name, namespace=namespace)
+        container = next(
+            container for container in statefulset.spec.template.spec.containers if container.name == container_name
+        )
+        current = container.resources
+        if (
+            current
+            and equals_canonically(current.requests or {}, resources["requests"])
+            and equals_canonically(current.limits or {}, resources["limits"])
+        ):
+            return False
+
+        logger.info("patching the resources of the %s container: %s", container_name, resources)
+        patch = {"spec": {"template": {"spec": {"containers": [{"name": container_name, "resources": resources}]}}}}
+        client.patch(StatefulSet, name=app_name, obj=patch, namespace=namespace)
+    except (ApiError, ConfigError, httpx.HTTPError) as err:
+        logger.error("failed to apply the resources of the %s container: %s", container_name, err)
+        return False
+    return True
@@ -10,10 +10,20 @@ from enum import Enum
 VALID_LOG_LEVELS = ["info", "debug", "warning", "error", "critical"]
 DB_NAME = "temporal-k8s_db"
 VISIBILITY_DB_NAME = "temporal-k8s_visibility"
+VISIBILITY_TARGET_DB_NAME = "temporal-k8s_visibility_target"
+VISIBILITY_TARGET_RELATION_NAME = "visibility-target"
 ALLOWED_OFGA_ROLES = ["admin", "writer", "reader"]
 REQUIRED_OPENFGA_KEYS = ["store_id", "address", "port", "scheme", "token"]
 REQUIRED_S3_PARAMETERS = ["region", "endpoint", "aws_access_key_id", "aws_secret_access_key"]
 DEFAULT_DB_DICT = {"db": None, "visibility": None}
+VALID_POOLER_MODES = ["none", "session", "transaction"]
+VALID_ADVANCED_VISIBILITY_MODES = ["off", "dual-write", "dual-read", "on"]
+# Must match the failoverVersionIncrement of the cluster metadata template.
+FAILOVER_VERSION_INCREMENT = 10
+VALID_VISIBILITY_MIGRATION_MODES = ["off", "dual-write", "dual-read", "complete"]
+OPENSEARCH_RELATION_NAME = "opensearch"
+OPENSEARCH_VISIBILITY_INDEX = "temporal_visibility_v1"
+OPENSEARCH_CA_PATH = "/etc/temporal/config/certs/opensearch-ca.pem"
 
 SERVICE_PORTS = {
     "frontend": {
@@ -39,6 +49,26 @@ SERVICE_PORTS = {
 }
 
 PROMETHEUS_PORT = 9090
+
+PROFILES_DIR = "/var/lib/temporal/profiles"
+PROFILE_TYPES = ["cpu", "heap", "goroutine", "mutex", "block"]
+
+# Config options that are only rendered into the dynamic config file. The
+# server polls that file, so changing them never requires a restart. All the
+# other options are static.
+DYNAMIC_CONFIG_OPTIONS = (
+    "global-rps-limit",
+    "namespace-rps-limit",
+    "rate-limits",
+    "long-poll-interval",
+    "dynamic-config",
+    "task-queue-partitions",
+    "frontend-persistence-max-qps",
+    "history-persistence-max-qps",
+    "matching-persistence-max-qps",
+    "worker-persistence-max-qps",
+)
+MIN_DYNAMIC_CONFIG_POLL_INTERVAL_SECONDS = 5
 WORKLOAD_VERSION = "1.23.1"
 
 
@@ -1,13 +1,108 @@
 # Copyright 2024 Canonical Ltd.
 # See LICENSE file for licensing details.
 
-"""Define logging helpers."""
+"""Define logging and profiling helpers."""
 
+import collections
 import functools
+import json
+import time
+
+import hook_metrics
+
+COUNTED_CALLS = ("pebble_calls", "relation_reads", "relation_writes", "http_calls")
+
+# Methods of the workload container that make a Pebble API call.
+PEBBLE_METHODS = frozenset(
+    (
+        "can_connect",
+        "autostart",
+        "replan",
+        "start",
+        "restart",
+        "stop",
+        "add_layer",
+        "get_plan",
+        "get_services",
+        "get_service",
+        "get_checks",
+        "get_check",
+        "pull",
+        "push",
+        "list_files",
+        "push_path",
+        "pull_path",
+        "exists",
+        "isdir",
+        "make_dir",
+        "remove_path",
+        "exec",
+        "send_signal",
+    )
+)
+
+# Calls made by the charm since the process started.
+_counters: collections.Counter = collections.Counter()
+
+
+def count_call(kind, count=1):
+    """Count calls made by the charm, for the profile of the running handler.
+
+    Args:
+        kind: one of `COUNTED_CALLS`.
+        count: number of calls made.
+    """
+    _counters[kind] += count
+
+
+class ProfiledContainer:
+    """Proxy of a workload container counting the Pebble calls made through it."""
+
+    def __init__(self, container):
+        """Construct.
+
+        Args:
+            container: the workload container.
+        """
+        self._container = container
+
+    def __getattr__(self, name):
+        """Get an attribute of the container, counting its Pebble calls.
+
+        Args:
+            name: name of the attribute.
+
+        Returns:
+            The attribute of the container.
+        """
+        attr = getattr(self._container, name)
+        if name not in PEBBLE_METHODS:
+            return attr
+
+        @functools.wraps(attr)
+        def counted(*args, **kwargs):
+            """Count the call and run the container method.
+
+            Args:
+                args: positional arguments of the container method.
+                kwargs: keyword arguments of the container method.
+
+            Returns:
+                The result of the container method.
+            """
+            count_call("pebble_calls")
+            return attr(*args, **kwargs)
+
+        return counted
 
 
 def log_event_handler(logger):
-    """Log with the provided logger when a event handler method is executed.
+    """Log and profile with the provided logger when a event handler method is executed.
+
+    Besides the start and end of the handler, a structured `* profile` line is
+    logged with its wall time and the number of Pebble calls, peer relation
+    state reads and writes and HTTP requests made by the charm. The same
+    measurements are recorded as Prometheus metrics (see `hook_metrics`).
 
     Args:
         logger: logger used to log events.
@@ -36,11 +131,18 @@ def log_event_handler(logger):
             Returns:
                 Decorated method.
             """
-            logger.info(f"* running {self.__class__.__name__}.{method.__name__}")
+            handler = f"{self.__class__.__name__}.{method.__name__}"
+            logger.info(f"* running {handler}")
+            counters = _counters.copy()
+            start = time.monotonic()
             try:
                 return method(self, event)
             finally:
-                logger.info(f"* completed {self.__class__.__name__}.{method.__name__}")
+                profile = {"handler": handler, "wall_time_seconds": round(time.monotonic() - start, 6)}
+                profile.update({kind: _counters[kind] - counters[kind] for kind in COUNTED_CALLS})
+                logger.info(f"* completed {handler}")
+                logger.info(f"* profile {json.dumps(profile)}")
+                hook_metrics.record(handler, profile)
 
         return decorated
 
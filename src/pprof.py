@@ -0,0 +1,169 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""On-demand profiling of the Temporal server.
+
+When `pprof-port` is set, the server serves the Go profiles on that port of
+the loopback interface of the pod. The `capture-profile` action fetches one
+of them from within the workload container, and keeps it there, optionally
+uploading it to the archival bucket of the s3-parameters relation.
+"""
+
+# boto3 is slow to import and only needed to upload profiles, so it is
+# imported where it is used.
+# pylint: disable=import-outside-toplevel
+
+import logging
+import time
+
+from ops import framework
+from ops.pebble import APIError, ChangeError, ExecError
+
+from literals import PROFILE_TYPES, PROFILES_DIR
+from log import log_event_handler
+
+logger = logging.getLogger(__name__)
+
+# Path of each profile type under /debug/pprof, the CPU profile is sampled
+# for the requested duration.
+PROFILE_PATHS = {
+    "cpu": "profile",
+    "heap": "heap",
+    "goroutine": "goroutine",
+    "mutex": "mutex",
+    "block": "block",
+}
+
+# Number of captured profiles kept in the container.
+MAX_PROFILES = 10
+
+# Time allowed on top of the profile duration for the server to respond.
+FETCH_GRACE_SECONDS = 30
+
+
+class Pprof(framework.Object):
+    """Action capturing profiles of the Temporal server."""
+
+    def __init__(self, charm):
+        """Construct.
+
+        Args:
+            charm: The charm to attach the hooks to.
+        """
+        super().__init__(charm, "pprof")
+        self.charm = charm
+        charm.framework.observe(charm.on.capture_profile_action, self._on_capture_profile_action)
+
+    @log_event_handler(logger)
+    def _on_capture_profile_action(self, event):
+        """Capture a profile of the Temporal server.
+
+        Args:
+            event: The event triggered when the action is performed.
+        """
+        port = self.charm.config["pprof-port"]
+        if not port:
+            event.fail("profiling is disabled, set the pprof-port config option first")
+            return
+
+        profile = event.params["profile"]
+        duration = event.params["duration"]
+        if profile not in PROFILE_TYPES:
+            event.fail(f"profile must be one of {', '.join(PROFILE_TYPES)}")
+            return
+        if duration < 1:
+            event.fail("duration must be >= 1")
+            return
+
+        container = self.charm.container
+        if not container.can_connect():
+            event.fail("temporal container not ready")
+            return
+
+        # Profiles are served as gzipped protocol buffers, they are stored as is.
+        unit_name = self.charm.unit.name.replace("/", "-")
+        filename = f"{unit_name}-{profile}-{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}.pb.gz"
+        path = f"{PROFILES_DIR}/{filename}"
+
+        event.log(f"capturing {profile} profile")
+        try:
+            self._fetch_profile(container, port, profile, duration, path)
+        except ValueError as err:
+            event.fail(str(err))
+            return
+
+        self._remove_old_profiles(container)
+        results = {"path": path, "size": container.list_files(path)[0].size}
+
+        if event.params["upload"]:
+            try:
+                results["uri"] = self._upload_profile(container, path, f"profiles/{filename}")
+            except ValueError as err:
+                event.fail(f"profile saved to {path}, but {err}")
+                return
+
+        logger.info("captured %s profile to %s", profile, path)
+        event.set_results(results)
+
+    def _fetch_profile(self, container, port, profile, duration, path):
+        """Fetch a profile from the server into a file of the container.
+
+        Args:
+            container: application container
+            port: port of the pprof server.
+            profile: type of the profile.
+            duration: seconds during which the CPU profile is sampled.
+            path: path of the profile in the container.
+
+        Raises:
+            ValueError: if the profile could not be fetched.
+        """
+        url = f"http://localhost:{port}/debug/pprof/{PROFILE_PATHS[profile]}"
+        if profile == "cpu":
+            url += f"?seconds={duration}"
+
+        container.make_dir(PROFILES_DIR, make_parents=True)
+        command = ["curl", "--silent", "--show-error", "--fail", "--output", path, url]
+        try:
+            container.exec(command, timeout=duration + FETCH_GRACE_SECONDS).wait_output()
+        except ExecError as err:
+            raise ValueError(f"failed to capture the {profile} profile: {(err.stderr or '').strip()}") from err
+        except (ChangeError, APIError) as err:
+            raise ValueError(f"failed to capture the {profile} profile: {err}") from err
+
+    def _upload_profile(self, container, path, key):
+        """Upload a profile to the bucket of the s3-parameters relation.
+
+        Args:
+            container: application container
+            path: path of the profile in the container.
+            key: key of the profile in the bucket.
+
+        Returns:
+            The URI of the uploaded profile.
+
+        Raises:
+            ValueError: if the profile could not be uploaded.
+        """
+        s3 = self.charm._state.s3 if self.charm._state.is_ready() else None
+        if not s3 or not s3.get("bucket_created"):
+            raise ValueError("the s3-parameters relation is not ready to upload it")
+
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        from relations.s3_archival import upload_object
+
+        try:
+            return upload_object(s3, key, container.pull(path, encoding=None).read())
+        except (BotoCoreError, ClientError) as err:
+            raise ValueError(f"failed to upload it: {err}") from err
+
+    def _remove_old_profiles(self, container):
+        """Remove the oldest profiles, keeping the `MAX_PROFILES` most recent ones.
+
+        Args:
+            container: application container
+        """
+        profiles = sorted(container.list_files(PROFILES_DIR, pattern="*.pb.gz"), key=lambda info: info.last_modified)
+        for info in profiles[:-MAX_PROFILES]:
+            container.remove_path(info.path)
@@ -3,29 +3,21 @@
 
 """Define the Temporal server openfga relation."""
 
+# The OpenFGA SDK and requests are slow to import and only needed by the
+# authorization actions, so they are imported where they are used.
+# pylint: disable=import-outside-toplevel
+
 import asyncio
 import json
 import logging
 from enum import Enum
 from urllib.parse import urlsplit
 
-import requests
 from charms.openfga_k8s.v1.openfga import OpenFGAStoreCreateEvent
-from openfga_sdk import ReadRequestTupleKey, TupleKey
-from openfga_sdk.client import ClientConfiguration, OpenFgaClient
-from openfga_sdk.client.models.check_request import ClientCheckRequest
-from openfga_sdk.client.models.list_objects_request import ClientListObjectsRequest
-from openfga_sdk.client.models.tuple import ClientTuple
-from openfga_sdk.client.models.write_request import ClientWriteRequest
-from openfga_sdk.credentials import CredentialConfiguration, Credentials
-from openfga_sdk.exceptions import ApiException
-from openfga_sdk.models.check_response import CheckResponse
-from openfga_sdk.models.read_response import ReadResponse
 from ops import framework
-from requests.exceptions import RequestException
 
 from literals import ALLOWED_OFGA_ROLES
-from log import log_event_handler
+from log import count_call, log_event_handler
 
 logger = logging.getLogger(__name__)
 
@@ -70,10 +62,11 @@ class OpenFGA(framework.Object):
         super().__init__(charm, "openfga")
         self.charm = charm
         # Register OpenFGA relation handlers.
-        charm.framework.observe(
-            charm.openfga.on.openfga_store_created,
-            self._on_openfga_store_created,
-        )
+        if charm.openfga:
+            charm.framework.observe(
+                charm.openfga.on.openfga_store_created,
+                self._on_openfga_store_created,
+            )
 
         charm.framework.observe(
             charm.on.create_authorization_model_action,
@@ -182,11 +175,15 @@ class OpenFGA(framework.Object):
             event.fail("failed to parse model json")
             return
 
+        import requests
+        from requests.exceptions import RequestException
+
         openfga_data = self.charm._state.openfga
         url = f"{openfga_data['scheme']}://{openfga_data['address']}:{openfga_data['port']}/stores/{openfga_data['store_id']}/authorization-models"
         headers = _build_headers(openfga_data)
 
         try:
+            count_call("http_calls")
             response = requests.post(url, json=model_json, headers=headers, timeout=10)
         except RequestException as e:
             event.fail(f"failed to create authorization model: {e}")
@@ -254,6 +251,10 @@ class OpenFGA(framework.Object):
         role = event.params.get("role")
         openfga_data = self.charm._state.openfga
 
+        from openfga_sdk.client.models.check_request import ClientCheckRequest
+        from openfga_sdk.exceptions import ApiException
+        from openfga_sdk.models.check_response import CheckResponse
+
         if user and group:
             body = ClientCheckRequest(
                 user=f"user:{user}",
@@ -303,6 +304,9 @@ class OpenFGA(framework.Object):
                 {"result": "command succeeded", "output": "no admin groups set in 'auth-admin-groups' config"}
             )
 
+        from openfga_sdk import ReadRequestTupleKey
+        from openfga_sdk.exceptions import ApiException
+
         try:
             for admin_group in admin_groups:
                 body = ReadRequestTupleKey(
@@ -366,6 +370,10 @@ class OpenFGA(framework.Object):
         role = event.params.get("role")
         openfga_data = self.charm._state.openfga
 
+        from openfga_sdk.client.models.tuple import ClientTuple
+        from openfga_sdk.client.models.write_request import ClientWriteRequest
+        from openfga_sdk.exceptions import ApiException
+
         if user:
             op_tuple = [
                 ClientTuple(
@@ -469,6 +477,9 @@ def _get_ofga_client(openfga_data):
         OpenFgaClient: An initialized OpenFgaClient instance configured to interact
         with the OpenFGA store.
     """
+    from openfga_sdk.client import ClientConfiguration, OpenFgaClient
+    from openfga_sdk.credentials import CredentialConfiguration, Credentials
+
     configuration = ClientConfiguration(
         api_scheme=openfga_data["scheme"],
         api_host=f"{openfga_data['address']}:{openfga_data['port']}",
@@ -501,21 +512,27 @@ async def _perform_ofga_api_call(event, openfga_data, body, op_type):
     Raises:
         e: If an error occurs during the OpenFGA API call.
     """
+    from openfga_sdk.exceptions import ApiException
+
     ofga_client = _get_ofga_client(openfga_data)
 
     try:
         if op_type == OFGAOperationType.CHECK:
+            count_call("http_calls")
             response = await ofga_client.check(body)
         elif op_type == OFGAOperationType.LIST:
+            count_call("http_calls")
             response = await ofga_client.list_objects(body)
             response = response.objects
         elif op_type == OFGAOperationType.WRITE:
+            count_call("http_calls")
             await ofga_client.write(body)
             response = None
         elif op_type == OFGAOperationType.READ:
             continuation_token = ""  # nosec B105
             results = []
             while True:
+                count_call("http_calls")
                 read_response = await ofga_client.read(body)
                 results.extend(read_response.tuples)
                 continuation_token = read_response.continuation_token
@@ -537,6 +554,9 @@ async def _list_user_auth_rules(event, openfga_data):
         event: The event triggered when the action is performed.
         openfga_data: Object containing OpenFGA store data.
     """
+    from openfga_sdk.client.models.list_objects_request import ClientListObjectsRequest
+    from openfga_sdk.exceptions import ApiException
+
     results = {key: [] for key in ALLOWED_OFGA_ROLES}
     body = ClientListObjectsRequest(
         user=f"user:{event.params.get('user')}",
@@ -572,6 +592,9 @@ async def _list_group_auth_rules(event, openfga_data):
         event: The event triggered when the action is performed.
         openfga_data: Object containing OpenFGA store data.
     """
+    from openfga_sdk.client.models.list_objects_request import ClientListObjectsRequest
+    from openfga_sdk.exceptions import ApiException
+
     try:
         results = {key: [] for key in ALLOWED_OFGA_ROLES}
         for role in ALLOWED_OFGA_ROLES:
@@ -597,6 +620,10 @@ async def _list_namespace_auth_rules(event, openfga_data):
         event: The event triggered when the action is performed.
         openfga_data: object containing OpenFGA store data.
     """
+    from openfga_sdk import TupleKey
+    from openfga_sdk.exceptions import ApiException
+    from openfga_sdk.models.read_response import ReadResponse
+
     try:
         results = {key: [] for key in ALLOWED_OFGA_ROLES}
         body = TupleKey(
@@ -0,0 +1,216 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Define the Temporal server opensearch relation."""
+
+# requests is only needed to bootstrap the visibility index, so it is imported
+# where it is used.
+# pylint: disable=import-outside-toplevel
+
+import logging
+import tempfile
+
+from ops import framework
+
+from literals import OPENSEARCH_RELATION_NAME, OPENSEARCH_VISIBILITY_INDEX
+from log import count_call, log_event_handler
+
+logger = logging.getLogger(__name__)
+
+# Index template of Temporal's advanced visibility, see
+# https://github.com/temporalio/temporal/tree/main/schema/elasticsearch/visibility
+VISIBILITY_INDEX_TEMPLATE = {
+    "index_patterns": [f"{OPENSEARCH_VISIBILITY_INDEX}*"],
+    "template": {
+        "settings": {
+            "index": {
+                "number_of_shards": 5,
+                "auto_expand_replicas": "0-2",
+                "search.idle.after": "365d",
+                "sort.field": ["CloseTime", "StartTime", "RunId"],
+                "sort.order": ["desc", "desc", "desc"],
+                "sort.missing": ["_first", "_first", "_first"],
+            }
+        },
+        "mappings": {
+            "dynamic": "false",
+            "properties": {
+                "NamespaceId": {"type": "keyword"},
+                "TemporalNamespaceDivision": {"type": "keyword"},
+                "WorkflowId": {"type": "keyword"},
+                "RunId": {"type": "keyword"},
+                "WorkflowType": {"type": "keyword"},
+                "StartTime": {"type": "date_nanos"},
+                "ExecutionTime": {"type": "date_nanos"},
+                "CloseTime": {"type": "date_nanos"},
+                "ExecutionDuration": {"type": "long"},
+                "ExecutionStatus": {"type": "keyword"},
+                "TaskQueue": {"type": "keyword"},
+                "TemporalChangeVersion": {"type": "keyword"},
+                "BatcherNamespace": {"type": "keyword"},
+                "BatcherUser": {"type": "keyword"},
+                "BinaryChecksums": {"type": "keyword"},
+                "HistoryLength": {"type": "long"},
+                "StateTransitionCount": {"type": "long"},
+                "TemporalScheduledStartTime": {"type": "date_nanos"},
+                "TemporalScheduledById": {"type": "keyword"},
+                "TemporalSchedulePaused": {"type": "boolean"},
+                "HistorySizeBytes": {"type": "long"},
+                "BuildIds": {"type": "keyword"},
+                "ParentWorkflowId": {"type": "keyword"},
+                "ParentRunId": {"type": "keyword"},
+                "RootWorkflowId": {"type": "keyword"},
+                "RootRunId": {"type": "keyword"},
+            },
+        },
+    },
+}
+
+
+class OpenSearch(framework.Object):
+    """Client for opensearch:temporal relations."""
+
+    def __init__(self, charm):
+        """Construct.
+
+        Args:
+            charm: The charm to attach the hooks to.
+        """
+        super().__init__(charm, OPENSEARCH_RELATION_NAME)
+        self.charm = charm
+        if charm.opensearch:
+            charm.framework.observe(charm.opensearch.on.index_created, self._on_opensearch_changed)
+            charm.framework.observe(charm.opensearch.on.endpoints_changed, self._on_opensearch_changed)
+            charm.framework.observe(charm.opensearch.on.authentication_updated, self._on_opensearch_changed)
+            charm.framework.observe(charm.on.opensearch_relation_broken, self._on_opensearch_relation_broken)
+            charm.framework.observe(charm.on.update_status, self._on_update_status)
+
+    @log_event_handler(logger)
+    def _on_opensearch_changed(self, event):
+        """Store the connection details and bootstrap the visibility index.
+
+        Args:
+            event: The event triggered when the relation changed.
+        """
+        if not self.charm.unit.is_leader():
+            return
+
+        if not self.charm._state.is_ready():
+            event.defer()
+            return
+
+        relation_data = self.charm.opensearch.fetch_relation_data()[event.relation.id]
+        endpoints = [endpoint for endpoint in relation_data.get("endpoints", "").split(",") if ":" in endpoint]
+        if not endpoints or None in (relation_data.get("username"), relation_data.get("password")):
+            logger.info("opensearch:temporal relation: waiting for the index credentials")
+            return
+
+        host, port = endpoints[0].rsplit(":", 1)
+        opensearch = {
+            "scheme": "https" if relation_data.get("tls-ca") or relation_data.get("tls") == "True" else "http",
+            "host": host,
+            "port": port,
+            "username": relation_data["username"],
+            "password": relation_data["password"],
+            "tls_ca": relation_data.get("tls-ca"),
+            "index": OPENSEARCH_VISIBILITY_INDEX,
+            "index_ready": False,
+        }
+        opensearch["index_ready"] = self._bootstrap_visibility_index(opensearch)
+        self.charm._state.opensearch = opensearch
+        self.charm._update(event)
+
+    @log_event_handler(logger)
+    def _on_opensearch_relation_broken(self, event):
+        """Forget the connection details when the relation is removed.
+
+        Args:
+            event: The event triggered when the relation was broken.
+        """
+        if not self.charm.unit.is_leader():
+            return
+
+        if not self.charm._state.is_ready():
+            event.defer()
+            return
+
+        self.charm._state.opensearch = None
+        self.charm._update(event)
+
+    def _on_update_status(self, event):
+        """Retry bootstrapping the visibility index after a failure.
+
+        Args:
+            event: The `update-status` event.
+        """
+        if not self.charm.unit.is_leader() or not self.charm._state.is_ready():
+            return
+
+        opensearch = self.charm._state.opensearch
+        if not opensearch or opensearch["index_ready"]:
+            return
+
+        if self._bootstrap_visibility_index(opensearch):
+            self.charm._state.opensearch = {**opensearch, "index_ready": True}
+            self.charm._update(event)
+
+    def _bootstrap_visibility_index(self, opensearch):
+        """Create the visibility index template and index, if they do not exist.
+
+        The template has to exist before the index is created, as the index
+        sort settings cannot be changed afterwards. If the index already
+        exists, only the mappings of the template are applied to it.
+
+        Args:
+            opensearch: connection details of the opensearch relation.
+
+        Returns:
+            True if the index is ready to be used by Temporal.
+        """
+        import requests
+
+        url = f"{opensearch['scheme']}://{opensearch['host']}:{opensearch['port']}"
+        auth = (opensearch["username"], opensearch["password"])
+        with tempfile.NamedTemporaryFile("w", suffix=".pem") as ca_file:
+            verify = True
+            if opensearch["tls_ca"]:
+                ca_file.write(opensearch["tls_ca"])
+                ca_file.flush()
+                verify = ca_file.name
+
+            try:
+                count_call("http_calls")
+                response = requests.put(
+                    f"{url}/_index_template/{OPENSEARCH_VISIBILITY_INDEX}_template",
+                    json=VISIBILITY_INDEX_TEMPLATE,
+                    auth=auth,
+                    verify=verify,
+                    timeout=30,
+                )
+                if response.status_code == 403:
+                    logger.warning("opensearch:temporal relation: not allowed to create the visibility index template")
+                else:
+                    response.raise_for_status()
+
+                index_url = f"{url}/{opensearch['index']}"
+                count_call("http_calls", 2)
+                response = requests.head(index_url, auth=auth, verify=verify, timeout=30)
+                if response.status_code == 404:
+                    response = requests.put(index_url, auth=auth, verify=verify, timeout=30)
+                else:
+                    # The index was created by OpenSearch along with the relation
+                    # user, only its mappings can still be added.
+                    response = requests.put(
+                        f"{index_url}/_mapping",
+                        json=VISIBILITY_INDEX_TEMPLATE["template"]["mappings"],
+                        auth=auth,
+                        verify=verify,
+                        timeout=30,
+                    )
+                response.raise_for_status()
+            except requests.RequestException as err:
+                logger.error("opensearch:temporal relation: failed to bootstrap the visibility index: %s", err)
+                return False
+
+        logger.info("opensearch:temporal relation: visibility index %s is ready", opensearch["index"])
+        return True
@@ -8,7 +8,13 @@ import logging
 from ops import framework
 from ops.model import WaitingStatus
 
-from literals import DB_NAME, DEFAULT_DB_DICT, VISIBILITY_DB_NAME
+from literals import (
+    DB_NAME,
+    DEFAULT_DB_DICT,
+    VISIBILITY_DB_NAME,
+    VISIBILITY_TARGET_DB_NAME,
+    VISIBILITY_TARGET_RELATION_NAME,
+)
 from log import log_event_handler
 
 logger = logging.getLogger(__name__)
@@ -34,8 +40,15 @@ class Postgresql(framework.Object):
 
         charm.framework.observe(charm.visibility.on.database_created, self._on_database_changed)
         charm.framework.observe(charm.visibility.on.endpoints_changed, self._on_database_changed)
+        charm.framework.observe(charm.visibility.on.read_only_endpoints_changed, self._on_database_changed)
         charm.framework.observe(charm.on.visibility_relation_broken, self._on_database_relation_broken)
 
+        charm.framework.observe(charm.visibility_target.on.database_created, self._on_database_changed)
+        charm.framework.observe(charm.visibility_target.on.endpoints_changed, self._on_database_changed)
+        charm.framework.observe(
+            charm.on[VISIBILITY_TARGET_RELATION_NAME].relation_broken, self._on_database_relation_broken
+        )
+
     @log_event_handler(logger)
     def _on_database_changed(self, event) -> None:
         """Handle database creation/change events.
@@ -71,7 +84,10 @@ class Postgresql(framework.Object):
             event.defer()
             return
 
-        self._update_db_connections(event.relation.name, None)
+        if event.relation.name == VISIBILITY_TARGET_RELATION_NAME:
+            self.charm._state.visibility_target = None
+        else:
+            self._update_db_connections(event.relation.name, None)
         self.charm._update(event)
 
     # flake8: noqa: C901
@@ -93,18 +109,17 @@ class Postgresql(framework.Object):
             return False
 
         should_update = False
-        for rel_name in ["db", "visibility"]:
+        requirers = {
+            "db": self.charm.db,
+            "visibility": self.charm.visibility,
+            VISIBILITY_TARGET_RELATION_NAME: self.charm.visibility_target,
+        }
+        for rel_name, requirer in requirers.items():
             if self.charm.model.get_relation(rel_name) is None:
                 continue
 
-            if rel_name == "db":
-                relation_id = self.charm.db.relations[0].id
-                relation_data = self.charm.db.fetch_relation_data()[relation_id]
-            elif rel_name == "visibility":
-                relation_id = self.charm.visibility.relations[0].id
-                relation_data = self.charm.visibility.fetch_relation_data()[relation_id]
-            else:
-                return False
+            relation_id = requirer.relations[0].id
+            relation_data = requirer.fetch_relation_data()[relation_id]
 
             endpoints = relation_data.get("endpoints", "").split(",")
             if len(endpoints) < 1:
@@ -114,10 +129,21 @@ class Postgresql(framework.Object):
             if len(primary_endpoint) < 2:
                 continue
 
+            # Replicas are only published once the database has more than one
+            # unit, the first one is used for reads that tolerate lag.
+            replica_endpoint = relation_data.get("read-only-endpoints", "").split(",")[0].split(":")
+            if len(replica_endpoint) < 2:
+                replica_endpoint = [None, None]
+
+            # All the endpoints are kept so that the driver can fail over to
+            # a new primary without waiting for an endpoints changed event.
             db_conn = {
-                "dbname": DB_NAME if rel_name == "db" else VISIBILITY_DB_NAME,
+                "dbname": {"db": DB_NAME, "visibility": VISIBILITY_DB_NAME}.get(rel_name, VISIBILITY_TARGET_DB_NAME),
                 "host": primary_endpoint[0],
                 "port": primary_endpoint[1],
+                "endpoints": [endpoint.strip() for endpoint in endpoints if ":" in endpoint],
+                "read_only_host": replica_endpoint[0],
+                "read_only_port": replica_endpoint[1],
                 "password": relation_data.get("password"),
                 "user": relation_data.get("username"),
                 "tls": relation_data.get("tls") == "True" or self.charm.config["db-tls-enabled"],
@@ -126,13 +152,22 @@ class Postgresql(framework.Object):
             if None in (db_conn["user"], db_conn["password"]):
                 continue
 
-            fields_to_check = ["host", "user", "password", "tls"]
-            database_connections = self.charm._state.database_connections or {}
+            fields_to_check = ["host", "endpoints", "read_only_host", "user", "password", "tls"]
+            database_connections = {
+                **(self.charm._state.database_connections or {}),
+                VISIBILITY_TARGET_RELATION_NAME: self.charm._state.visibility_target,
+            }
             if any(
                 (database_connections.get(rel_name) or {}).get(field, "") != db_conn[field] for field in fields_to_check
             ):
                 should_update = True
 
+            # The migration target is not part of the connections provided
+            # to the admin charm, which only manages the current databases.
+            if rel_name == VISIBILITY_TARGET_RELATION_NAME:
+                self.charm._state.visibility_target = db_conn
+                continue
+
             self._update_db_connections(rel_name, db_conn)
             self.charm.admin._provide_db_info()
 
@@ -3,18 +3,19 @@
 
 """Archival implementation."""
 
+# boto3 is slow to import and only needed when the s3-parameters relation
+# changes, so it is imported where it is used.
+# pylint: disable=import-outside-toplevel
+
 import logging
 
-import boto3
-import botocore
-from botocore.exceptions import ClientError
 from charms.data_platform_libs.v0.s3 import (
     CredentialsChangedEvent,
     CredentialsGoneEvent,
 )
 from ops import framework
 
-from log import log_event_handler
+from log import count_call, log_event_handler
 
 logger = logging.getLogger(__name__)
 
@@ -30,8 +31,9 @@ class S3Integrator(framework.Object):
         """
         super().__init__(charm, "s3")
         self.charm = charm
-        charm.framework.observe(charm.s3_client.on.credentials_changed, self._on_s3_credentials_changed)
-        charm.framework.observe(charm.s3_client.on.credentials_gone, self._on_s3_credentials_gone)
+        if charm.s3_client:
+            charm.framework.observe(charm.s3_client.on.credentials_changed, self._on_s3_credentials_changed)
+            charm.framework.observe(charm.s3_client.on.credentials_gone, self._on_s3_credentials_gone)
 
     @log_event_handler(logger)
     def _on_s3_credentials_changed(self, event: CredentialsChangedEvent):
@@ -47,6 +49,8 @@ class S3Integrator(framework.Object):
         if missing_parameters:
             return
 
+        from botocore.exceptions import ClientError
+
         endpoint = _construct_endpoint(s3_parameters)
         bucket_created = True
 
@@ -131,6 +135,9 @@ def _construct_endpoint(s3_parameters):
     Returns:
         S3 service endpoint.
     """
+    import botocore.loaders
+    import botocore.regions
+
     # Use the provided endpoint if a region is not needed.
     endpoint = s3_parameters["endpoint"]
 
@@ -149,6 +156,41 @@ def _construct_endpoint(s3_parameters):
     return endpoint
 
 
+def _count_request(**kwargs):
+    """Count an HTTP request sent by boto3, without changing it.
+
+    Args:
+        kwargs: ignored.
+    """
+    count_call("http_calls")
+
+
+def upload_object(s3, key, body):
+    """Upload an object to the archival bucket.
+
+    Args:
+        s3: s3 parameters stored from the s3 integrator relation.
+        key: key of the object in the bucket.
+        body: content of the object.
+
+    Returns:
+        The URI of the object.
+
+    Raises:
+        ClientError: if the object could not be uploaded.
+    """
+    import boto3
+
+    session = boto3.session.Session(
+        aws_access_key_id=s3["aws_access_key_id"],
+        aws_secret_access_key=s3["aws_secret_access_key"],
+        region_name=s3["region"],
+    )
+    session.events.register("before-send.s3", _count_request)
+    session.client("s3", endpoint_url=s3["endpoint"]).put_object(Bucket=s3["bucket"], Key=key, Body=body)
+    return f"s3://{s3['bucket']}/{key}"
+
+
 def _create_bucket_if_not_exists(s3_parameters, endpoint):
     """Create the S3 bucket if it does not exist.
 
@@ -160,6 +202,9 @@ def _create_bucket_if_not_exists(s3_parameters, endpoint):
         e (ValueError): if a session could not be created.
         error (ClientError): if the bucket could not be created.
     """
+    import boto3
+    from botocore.exceptions import ClientError
+
     bucket_name = s3_parameters["bucket"]
     region = s3_parameters.get("region")
     session = boto3.session.Session(
@@ -167,6 +212,7 @@ def _create_bucket_if_not_exists(s3_parameters, endpoint):
         aws_secret_access_key=s3_parameters["secret-key"],
         region_name=s3_parameters["region"],
     )
+    session.events.register("before-send.s3", _count_request)
 
     try:
         s3 = session.resource("s3", endpoint_url=endpoint)
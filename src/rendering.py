@@ -0,0 +1,127 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Template rendering helpers.
+
+The Jinja environment is created once per process and templates are only
+parsed the first time they are used. When the charm is packed, the templates
+can also be precompiled into Python modules (see `compile_templates`) so that
+hooks do not need to parse them at all. The compiled modules are only used
+while they match the templates they were compiled from.
+"""
+
+import functools
+import hashlib
+import os
+import sys
+
+from jinja2 import Environment, FileSystemLoader, ModuleLoader
+
+CHARM_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+TEMPLATES_DIR = os.path.join(CHARM_DIR, "templates")
+COMPILED_TEMPLATES_DIR = os.path.join(CHARM_DIR, "templates_compiled")
+
+# File of the compiled templates directory holding the digest of their sources.
+DIGEST_FILE = "templates.sha256"
+
+
+def templates_digest(templates_dir=TEMPLATES_DIR):
+    """Compute the digest of the template sources.
+
+    Args:
+        templates_dir: directory of the templates.
+
+    Returns:
+        The hex SHA-256 digest of the names and contents of the templates.
+    """
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(templates_dir)):
+        with open(os.path.join(templates_dir, name), "rb") as template:
+            digest.update(name.encode() + b"\0" + template.read() + b"\0")
+    return digest.hexdigest()
+
+
+def _compiled_templates_match(compiled_dir):
+    """Check whether compiled templates were compiled from the current sources.
+
+    Args:
+        compiled_dir: directory of the compiled templates.
+
+    Returns:
+        True if the directory holds the digest of the current templates.
+    """
+    try:
+        with open(os.path.join(compiled_dir, DIGEST_FILE), encoding="utf-8") as digest_file:
+            return digest_file.read().strip() == templates_digest()
+    except OSError:
+        return False
+
+
+def _make_environment(loader):
+    """Create a Jinja environment with the settings used by the charm.
+
+    Args:
+        loader: Jinja loader used to find the templates.
+
+    Returns:
+        A Jinja environment.
+    """
+    # Templates never change while a hook runs, so skip the mtime checks.
+    return Environment(loader=loader, autoescape=True, auto_reload=False)
+
+
+@functools.lru_cache(maxsize=None)
+def get_environment():
+    """Return the process-wide Jinja environment.
+
+    Precompiled templates are preferred when they are shipped with the charm
+    and match the templates, so that stale ones never shadow edited templates.
+
+    Returns:
+        A Jinja environment.
+    """
+    if _compiled_templates_match(COMPILED_TEMPLATES_DIR):
+        return _make_environment(ModuleLoader(COMPILED_TEMPLATES_DIR))
+    return _make_environment(FileSystemLoader(TEMPLATES_DIR))
+
+
+@functools.lru_cache(maxsize=None)
+def get_template(template_name):
+    """Return the compiled template with the given name.
+
+    Args:
+        template_name: File name of the template.
+
+    Returns:
+        A Jinja template.
+    """
+    return get_environment().get_template(template_name)
+
+
+def render(template_name, context):
+    """Render the template with the given name using the given context dict.
+
+    Args:
+        template_name: File name to read the template from.
+        context: Dict used for rendering.
+
+    Returns:
+        A dict containing the rendered template.
+    """
+    return get_template(template_name).render(**context)
+
+
+def compile_templates(target=COMPILED_TEMPLATES_DIR):
+    """Precompile all the charm templates into Python modules.
+
+    Args:
+        target: directory where the compiled modules are written.
+    """
+    environment = _make_environment(FileSystemLoader(TEMPLATES_DIR))
+    environment.compile_templates(target, zip=None)
+    with open(os.path.join(target, DIGEST_FILE), "w", encoding="utf-8") as digest_file:
+        digest_file.write(templates_digest())
+
+
+if __name__ == "__main__":
+    compile_templates(*sys.argv[1:2])
@@ -0,0 +1,280 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Blue/green migration of namespaces to a cluster with more history shards.
+
+The number of history shards of a cluster cannot be changed, so a cluster
+that outgrows it is migrated to a new one, deployed as another application
+with its own databases and a larger `num-history-shards`. Temporal's
+multi-cluster replication copies the namespaces to the new cluster, which
+then becomes their active cluster:
+
+1. `start-shard-migration` connects the clusters and adds the new one to the
+   replication clusters of the namespaces, promoting them to global
+   namespaces if needed.
+2. `shard-migration-status` reports the active cluster of the namespaces.
+3. `finalize-shard-migration` hands the namespaces over to the new cluster.
+
+Until then, `abort-shard-migration` removes the new cluster from the
+replication clusters of the namespaces. Progress is tracked in the peer
+relation, so that any leader can carry on, and a new migration can be started
+once the previous one was handed over or aborted.
+"""
+
+import logging
+import re
+import time
+
+from ops import framework
+from ops.pebble import ChangeError, ExecError
+
+from literals import SERVICE_PORTS
+from log import log_event_handler
+
+logger = logging.getLogger(__name__)
+
+TCTL_TIMEOUT_SECONDS = 120
+
+
+class ShardMigration(framework.Object):
+    """Actions that migrate namespaces to a cluster with more history shards."""
+
+    def __init__(self, charm):
+        """Construct.
+
+        Args:
+            charm: The charm to attach the hooks to.
+        """
+        super().__init__(charm, "shard-migration")
+        self.charm = charm
+        charm.framework.observe(charm.on.start_shard_migration_action, self._on_start_shard_migration_action)
+        charm.framework.observe(charm.on.shard_migration_status_action, self._on_shard_migration_status_action)
+        charm.framework.observe(charm.on.finalize_shard_migration_action, self._on_finalize_shard_migration_action)
+        charm.framework.observe(charm.on.abort_shard_migration_action, self._on_abort_shard_migration_action)
+
+    @property
+    def frontend_address(self):
+        """Return the address of the frontend of this cluster within the model."""
+        return f"{self.charm.app.name}:{SERVICE_PORTS['frontend']['grpc']}"
+
+    def _tctl(self, *args, address=None):
+        """Run a tctl command in the workload container.
+
+        Args:
+            args: the tctl command and its arguments.
+            address: frontend address of the cluster, defaults to this one.
+
+        Returns:
+            The standard output of the command.
+
+        Raises:
+            ValueError: if the command failed.
+        """
+        container = self.charm.container
+        command = ["tctl", "--address", address or self.frontend_address, *args]
+        try:
+            stdout, _ = container.exec(command, timeout=TCTL_TIMEOUT_SECONDS).wait_output()
+        except ExecError as err:
+            raise ValueError(f"{' '.join(args[:3])} failed: {(err.stderr or err.stdout or '').strip()}") from err
+        except ChangeError as err:
+            raise ValueError(f"{' '.join(args[:3])} failed: {err.err}") from err
+        return stdout
+
+    def _check_preconditions(self, event, action):
+        """Check that the shard migration actions can run on this unit.
+
+        Args:
+            event: The event triggered when the action is performed.
+            action: name of the action.
+
+        Returns:
+            True if the action can run, False otherwise.
+        """
+        if not self.charm.unit.is_leader():
+            event.fail(f"{action} must be run on the leader unit")
+            return False
+        if not self.charm._state.is_ready():
+            event.fail("peer relation not ready")
+            return False
+        if not self.charm.container.can_connect():
+            event.fail("temporal container not ready")
+            return False
+        return True
+
+    @log_event_handler(logger)
+    def _on_start_shard_migration_action(self, event):
+        """Connect the target cluster and replicate the namespaces to it.
+
+        Args:
+            event: The event triggered when the action is performed.
+        """
+        if not self._check_preconditions(event, "start-shard-migration"):
+            return
+
+        migration = self.charm._state.shard_migration
+        if migration and migration["phase"] != "handed-over":
+            event.fail(
+                f"a shard migration to {migration['target_cluster']!r} was already started, "
+                "finalize or abort it first"
+            )
+            return
+
+        if not self.charm.config["enable-global-namespaces"]:
+            event.fail("enable-global-namespaces must be set on both clusters to replicate namespaces")
+            return
+
+        cluster_name = self.charm.config["cluster-name"]
+        target_cluster = event.params["target-cluster"]
+        if target_cluster == cluster_name:
+            event.fail(f"target-cluster must differ from the cluster-name of this cluster ({cluster_name!r})")
+            return
+
+        namespaces = [namespace.strip() for namespace in event.params["namespaces"].split(",") if namespace.strip()]
+        if not namespaces:
+            event.fail("namespaces must list at least one namespace")
+            return
+
+        target_address = event.params["target-address"]
+        source_address = event.params.get("source-address") or self.frontend_address
+        try:
+            # Both clusters must know each other to replicate in either direction.
+            self._tctl("admin", "cluster", "upsert-remote-cluster", "--frontend_address", target_address)
+            self._tctl(
+                "admin",
+                "cluster",
+                "upsert-remote-cluster",
+                "--frontend_address",
+                source_address,
+                address=target_address,
+            )
+            for namespace in namespaces:
+                if "IsGlobalNamespace: true" not in self._tctl("--namespace", namespace, "namespace", "describe"):
+                    self._tctl("--namespace", namespace, "namespace", "update", "--promote_namespace", "true")
+                self._tctl("--namespace", namespace, "namespace", "update", "--clusters", cluster_name, target_cluster)
+        except ValueError as err:
+            event.fail(str(err))
+            return
+
+        logger.info("shard migration to %s started for namespaces %s", target_cluster, ", ".join(namespaces))
+        self.charm._state.shard_migration = {
+            "target_cluster": target_cluster,
+            "target_address": target_address,
+            "namespaces": namespaces,
+            "phase": "replicating",
+            "started": int(time.time()),
+        }
+        event.set_results(
+            {
+                "result": f"replicating {len(namespaces)} namespaces to {target_cluster!r}, run "
+                "finalize-shard-migration once their retention period has elapsed"
+            }
+        )
+
+    @log_event_handler(logger)
+    def _on_shard_migration_status_action(self, event):
+        """Report the progress of the shard migration.
+
+        Args:
+            event: The event triggered when the action is performed.
+        """
+        if not self._check_preconditions(event, "shard-migration-status"):
+            return
+
+        migration = self.charm._state.shard_migration
+        if not migration:
+            event.set_results({"phase": "none"})
+            return
+
+        active_clusters = {}
+        try:
+            for namespace in migration["namespaces"]:
+                description = self._tctl("--namespace", namespace, "namespace", "describe")
+                match = re.search(r"ActiveClusterName:\s*(\S+)", description)
+                active_clusters[namespace] = match.group(1) if match else "unknown"
+        except ValueError as err:
+            event.fail(str(err))
+            return
+
+        event.set_results(
+            {
+                "phase": migration["phase"],
+                "target-cluster": migration["target_cluster"],
+                "elapsed-seconds": int(time.time()) - migration["started"],
+                "active-clusters": ", ".join(
+                    f"{namespace}={cluster}" for namespace, cluster in active_clusters.items()
+                ),
+            }
+        )
+
+    @log_event_handler(logger)
+    def _on_finalize_shard_migration_action(self, event):
+        """Hand the namespaces over to the target cluster.
+
+        Args:
+            event: The event triggered when the action is performed.
+        """
+        if not self._check_preconditions(event, "finalize-shard-migration"):
+            return
+
+        migration = self.charm._state.shard_migration
+        if not migration:
+            event.fail("no shard migration was started, run start-shard-migration first")
+            return
+
+        target_cluster = migration["target_cluster"]
+        try:
+            for namespace in migration["namespaces"]:
+                self._tctl("--namespace", namespace, "namespace", "update", "--active_cluster", target_cluster)
+        except ValueError as err:
+            # Namespaces handed over before the failure are handed over again
+            # when the action is retried, which is a no-op.
+            event.fail(str(err))
+            return
+
+        logger.info("shard migration to %s finalized", target_cluster)
+        self.charm._state.shard_migration = {**migration, "phase": "handed-over"}
+        event.set_results(
+            {
+                "result": f"namespaces handed over to {target_cluster!r}, point clients at "
+                f"{migration['target_address']} before removing this application"
+            }
+        )
+
+    @log_event_handler(logger)
+    def _on_abort_shard_migration_action(self, event):
+        """Stop replicating the namespaces to the target cluster, and forget the migration.
+
+        Args:
+            event: The event triggered when the action is performed.
+        """
+        if not self._check_preconditions(event, "abort-shard-migration"):
+            return
+
+        migration = self.charm._state.shard_migration
+        if not migration:
+            event.fail("no shard migration was started")
+            return
+
+        if migration["phase"] == "handed-over":
+            # The target cluster is now active, namespaces can only be
+            # handed back from there.
+            del self.charm._state.shard_migration
+            event.set_results({"result": f"cleared the shard migration to {migration['target_cluster']!r}"})
+            return
+
+        cluster_name = self.charm.config["cluster-name"]
+        try:
+            for namespace in migration["namespaces"]:
+                self._tctl("--namespace", namespace, "namespace", "update", "--clusters", cluster_name)
+        except ValueError as err:
+            event.fail(str(err))
+            return
+
+        logger.info("shard migration to %s aborted", migration["target_cluster"])
+        del self.charm._state.shard_migration
+        event.set_results(
+            {
+                "result": f"stopped replicating {len(migration['namespaces'])} namespaces to "
+                f"{migration['target_cluster']!r}, they remain global namespaces"
+            }
+        )
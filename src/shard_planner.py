@@ -0,0 +1,107 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Planning of the number of history shards of a Temporal cluster.
+
+The number of history shards cannot be changed once the cluster is deployed,
+so it is planned for the expected peak load with room to grow:
+
+- A shard is owned by a single history unit, and processes the state
+  transitions of its workflows sequentially. Planning for at most
+  `TRANSITIONS_PER_SHARD` transitions per second per shard at peak keeps
+  shard lock contention and persistence latency low.
+- Starting a workflow costs several state transitions, so the start rate
+  sets a lower bound on the transition rate when it is underestimated.
+- The load is multiplied by `GROWTH_FACTOR`, as the shards cannot be added
+  later on.
+- Each history unit should own between `HEALTHY_SHARDS_PER_HISTORY_UNIT`
+  shards: with fewer, shards are unevenly spread across units and a lost
+  unit moves a large share of the load at once; with more, the per-shard
+  caches and timers take up a large share of the unit's memory.
+"""
+
+TRANSITIONS_PER_SHARD = 20
+TRANSITIONS_PER_WORKFLOW_START = 4
+GROWTH_FACTOR = 4
+MIN_HISTORY_SHARDS = 512
+MAX_HISTORY_SHARDS = 16384
+HEALTHY_SHARDS_PER_HISTORY_UNIT = (64, 1024)
+
+
+def is_power_of_two(value):
+    """Check whether a value is a positive power of two.
+
+    Args:
+        value: the value to check.
+
+    Returns:
+        True if the value is a positive power of 2, False otherwise.
+    """
+    return isinstance(value, int) and value > 0 and value & (value - 1) == 0
+
+
+def shards_per_history_unit_warning(shards, history_units):
+    """Return a warning if the shards per history unit are outside the healthy range.
+
+    Args:
+        shards: the number of history shards.
+        history_units: the number of units running the history service.
+
+    Returns:
+        The warning, or None if the ratio is healthy.
+    """
+    low, high = HEALTHY_SHARDS_PER_HISTORY_UNIT
+    ratio = shards / history_units
+    if ratio < low:
+        return (
+            f"{ratio:g} shards per history unit is below {low}, shards are unevenly spread "
+            "and losing a unit moves a large share of the load"
+        )
+    if ratio > high:
+        return (
+            f"{ratio:g} shards per history unit is above {high}, consider running more history units "
+            "to spread the per-shard memory"
+        )
+    return None
+
+
+def plan_history_shards(workflow_start_rate, state_transitions_per_second, history_units):
+    """Recommend a number of history shards for the expected peak load.
+
+    Args:
+        workflow_start_rate: peak number of workflows started per second.
+        state_transitions_per_second: peak number of state transitions per second.
+        history_units: expected number of units running the history service.
+
+    Returns:
+        Dict with the recommended `shards`, the resulting
+        `shards_per_history_unit` and the `warnings` about the plan.
+
+    Raises:
+        ValueError: if an input is not valid.
+    """
+    if workflow_start_rate < 0 or state_transitions_per_second < 0:
+        raise ValueError("workflow-start-rate and state-transitions-per-second must be >= 0")
+    if history_units < 1:
+        raise ValueError("history-units must be >= 1")
+
+    transitions = max(state_transitions_per_second, workflow_start_rate * TRANSITIONS_PER_WORKFLOW_START)
+    needed = max(
+        MIN_HISTORY_SHARDS,
+        transitions * GROWTH_FACTOR / TRANSITIONS_PER_SHARD,
+        history_units * HEALTHY_SHARDS_PER_HISTORY_UNIT[0],
+    )
+    shards = 1
+    while shards < needed and shards < MAX_HISTORY_SHARDS:
+        shards *= 2
+
+    warnings = []
+    if transitions * GROWTH_FACTOR / TRANSITIONS_PER_SHARD > MAX_HISTORY_SHARDS:
+        warnings.append(
+            f"the expected load needs more than {MAX_HISTORY_SHARDS} shards, consider splitting it across clusters"
+        )
+    ratio_warning = shards_per_history_unit_warning(shards, history_units)
+    if ratio_warning:
+        warnings.append(ratio_warning)
+
+    return {"shards": shards, "shards_per_history_unit": shards / history_units, "warnings": warnings}
@@ -3,8 +3,14 @@
 
 """Manager for handling charm state."""
 
+import copy
 import json
 
+from log import count_call
+
+# Marker for values deleted from a TransactionalState but not committed yet.
+_DELETED = object()
+
 
 class State:
     """A magic state that uses a relation as the data store.
@@ -44,6 +50,7 @@ class State:
             value from store with given name.
         """
         v = self._get_relation().data[self._app].get(name, "null")
+        count_call("relation_reads")
         return json.loads(v)
 
     def __delattr__(self, name):
@@ -64,3 +71,95 @@ class State:
             A boolean representing whether the relation is ready to be used or not.
         """
         return bool(self._get_relation())
+
+
+class TransactionalState(State):
+    """A state that decodes values once and batches writes until commit.
+
+    Values read from the relation are decoded on first access and cached for
+    the rest of the hook. Like with `State`, callers get their own copy of the
+    value, which must be assigned again to be stored. Assignments and
+    deletions only update the cache and mark the key as dirty; `commit` writes
+    the dirty keys to the relation with a single relation-set. The charm calls
+    `commit` from the framework's pre-commit event, so nothing is written if
+    the hook fails.
+    """
+
+    def __init__(self, app, get_relation):
+        """Construct.
+
+        Args:
+            app: workload application
+            get_relation: get peer relation method
+        """
+        super().__init__(app, get_relation)
+        self.__dict__["_cache"] = {}
+        self.__dict__["_dirty"] = set()
+
+    def __setattr__(self, name, value):
+        """Set a value in the store with the given name.
+
+        Args:
+            name: name of value to set in store.
+            value: value to set in store.
+        """
+        # Cache a decoded copy so that later changes to `value` by the caller
+        # do not leak into the store without being assigned again.
+        self._cache[name] = json.loads(json.dumps(value))
+        self._dirty.add(name)
+        count_call("relation_writes")
+
+    def __getattr__(self, name):
+        """Get from the store the value with the given name, or None.
+
+        Args:
+            name: name of value to get from store.
+
+        Returns:
+            value from store with given name.
+        """
+        if name not in self._cache:
+            self._cache[name] = super().__getattr__(name)
+        value = self._cache[name]
+        if value is _DELETED:
+            return None
+        # Hand out a copy, so that changing it does not change the cache
+        # without marking the key as dirty.
+        return copy.deepcopy(value)
+
+    def __delattr__(self, name):
+        """Delete the value with the given name from the store, if it exists.
+
+        Args:
+            name: name of value to delete from store.
+        """
+        self._cache[name] = _DELETED
+        self._dirty.add(name)
+        count_call("relation_writes")
+
+    def commit(self):
+        """Write the values changed since the last commit to the relation.
+
+        Returns:
+            The number of keys written or deleted.
+        """
+        if not self._dirty:
+            return 0
+
+        data = self._get_relation().data[self._app]
+        changes = {}
+        for name in sorted(self._dirty):
+            value = self._cache[name]
+            if value is _DELETED:
+                # An empty value deletes the key in a relation-set.
+                if data.get(name) is not None:
+                    changes[name] = ""
+                del self._cache[name]
+                continue
+            encoded = json.dumps(value)
+            if data.get(name) != encoded:
+                changes[name] = encoded
+        if changes:
+            data.update(changes)
+        self._dirty.clear()
+        return len(changes)
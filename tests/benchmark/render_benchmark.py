@@ -0,0 +1,95 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Micro-benchmark for rendering the Temporal configuration templates.
+
+Compares the legacy behavior (a new environment per render), the cached
+process-wide environment and precompiled templates.
+
+Run with `tox -e benchmark` or `python tests/benchmark/render_benchmark.py`.
+"""
+
+import os
+import sys
+import tempfile
+import timeit
+from unittest import mock
+
+from jinja2 import Environment, FileSystemLoader
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, "src"))
+
+import rendering  # noqa: E402
+from dynamic_config import parse_rate_limits  # noqa: E402
+
+ITERATIONS = 200
+
+CONTEXT = {
+    "LOG_LEVEL": "info",
+    "DB_NAME": "temporal-k8s_db",
+    "DB_HOST": "myhost",
+    "DB_PORT": "5432",
+    "DB_USER": "user",
+    "DB_PSWD": "password",
+    "VISIBILITY_NAME": "temporal-k8s_visibility",
+    "VISIBILITY_HOST": "myhost",
+    "VISIBILITY_PORT": "5432",
+    "VISIBILITY_USER": "user",
+    "VISIBILITY_PSWD": "password",
+    "TEMPORAL_BROADCAST_ADDRESS": "10.0.0.1",
+    "NUM_HISTORY_SHARDS": 512,
+}
+
+DYNAMIC_CONTEXT = {
+    "RATE_LIMITS": parse_rate_limits("", 2000, "namespaceA:50|namespaceB:100"),
+    "LONG_POLL_INTERVAL": "50s",
+}
+
+
+def render_uncached():
+    """Render both templates the way the charm did before caching."""
+    for name, context in (("config.jinja", CONTEXT), ("dynamic_config.jinja", DYNAMIC_CONTEXT)):
+        loader = FileSystemLoader(rendering.TEMPLATES_DIR)
+        Environment(loader=loader, autoescape=True).get_template(name).render(**context)
+
+
+def render_cached():
+    """Render both templates with the process-wide environment."""
+    rendering.render("config.jinja", CONTEXT)
+    rendering.render("dynamic_config.jinja", DYNAMIC_CONTEXT)
+
+
+def reset_cache():
+    """Drop the cached environment and templates."""
+    rendering.get_environment.cache_clear()
+    rendering.get_template.cache_clear()
+
+
+def measure(label, func, setup=None):
+    """Print the cold (first call) and warm (mean of later calls) timings.
+
+    Args:
+        label: name of the measured variant.
+        func: callable rendering both templates.
+        setup: optional callable run before the cold measurement.
+    """
+    if setup:
+        setup()
+    cold = timeit.timeit(func, number=1)
+    warm = timeit.timeit(func, number=ITERATIONS) / ITERATIONS
+    print(f"{label:<12} cold: {cold * 1000:8.3f} ms   warm: {warm * 1000:8.3f} ms")
+
+
+def main():
+    """Run the benchmark."""
+    measure("uncached", render_uncached)
+    with mock.patch.object(rendering, "COMPILED_TEMPLATES_DIR", "/nonexistent"):
+        measure("cached", render_cached, setup=reset_cache)
+    with tempfile.TemporaryDirectory() as compiled_dir:
+        rendering.compile_templates(compiled_dir)
+        with mock.patch.object(rendering, "COMPILED_TEMPLATES_DIR", compiled_dir):
+            measure("precompiled", render_cached, setup=reset_cache)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Benchmark for the cold start of the charm hooks per service role.
+
+Every sample runs an `update-status` hook in a fresh interpreter, as Juju
+does, and reports the wall time from interpreter start to the end of the hook
+along with the heavy optional libraries that were imported.
+
+Run with `tox -e benchmark` or `python tests/benchmark/startup_benchmark.py`.
+"""
+
+import json
+import os
+import statistics
+import subprocess  # nosec B404
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+SAMPLES = 5
+ROLES = ("frontend", "history", "matching", "worker", "frontend,history,matching,worker")
+HEAVY_MODULES = ("boto3", "openfga_sdk", "requests")
+
+HOOK_SCRIPT = """
+import json
+import sys
+import time
+
+start = time.monotonic()
+
+import ops.testing
+
+from charm import TemporalK8SCharm
+
+context = ops.testing.Context(TemporalK8SCharm)
+state = ops.testing.State(
+    config={"services": sys.argv[1]},
+    containers={ops.testing.Container("temporal", can_connect=True)},
+    relations={ops.testing.PeerRelation("peer")},
+)
+context.run(context.on.update_status(), state)
+print(json.dumps({
+    "seconds": time.monotonic() - start,
+    "imported": [name for name in sys.argv[2:] if name in sys.modules],
+}))
+"""
+
+
+def run_hook(role):
+    """Run one update-status hook in a new interpreter.
+
+    Args:
+        role: value of the `services` config option.
+
+    Returns:
+        Dict with the hook wall time and the heavy modules imported.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join((ROOT, f"{ROOT}/lib", f"{ROOT}/src")))
+    output = subprocess.check_output(  # nosec B603
+        [sys.executable, "-W", "ignore", "-c", HOOK_SCRIPT, role, *HEAVY_MODULES], env=env, cwd=ROOT
+    )
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def main():
+    """Run the benchmark."""
+    for role in ROLES:
+        results = [run_hook(role) for _ in range(SAMPLES)]
+        median = statistics.median(result["seconds"] for result in results)
+        imported = ", ".join(results[0]["imported"]) or "none"
+        print(f"{role:<35} update-status: {median * 1000:8.1f} ms   heavy imports: {imported}")
+
+
+if __name__ == "__main__":
+    main()
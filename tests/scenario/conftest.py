@@ -38,6 +38,22 @@ def pytest_runtest_setup(item):
         pytest.skip()
 
 
+@pytest.fixture(autouse=True)
+def hook_metrics_dir(tmp_path_factory, monkeypatch):
+    """Keep the hook metrics in a test directory.
+
+    Args:
+        tmp_path_factory: the pytest temporary directory factory.
+        monkeypatch: the pytest monkeypatch fixture.
+
+    Returns:
+        The path of the hook metrics textfile.
+    """
+    path = tmp_path_factory.mktemp("hook-metrics") / "hook-metrics.prom"
+    monkeypatch.setattr("hook_metrics.metrics_path", lambda: str(path))
+    return path
+
+
 @pytest.fixture
 def temporal_k8s_charm():
     yield TemporalK8SCharm
@@ -62,6 +78,8 @@ def temporal_container_initialized():
         "temporal",
         can_connect=True,
         check_infos=[ops.testing.CheckInfo("up")],
+        # Swap of the frontend certificate directory.
+        execs={ops.testing.Exec(["ln", "-sfn"]), ops.testing.Exec(["mv", "-Tf"])},
         layers={
             "initialized-layer": ops.pebble.Layer(
                 {
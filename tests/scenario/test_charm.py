@@ -1,15 +1,22 @@
 # Copyright 2024 Canonical Ltd.
 # See LICENSE file for licensing details.
 
+import collections
 import dataclasses
+import fnmatch
+import json
 import logging
+import os
 import textwrap
+import time
 import unittest.mock
 from unittest.mock import MagicMock
 
+import httpx2
 import ops
 import ops.testing
 import pytest
+import yaml
 from charms.tls_certificates_interface.v4.tls_certificates import (
     CertificateAvailableEvent,
     PrivateKey,
@@ -19,8 +26,10 @@ from charms.tls_certificates_interface.v4.tls_certificates import (
 from charm import (
     FRONTEND_CERTIFICATES_RELATION_NAME,
     FRONTEND_TLS_CONFIGURATION,
+    TemporalK8SCharm,
     render,
 )
+from dynamic_config import dynamic_config_context
 
 logger = logging.getLogger(__name__)
 
@@ -80,8 +89,9 @@ def test_blocked_on_peer_relation_not_ready(context, state, temporal_container,
 
 
 @pytest.mark.config_skipped
-def test_blocked_by_missing_num_history_shards(context, state, temporal_container):
-    state = dataclasses.replace(state, config={})
+@pytest.mark.parametrize("config", [{}, {"num-history-shards": 6}], ids=["missing", "not a power of 2"])
+def test_blocked_by_missing_num_history_shards(context, state, temporal_container, config):
+    state = dataclasses.replace(state, config=config)
 
     state_out = context.run(context.on.pebble_ready(temporal_container), state)
 
@@ -160,23 +170,37 @@ def test_charm_ready(context, state, temporal_container, admin_relation):
                     "DB_HOST": "myhost",
                     "DB_NAME": "temporal-k8s_db",
                     "DB_PORT": "5432",
+                    "DB_ENDPOINTS": "myhost:5432",
                     "DB_PSWD": "inner-light",
                     "DB_USER": "jean-luc@db",
                     "VISIBILITY_HOST": "myhost",
                     "VISIBILITY_NAME": "temporal-k8s_visibility",
                     "VISIBILITY_PORT": "5432",
+                    "VISIBILITY_ENDPOINTS": "myhost:5432",
                     "VISIBILITY_PSWD": "inner-light",
                     "VISIBILITY_USER": "jean-luc@visibility",
                     "LOG_LEVEL": "info",
                     "TEMPORAL_BROADCAST_ADDRESS": "1.2.3.4",
                     "NUM_HISTORY_SHARDS": 1,
+                    "CLUSTER_NAME": "active",
+                    "INITIAL_FAILOVER_VERSION": 1,
+                    "GLOBAL_NAMESPACE_ENABLED": False,
                     "SQL_TLS_ENABLED": False,
+                    "SQL_VIS_TLS_ENABLED": False,
+                    "SQL_TRANSACTION_POOLING": False,
+                    "SQL_VIS_TRANSACTION_POOLING": False,
+                    "DYNAMIC_CONFIG_POLL_INTERVAL": "60s",
+                    "PPROF_PORT": 0,
                     "SQL_MAX_CONNS": 20,
                     "SQL_MAX_IDLE_CONNS": 20,
                     "SQL_MAX_CONN_TIME": "1h",
                     "SQL_VIS_MAX_CONNS": 10,
                     "SQL_VIS_MAX_IDLE_CONNS": 10,
                     "SQL_VIS_MAX_CONN_TIME": "1h",
+                    "TEMPORAL_TLS_REFRESH_INTERVAL": "0s",
+                    "TEMPORAL_TLS_EXPIRATION_CHECKS_WARNING_WINDOW": "0s",
+                    "TEMPORAL_TLS_EXPIRATION_CHECKS_ERROR_WINDOW": "0s",
+                    "TEMPORAL_TLS_EXPIRATION_CHECKS_CHECK_INTERVAL": "0s",
                 },
                 "on-check-failure": {"up": "ignore"},
             },
@@ -301,10 +325,10 @@ def test_frontend_certificates_relation(
     ) as manager, unittest.mock.patch(
         "charm.TemporalK8SCharm._update_certificates_required", return_value=True
     ), unittest.mock.patch(
-        "charm.TemporalK8SCharm._store_certificate"
+        "charm.TemporalK8SCharm._store_certificate_and_key"
     ), unittest.mock.patch(
-        "charm.TemporalK8SCharm._store_private_key"
-    ):
+        "ops.model.Container.restart"
+    ) as restart:
         # Required mocks
         manager.charm.certificates.get_assigned_certificate = MagicMock(
             return_value=(client_provider_certificate, requirer_private_key)
@@ -314,10 +338,197 @@ def test_frontend_certificates_relation(
         manager.charm._update(certificate_available_event)
 
         assert FRONTEND_TLS_CONFIGURATION.items() <= manager.charm._extra_context.items()
-        assert (
-            FRONTEND_TLS_CONFIGURATION.items()
-            <= manager.charm.container.get_plan().services["temporal"].environment.items()
+        # The TLS file paths are only part of the rendered configuration, which
+        # restarts the server explicitly as its layer did not change.
+        environment = manager.charm.container.get_plan().services["temporal"].environment
+        assert not FRONTEND_TLS_CONFIGURATION.keys() & environment.keys()
+        config = manager.charm.container.pull("/etc/temporal/config/charm.yaml").read()
+        assert FRONTEND_TLS_CONFIGURATION["TEMPORAL_TLS_FRONTEND_CERT"] in config
+        restart.assert_called_once_with("temporal")
+
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+@pytest.mark.parametrize("refresh_interval,restarted", [("0s", True), ("10m", False)])
+def test_frontend_certificates_renewal(
+    context,
+    state,
+    temporal_container,
+    temporal_container_initialized,
+    admin_relation,
+    frontend_certificates_relation,
+    all_required_relations,
+    refresh_interval,
+    restarted,
+):
+    all_required_relations.append(frontend_certificates_relation)
+    state = dataclasses.replace(
+        state,
+        relations=all_required_relations,
+        config={**state.config, "tls-refresh-interval": refresh_interval},
+    )
+    new_state = context.run(context.on.pebble_ready(temporal_container), state)
+    new_state = context.run(context.on.relation_changed(admin_relation), new_state)
+    new_state = dataclasses.replace(new_state, containers=[temporal_container_initialized])
+
+    provider_certificate = MagicMock(ProviderCertificate)
+    provider_certificate.certificate = MagicMock()
+    private_key = MagicMock(PrivateKey)
+
+    with context(
+        context.on.relation_changed(frontend_certificates_relation), state=new_state
+    ) as manager, unittest.mock.patch(
+        "charm.TemporalK8SCharm._update_certificates_required", return_value=True
+    ), unittest.mock.patch(
+        "charm.TemporalK8SCharm._store_certificate_and_key"
+    ), unittest.mock.patch(
+        "ops.model.Container.restart"
+    ) as restart:
+        manager.charm.certificates.get_assigned_certificate = MagicMock(
+            return_value=(provider_certificate, private_key)
         )
+        manager.charm._update(MagicMock(spec=CertificateAvailableEvent))
+        plan = manager.charm.container.get_plan().to_dict()
+        restart.reset_mock()
+
+        # Renew the certificate, the configuration and the layer are unchanged.
+        manager.charm._extra_context = {}
+        manager.charm._update(MagicMock(spec=CertificateAvailableEvent))
+
+        assert manager.charm.container.get_plan().to_dict() == plan
+        assert restart.called == restarted
+
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+def test_frontend_certificates_compared_by_digest(
+    context,
+    state,
+    temporal_container_initialized,
+    frontend_certificates_relation,
+    all_required_relations,
+):
+    all_required_relations.append(frontend_certificates_relation)
+    state = dataclasses.replace(state, relations=all_required_relations, containers=[temporal_container_initialized])
+
+    provider_certificate = MagicMock(ProviderCertificate)
+    provider_certificate.certificate = MagicMock()
+    private_key = MagicMock(PrivateKey)
+
+    with context(
+        context.on.relation_changed(frontend_certificates_relation), state=state
+    ) as manager, unittest.mock.patch(
+        "charm.TemporalK8SCharm._certificate_is_stored", return_value=False
+    ) as certificate_is_stored, unittest.mock.patch.object(
+        TemporalK8SCharm,
+        "_store_certificate_and_key",
+        autospec=True,
+        side_effect=TemporalK8SCharm._store_certificate_and_key,
+    ) as store_certificate:
+        manager.charm.certificates.get_assigned_certificate = MagicMock(
+            return_value=(provider_certificate, private_key)
+        )
+
+        manager.charm._handle_frontend_tls()
+        store_certificate.assert_called_once()
+
+        certificate_is_stored.reset_mock()
+        store_certificate.reset_mock()
+        manager.charm._extra_context = {}
+        manager.charm._handle_frontend_tls()
+        certificate_is_stored.assert_not_called()
+        store_certificate.assert_not_called()
+        assert FRONTEND_TLS_CONFIGURATION.items() <= manager.charm._extra_context.items()
+
+
+class SwapCheckingContainer:
+    """A workload filesystem checking that the live frontend certificate and key always match.
+
+    Attrs:
+        files: dict of file path to content.
+        links: dict of symlink path to target.
+    """
+
+    def __init__(self, pairs):
+        """Construct.
+
+        Args:
+            pairs: dict of each certificate to its private key.
+        """
+        self.files = {}
+        self.links = {}
+        self._pairs = pairs
+
+    def _resolve(self, path):
+        directory, name = os.path.split(path)
+        return os.path.join(self.links.get(directory, directory), name)
+
+    def _check_live_pair(self):
+        certificate = self.files.get(self._resolve(FRONTEND_TLS_CONFIGURATION["TEMPORAL_TLS_FRONTEND_CERT"]))
+        private_key = self.files.get(self._resolve(FRONTEND_TLS_CONFIGURATION["TEMPORAL_TLS_FRONTEND_KEY"]))
+        assert (certificate, private_key) == (None, None) or self._pairs[certificate] == private_key
+
+    def push(self, path, source, make_dirs=False):
+        self.files[self._resolve(path)] = source
+        self._check_live_pair()
+
+    def exec(self, command):
+        if command[0] == "ln":
+            self.links[command[3]] = command[2]
+        elif command[0] == "mv":
+            self.links[command[3]] = self.links.pop(command[2])
+        self._check_live_pair()
+        return MagicMock()
+
+    def list_files(self, path, pattern):
+        paths = {os.path.dirname(file) for file in self.files} | self.links.keys()
+        return [MagicMock(path=found) for found in sorted(paths) if fnmatch.fnmatch(os.path.basename(found), pattern)]
+
+    def remove_path(self, path, recursive=False):
+        self.links.pop(path, None)
+        self.files = {file: content for file, content in self.files.items() if os.path.dirname(file) != path}
+        self._check_live_pair()
+
+
+def test_frontend_certificates_swapped_atomically(context, state):
+    container = SwapCheckingContainer({"certificate-1": "key-1", "certificate-2": "key-2"})
+    with context(context.on.update_status(), state) as manager:
+        manager.charm.container = container
+        manager.charm._store_certificate_and_key("certificate-1", "key-1")
+        first_directory = container.links[os.path.dirname(FRONTEND_TLS_CONFIGURATION["TEMPORAL_TLS_FRONTEND_CERT"])]
+        manager.charm._store_certificate_and_key("certificate-2", "key-2")
+
+    live_certificate = container._resolve(FRONTEND_TLS_CONFIGURATION["TEMPORAL_TLS_FRONTEND_CERT"])
+    assert container.files[live_certificate] == "certificate-2"
+    assert not any(os.path.dirname(file) == first_directory for file in container.files)
+
+
+def test_certificate_request_skips_dns_without_relation(context, state):
+    with unittest.mock.patch("socket.getfqdn") as getfqdn, context(context.on.update_status(), state) as manager:
+        assert manager.charm.certificates.certificate_requests == []
+        manager.run()
+
+    getfqdn.assert_not_called()
+
+
+def test_certificate_request_is_cached(context, state, frontend_certificates_relation):
+    state = dataclasses.replace(state, relations=state.relations | {frontend_certificates_relation})
+
+    with unittest.mock.patch(
+        "socket.getfqdn", return_value="temporal-k8s-0.temporal-k8s-endpoints"
+    ) as getfqdn, unittest.mock.patch("socket.gethostbyname", return_value="10.1.0.10"):
+        state_out = context.run(context.on.update_status(), state)
+        assert getfqdn.call_count == 1
+
+        state_out = context.run(context.on.update_status(), state_out)
+        assert getfqdn.call_count == 1
+
+        state_out = context.run(context.on.upgrade_charm(), state_out)
+        assert getfqdn.call_count == 2
+
+        state_out = dataclasses.replace(state_out, config={**state_out.config, "frontend-cert-sans-dns": "temporal"})
+        with context(context.on.config_changed(), state_out) as manager:
+            assert manager.charm.certificates.certificate_requests[0].sans_dns == frozenset(["temporal"])
+            manager.run()
+        assert getfqdn.call_count == 3
 
 
 @pytest.mark.parametrize_skip_if(lambda leader: not leader)
@@ -350,23 +561,37 @@ def test_s3_archival_relation(
                         "DB_HOST": "myhost",
                         "DB_NAME": "temporal-k8s_db",
                         "DB_PORT": "5432",
+                        "DB_ENDPOINTS": "myhost:5432",
                         "DB_PSWD": "inner-light",
                         "DB_USER": "jean-luc@db",
                         "VISIBILITY_HOST": "myhost",
                         "VISIBILITY_NAME": "temporal-k8s_visibility",
                         "VISIBILITY_PORT": "5432",
+                        "VISIBILITY_ENDPOINTS": "myhost:5432",
                         "VISIBILITY_PSWD": "inner-light",
                         "VISIBILITY_USER": "jean-luc@visibility",
                         "LOG_LEVEL": "info",
                         "TEMPORAL_BROADCAST_ADDRESS": "1.2.3.4",
                         "NUM_HISTORY_SHARDS": 1,
+                        "CLUSTER_NAME": "active",
+                        "INITIAL_FAILOVER_VERSION": 1,
+                        "GLOBAL_NAMESPACE_ENABLED": False,
                         "SQL_MAX_CONNS": 20,
                         "SQL_TLS_ENABLED": False,
+                        "SQL_VIS_TLS_ENABLED": False,
+                        "SQL_TRANSACTION_POOLING": False,
+                        "SQL_VIS_TRANSACTION_POOLING": False,
+                        "DYNAMIC_CONFIG_POLL_INTERVAL": "60s",
+                        "PPROF_PORT": 0,
                         "SQL_MAX_IDLE_CONNS": 20,
                         "SQL_MAX_CONN_TIME": "1h",
                         "SQL_VIS_MAX_CONNS": 10,
                         "SQL_VIS_MAX_IDLE_CONNS": 10,
                         "SQL_VIS_MAX_CONN_TIME": "1h",
+                        "TEMPORAL_TLS_REFRESH_INTERVAL": "0s",
+                        "TEMPORAL_TLS_EXPIRATION_CHECKS_WARNING_WINDOW": "0s",
+                        "TEMPORAL_TLS_EXPIRATION_CHECKS_ERROR_WINDOW": "0s",
+                        "TEMPORAL_TLS_EXPIRATION_CHECKS_CHECK_INTERVAL": "0s",
                         "ARCHIVAL_ENABLED": True,
                         "ARCHIVAL_BUCKET_REGION": "region",
                         "ARCHIVAL_ENDPOINT": "s3.us-east-2.amazonaws.com",
@@ -611,23 +836,37 @@ def test_authorization_ready(
                     "DB_HOST": "myhost",
                     "DB_NAME": "temporal-k8s_db",
                     "DB_PORT": "5432",
+                    "DB_ENDPOINTS": "myhost:5432,anotherhost:2345",
                     "DB_PSWD": "inner-light",
                     "DB_USER": "jean-luc@db",
                     "VISIBILITY_HOST": "myhost",
                     "VISIBILITY_NAME": "temporal-k8s_visibility",
                     "VISIBILITY_PORT": "5432",
+                    "VISIBILITY_ENDPOINTS": "myhost:5432,anotherhost:2345",
                     "VISIBILITY_PSWD": "inner-light",
                     "VISIBILITY_USER": "jean-luc@visibility",
                     "LOG_LEVEL": "info",
                     "TEMPORAL_BROADCAST_ADDRESS": "1.2.3.4",
                     "NUM_HISTORY_SHARDS": 1,
+                    "CLUSTER_NAME": "active",
+                    "INITIAL_FAILOVER_VERSION": 1,
+                    "GLOBAL_NAMESPACE_ENABLED": False,
                     "SQL_TLS_ENABLED": False,
+                    "SQL_VIS_TLS_ENABLED": False,
+                    "SQL_TRANSACTION_POOLING": False,
+                    "SQL_VIS_TRANSACTION_POOLING": False,
+                    "DYNAMIC_CONFIG_POLL_INTERVAL": "60s",
+                    "PPROF_PORT": 0,
                     "SQL_MAX_CONNS": 20,
                     "SQL_MAX_IDLE_CONNS": 20,
                     "SQL_MAX_CONN_TIME": "1h",
                     "SQL_VIS_MAX_CONNS": 10,
                     "SQL_VIS_MAX_IDLE_CONNS": 10,
                     "SQL_VIS_MAX_CONN_TIME": "1h",
+                    "TEMPORAL_TLS_REFRESH_INTERVAL": "0s",
+                    "TEMPORAL_TLS_EXPIRATION_CHECKS_WARNING_WINDOW": "0s",
+                    "TEMPORAL_TLS_EXPIRATION_CHECKS_ERROR_WINDOW": "0s",
+                    "TEMPORAL_TLS_EXPIRATION_CHECKS_CHECK_INTERVAL": "0s",
                     "OFGA_STORE_ID": openfga_store_id,
                     "OFGA_AUTH_MODEL_ID": "123",
                     "OFGA_API_HOST": "127.0.0.1",
@@ -712,34 +951,893 @@ def test_rendering():
     expected_output = textwrap.dedent(
         """
         frontend.namespacerps:
-        - value: 500
+          - value: 500
+          - value: 50
+            constraints:
+              namespace: "namespaceA"
+          - value: 100
+            constraints:
+              namespace: "namespaceB"
+          - value: 200
+            constraints:
+              namespace: "namespaceC"
+        frontend.rps:
+          - value: 2400
+        matching.longPollExpirationInterval:
+          - value: "50s"
+    """
+    ).strip()
 
+    options = {
+        "global-rps-limit": 500,
+        "namespace-rps-limit": "namespaceA:50|namespaceB:100|namespaceC:200",
+        "rate-limits": "frontend: {rps: 2400}",
+        "long-poll-interval": "50s",
+        "dynamic-config": "",
+        "task-queue-partitions": "",
+    }
 
-        - value: 50
-          constraints:
-            namespace: "namespaceA"
+    dynamic_config = render("dynamic_config.jinja", dynamic_config_context(options, {})).strip()
+    assert dynamic_config == expected_output
 
 
-        - value: 100
-          constraints:
-            namespace: "namespaceB"
+@pytest.mark.parametrize(
+    "config",
+    [
+        {"namespace-rps-limit": "namespaceA"},
+        {"rate-limits": "frontend: {rps: -1}"},
+    ],
+)
+def test_invalid_rate_limits(context, state, config):
+    state = dataclasses.replace(state, config={**state.config, **config})
 
+    state_out = context.run(context.on.config_changed(), state)
 
-        - value: 200
-          constraints:
-            namespace: "namespaceC"
+    assert isinstance(state_out.unit_status, ops.BlockedStatus)
+    assert state_out.unit_status.message.startswith(("namespace-rps-limit:", "rate-limits:"))
 
-        matching.longPollExpirationInterval:
-          - value: "50s"
 
-    """
-    ).strip()
+def with_up_check(container):
+    """Add the info of the `up` check that Pebble reports once the layer is planned."""
+    return dataclasses.replace(
+        container,
+        check_infos=[
+            ops.testing.CheckInfo(
+                "up", level=ops.pebble.CheckLevel.ALIVE, startup=ops.pebble.CheckStartup.UNSET, threshold=None
+            )
+        ],
+    )
+
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+def test_update_skips_replan_when_unchanged(context, state, temporal_container, admin_relation):
+    state_out = context.run(context.on.pebble_ready(temporal_container), state)
+    state_out = context.run(context.on.relation_changed(admin_relation), state_out)
+    container = with_up_check(state_out.get_container("temporal"))
+    state_out = dataclasses.replace(state_out, containers=[container])
+
+    # Nothing changed since the last replan, so nothing is pushed or replanned.
+    with unittest.mock.patch("ops.model.Container.replan") as replan, unittest.mock.patch(
+        "ops.model.Container.push"
+    ) as push:
+        state_out = context.run(context.on.config_changed(), state_out)
+        replan.assert_not_called()
+        push.assert_not_called()
+    assert state_out.unit_status == ops.ActiveStatus()
+
+    # A config change is detected and reported.
+    state_out = dataclasses.replace(
+        state_out,
+        config={"num-history-shards": 1, "log-level": "debug"},
+    )
+    with unittest.mock.patch("ops.model.Container.replan") as replan:
+        state_out = context.run(context.on.config_changed(), state_out)
+        replan.assert_called_once()
+    assert "temporal configuration changed: config, context, layer" in [log.message for log in context.juju_log]
+
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+def test_dynamic_config_change_skips_replan(context, state, temporal_container, admin_relation):
+    state_out = context.run(context.on.pebble_ready(temporal_container), state)
+    state_out = context.run(context.on.relation_changed(admin_relation), state_out)
+    container = with_up_check(state_out.get_container("temporal"))
+    state_out = dataclasses.replace(
+        state_out,
+        containers=[container],
+        config={"num-history-shards": 1, "global-rps-limit": 500, "long-poll-interval": "30s"},
+    )
+
+    # Only the dynamic config file is rewritten, the server polls it.
+    with unittest.mock.patch("ops.model.Container.replan") as replan, unittest.mock.patch(
+        "ops.model.Container.restart"
+    ) as restart:
+        state_out = context.run(context.on.config_changed(), state_out)
+        replan.assert_not_called()
+        restart.assert_not_called()
+    assert state_out.unit_status == ops.ActiveStatus()
+    assert "temporal dynamic configuration changed, skipping replan" in [log.message for log in context.juju_log]
+
+    dynamic_config = (
+        state_out.get_container("temporal")
+        .get_filesystem(context)
+        .joinpath("etc/temporal/config/dynamicconfig/docker.yaml")
+    )
+    assert "value: 500" in dynamic_config.read_text()
+    assert '"30s"' in dynamic_config.read_text()
+
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+def test_invalid_dynamic_config_poll_interval(context, state, temporal_container):
+    state = dataclasses.replace(state, config={"num-history-shards": 1, "dynamic-config-poll-interval": "1s"})
+    state_out = context.run(context.on.pebble_ready(temporal_container), state)
+    assert state_out.unit_status == ops.BlockedStatus(
+        "value of 'dynamic-config-poll-interval' must be a valid time duration of at least 5s"
+    )
+
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+def test_invalid_dynamic_config(context, state, temporal_container):
+    state = dataclasses.replace(state, config={"num-history-shards": 1, "dynamic-config": "history.cacheSize: 10"})
+    state_out = context.run(context.on.pebble_ready(temporal_container), state)
+    assert state_out.unit_status == ops.BlockedStatus("dynamic-config: unknown key 'history.cacheSize'")
 
-    dynamic_context = {
-        "GLOBAL_RPS_LIMIT": 500,
-        "NAMESPACE_RPS_LIMIT": "namespaceA:50|namespaceB:100|namespaceC:200",
-        "LONG_POLL_INTERVAL": "50s",
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+def test_persistence_max_qps_per_role(context, state, temporal_container):
+    config = {
+        "num-history-shards": 1,
+        "services": "history",
+        "history-persistence-max-qps": 9000,
+        "frontend-persistence-max-qps": 2000,
     }
+    state = dataclasses.replace(state, config=config)
+    state_out = context.run(context.on.pebble_ready(temporal_container), state)
+
+    dynamic_config = (
+        state_out.get_container("temporal")
+        .get_filesystem(context)
+        .joinpath("etc/temporal/config/dynamicconfig/docker.yaml")
+    )
+    rendered = yaml.safe_load(dynamic_config.read_text())
+    assert rendered["history.persistenceMaxQPS"] == [{"value": 9000}]
+    assert "frontend.persistenceMaxQPS" not in rendered
 
-    dynamic_config = render("dynamic_config.jinja", dynamic_context).strip()
-    assert textwrap.dedent(dynamic_config).strip() == expected_output
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+def test_connection_pools_fit_ceiling(context, state, temporal_container, admin_relation, peer_relation):
+    peer_relation = dataclasses.replace(peer_relation, peers_data={1: {}, 2: {}})
+    relations = [relation for relation in state.relations if relation.endpoint != "peer"] + [peer_relation]
+    state = dataclasses.replace(
+        state, relations=relations, config={"num-history-shards": 1, "database-connection-ceiling": 75}
+    )
+    state_out = context.run(context.on.pebble_ready(temporal_container), state)
+    state_out = context.run(context.on.relation_changed(admin_relation), state_out)
+
+    # 75 connections for 3 units running 4 services and the internal frontend,
+    # split 2:1 between the pools.
+    config = yaml.safe_load(
+        state_out.get_container("temporal")
+        .get_filesystem(context)
+        .joinpath("etc/temporal/config/charm.yaml")
+        .read_text()
+    )
+    datastores = config["persistence"]["datastores"]
+    assert datastores["default"]["sql"]["maxConns"] == 3
+    assert datastores["visibility"]["sql"]["maxConns"] == 1
+    assert datastores["visibility"]["sql"]["maxIdleConns"] == 1
+    budget = json.loads(state_out.get_relation(peer_relation.id).local_app_data["connection_budget"])
+    assert budget["units"] == 3
+
+    # A unit joining would oversubscribe the ceiling.
+    peer_relation = dataclasses.replace(
+        state_out.get_relation(peer_relation.id), peers_data={unit_id: {} for unit_id in range(1, 8)}
+    )
+    relations = [relation for relation in state_out.relations if relation.endpoint != "peer"] + [peer_relation]
+    state_out = dataclasses.replace(
+        state_out, relations=relations, containers=[with_up_check(state_out.get_container("temporal"))]
+    )
+    state_out = context.run(context.on.relation_joined(peer_relation, remote_unit=7), state_out)
+    assert state_out.unit_status == ops.BlockedStatus(
+        "database-connection-ceiling: 75 connections cannot be shared by 8 units running 5 services, "
+        "at least 80 are needed"
+    )
+
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+def test_transaction_pooler(context, state, temporal_container, admin_relation):
+    config = {
+        "num-history-shards": 1,
+        "persistence-pooler-mode": "transaction",
+        "persistence-endpoint-override": "pgbouncer-k8s:6432",
+    }
+    state = dataclasses.replace(state, config=config)
+    state_out = context.run(context.on.pebble_ready(temporal_container), state)
+    state_out = context.run(context.on.relation_changed(admin_relation), state_out)
+
+    config = yaml.safe_load(
+        state_out.get_container("temporal")
+        .get_filesystem(context)
+        .joinpath("etc/temporal/config/charm.yaml")
+        .read_text()
+    )
+    default_store = config["persistence"]["datastores"]["default"]["sql"]
+    visibility_store = config["persistence"]["datastores"]["visibility"]["sql"]
+    assert default_store["connectAddr"] == "pgbouncer-k8s:6432"
+    assert default_store["connectAttributes"] == {"binary_parameters": "yes"}
+    assert visibility_store["connectAddr"] == "myhost:5432"
+    assert "connectAttributes" not in visibility_store
+
+
+@pytest.mark.parametrize(
+    "config,message",
+    [
+        ({"visibility-pooler-mode": "statement"}, "value of 'visibility-pooler-mode' must be one of"),
+        ({"persistence-endpoint-override": "pgbouncer-k8s"}, "value of 'persistence-endpoint-override' must be"),
+    ],
+)
+def test_invalid_pooler_config(context, state, config, message):
+    state = dataclasses.replace(state, config={**state.config, **config})
+
+    state_out = context.run(context.on.config_changed(), state)
+
+    assert isinstance(state_out.unit_status, ops.BlockedStatus)
+    assert state_out.unit_status.message.startswith(message)
+
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+@pytest.mark.parametrize("replica", [True, False], ids=["replica", "no replica"])
+def test_visibility_reads_from_replica(context, state, temporal_container, admin_relation, peer_relation, replica):
+    database_connections = json.loads(peer_relation.local_app_data["database_connections"])
+    if replica:
+        database_connections["visibility"].update({"read_only_host": "replica", "read_only_port": "5432"})
+    peer_relation = dataclasses.replace(
+        peer_relation,
+        local_app_data={**peer_relation.local_app_data, "database_connections": json.dumps(database_connections)},
+    )
+    relations = [relation for relation in state.relations if relation.endpoint != "peer"] + [peer_relation]
+    state = dataclasses.replace(
+        state, relations=relations, config={"num-history-shards": 1, "visibility-read-from-replicas": True}
+    )
+    state_out = context.run(context.on.pebble_ready(temporal_container), state)
+    state_out = context.run(context.on.relation_changed(admin_relation), state_out)
+
+    filesystem = state_out.get_container("temporal").get_filesystem(context)
+    config = yaml.safe_load(filesystem.joinpath("etc/temporal/config/charm.yaml").read_text())
+    dynamic_config = yaml.safe_load(filesystem.joinpath("etc/temporal/config/dynamicconfig/docker.yaml").read_text())
+    assert config["persistence"]["datastores"]["visibility"]["sql"]["connectAddr"] == "myhost:5432"
+    if replica:
+        assert config["persistence"]["secondaryVisibilityStore"] == "visibility-replica"
+        assert config["persistence"]["datastores"]["visibility-replica"]["sql"]["connectAddr"] == "replica:5432"
+        assert dynamic_config["system.secondaryVisibilityWritingMode"] == [{"value": "off"}]
+        assert dynamic_config["system.enableReadFromSecondaryVisibility"] == [{"value": True}]
+    else:
+        assert "secondaryVisibilityStore" not in config["persistence"]
+        assert "system.enableReadFromSecondaryVisibility" not in dynamic_config
+        assert "no read-only visibility endpoint available, visibility reads use the primary" in [
+            log.message for log in context.juju_log
+        ]
+
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+def test_persistence_endpoints_failover(context, state, temporal_container, admin_relation, peer_relation):
+    database_connections = json.loads(peer_relation.local_app_data["database_connections"])
+    database_connections["db"]["endpoints"] = ["myhost:5432", "standby:5432"]
+    peer_relation = dataclasses.replace(
+        peer_relation,
+        local_app_data={**peer_relation.local_app_data, "database_connections": json.dumps(database_connections)},
+    )
+    relations = [relation for relation in state.relations if relation.endpoint != "peer"] + [peer_relation]
+    state = dataclasses.replace(state, relations=relations)
+    state_out = context.run(context.on.pebble_ready(temporal_container), state)
+    state_out = context.run(context.on.relation_changed(admin_relation), state_out)
+
+    config = yaml.safe_load(
+        state_out.get_container("temporal")
+        .get_filesystem(context)
+        .joinpath("etc/temporal/config/charm.yaml")
+        .read_text()
+    )
+    default_store = config["persistence"]["datastores"]["default"]["sql"]
+    assert default_store["pluginName"] == "postgres_pgx"
+    assert default_store["connectAddr"] == "myhost:5432,standby:5432"
+    assert default_store["connectAttributes"] == {"target_session_attrs": "read-write"}
+    assert config["persistence"]["datastores"]["visibility"]["sql"]["pluginName"] == "postgres12"
+
+
+OPENSEARCH_STATE = {
+    "scheme": "https",
+    "host": "opensearch",
+    "port": "9200",
+    "username": "temporal",
+    "password": "secret",
+    "tls_ca": "ca",
+    "index": "temporal_visibility_v1",
+    "index_ready": True,
+}
+
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+def test_advanced_visibility_requires_opensearch(context, state, temporal_container):
+    state = dataclasses.replace(state, config={"num-history-shards": 1, "advanced-visibility-mode": "dual-write"})
+    state_out = context.run(context.on.pebble_ready(temporal_container), state)
+    assert state_out.unit_status == ops.BlockedStatus("opensearch:temporal relation not ready")
+
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+@pytest.mark.parametrize(
+    "mode,visibility_store,secondary_visibility_store,writing_mode,read_from_secondary",
+    [
+        ("dual-write", "visibility", "es-visibility", "dual", False),
+        ("dual-read", "visibility", "es-visibility", "dual", True),
+        ("on", "es-visibility", None, None, None),
+    ],
+)
+def test_advanced_visibility(
+    context,
+    state,
+    temporal_container,
+    admin_relation,
+    peer_relation,
+    mode,
+    visibility_store,
+    secondary_visibility_store,
+    writing_mode,
+    read_from_secondary,
+):
+    peer_relation = dataclasses.replace(
+        peer_relation, local_app_data={**peer_relation.local_app_data, "opensearch": json.dumps(OPENSEARCH_STATE)}
+    )
+    relations = [relation for relation in state.relations if relation.endpoint != "peer"] + [peer_relation]
+    state = dataclasses.replace(
+        state, relations=relations, config={"num-history-shards": 1, "advanced-visibility-mode": mode}
+    )
+    state_out = context.run(context.on.pebble_ready(temporal_container), state)
+    state_out = context.run(context.on.relation_changed(admin_relation), state_out)
+
+    filesystem = state_out.get_container("temporal").get_filesystem(context)
+    config = yaml.safe_load(filesystem.joinpath("etc/temporal/config/charm.yaml").read_text())
+    dynamic_config = yaml.safe_load(filesystem.joinpath("etc/temporal/config/dynamicconfig/docker.yaml").read_text())
+    assert config["persistence"]["visibilityStore"] == visibility_store
+    assert config["persistence"].get("secondaryVisibilityStore") == secondary_visibility_store
+    elasticsearch = config["persistence"]["datastores"]["es-visibility"]["elasticsearch"]
+    assert elasticsearch["url"] == {"scheme": "https", "host": "opensearch:9200"}
+    assert elasticsearch["indices"] == {"visibility": "temporal_visibility_v1"}
+    assert elasticsearch["tls"] == {"enabled": True, "caFile": "/etc/temporal/config/certs/opensearch-ca.pem"}
+    assert filesystem.joinpath("etc/temporal/config/certs/opensearch-ca.pem").read_text() == "ca"
+    if writing_mode:
+        assert dynamic_config["system.secondaryVisibilityWritingMode"] == [{"value": writing_mode}]
+        assert dynamic_config["system.enableReadFromSecondaryVisibility"] == [{"value": read_from_secondary}]
+    else:
+        assert "system.secondaryVisibilityWritingMode" not in dynamic_config
+
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+def test_opensearch_index_bootstrap(context, state, temporal_container):
+    opensearch_relation = ops.testing.Relation(
+        "opensearch",
+        remote_app_data={
+            "username": "temporal",
+            "password": "secret",
+            "endpoints": "opensearch:9200",
+            "tls-ca": "ca",
+            "tls": "True",
+        },
+    )
+    state = dataclasses.replace(state, relations=[*state.relations, opensearch_relation])
+
+    with unittest.mock.patch("requests.put") as put, unittest.mock.patch("requests.head") as head:
+        put.return_value.status_code = 200
+        head.return_value.status_code = 404
+        state_out = context.run(context.on.relation_changed(opensearch_relation), state)
+
+    urls = [call.args[0] for call in put.call_args_list]
+    assert urls == [
+        "https://opensearch:9200/_index_template/temporal_visibility_v1_template",
+        "https://opensearch:9200/temporal_visibility_v1",
+    ]
+    peer_relation = next(relation for relation in state_out.relations if relation.endpoint == "peer")
+    opensearch = json.loads(peer_relation.local_app_data["opensearch"])
+    assert opensearch == OPENSEARCH_STATE
+
+
+VISIBILITY_TARGET_STATE = {
+    "dbname": "temporal-k8s_visibility_target",
+    "host": "bighost",
+    "port": "5432",
+    "endpoints": ["bighost:5432"],
+    "read_only_host": None,
+    "read_only_port": None,
+    "password": "target-pass",
+    "user": "target-user",
+    "tls": True,
+}
+
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+def test_visibility_migration_requires_target(context, state, temporal_container):
+    state = dataclasses.replace(state, config={"num-history-shards": 1, "visibility-migration-mode": "dual-write"})
+    state_out = context.run(context.on.pebble_ready(temporal_container), state)
+    assert state_out.unit_status == ops.BlockedStatus("visibility-target:temporal relation not ready")
+
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+@pytest.mark.parametrize(
+    "mode,visibility_store,secondary_visibility_store,writing_mode,read_from_secondary",
+    [
+        ("dual-write", "visibility", "visibility-target", "dual", False),
+        ("dual-read", "visibility", "visibility-target", "dual", True),
+        ("complete", "visibility-target", None, None, None),
+    ],
+)
+def test_visibility_migration(
+    context,
+    state,
+    temporal_container,
+    admin_relation,
+    peer_relation,
+    mode,
+    visibility_store,
+    secondary_visibility_store,
+    writing_mode,
+    read_from_secondary,
+):
+    peer_relation = dataclasses.replace(
+        peer_relation,
+        local_app_data={**peer_relation.local_app_data, "visibility_target": json.dumps(VISIBILITY_TARGET_STATE)},
+    )
+    relations = [relation for relation in state.relations if relation.endpoint != "peer"] + [peer_relation]
+    config = {
+        "num-history-shards": 1,
+        "visibility-migration-mode": mode,
+        "visibility-target-max-conns": 30,
+        "visibility-target-max-idle-conns": 15,
+    }
+    state = dataclasses.replace(state, relations=relations, config=config)
+    state_out = context.run(context.on.pebble_ready(temporal_container), state)
+    state_out = context.run(context.on.relation_changed(admin_relation), state_out)
+
+    filesystem = state_out.get_container("temporal").get_filesystem(context)
+    config = yaml.safe_load(filesystem.joinpath("etc/temporal/config/charm.yaml").read_text())
+    dynamic_config = yaml.safe_load(filesystem.joinpath("etc/temporal/config/dynamicconfig/docker.yaml").read_text())
+    assert config["persistence"]["visibilityStore"] == visibility_store
+    assert config["persistence"].get("secondaryVisibilityStore") == secondary_visibility_store
+    target_store = config["persistence"]["datastores"]["visibility-target"]["sql"]
+    assert target_store["databaseName"] == "temporal-k8s_visibility_target"
+    assert target_store["connectAddr"] == "bighost:5432"
+    assert target_store["tls"]["enabled"] is True
+    assert (target_store["maxConns"], target_store["maxIdleConns"]) == (30, 15)
+    assert config["persistence"]["datastores"]["visibility"]["sql"]["maxConns"] == 10
+    assert config["persistence"]["datastores"]["visibility"]["sql"]["tls"]["enabled"] is False
+    if writing_mode:
+        assert dynamic_config["system.secondaryVisibilityWritingMode"] == [{"value": writing_mode}]
+        assert dynamic_config["system.enableReadFromSecondaryVisibility"] == [{"value": read_from_secondary}]
+    else:
+        assert "system.secondaryVisibilityWritingMode" not in dynamic_config
+
+    peer_relation = next(relation for relation in state_out.relations if relation.endpoint == "peer")
+    assert json.loads(peer_relation.local_app_data["visibility_migration"])["mode"] == mode
+
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+def test_visibility_migration_progress(context, state, temporal_container, admin_relation, peer_relation):
+    migration = {"mode": "dual-write", "since": int(time.time()) - (2 * 86400 + 3 * 3600 + 60)}
+    peer_relation = dataclasses.replace(
+        peer_relation,
+        local_app_data={
+            **peer_relation.local_app_data,
+            "visibility_target": json.dumps(VISIBILITY_TARGET_STATE),
+            "visibility_migration": json.dumps(migration),
+        },
+    )
+    relations = [relation for relation in state.relations if relation.endpoint != "peer"] + [peer_relation]
+    state = dataclasses.replace(
+        state, relations=relations, config={"num-history-shards": 1, "visibility-migration-mode": "dual-write"}
+    )
+    state_out = context.run(context.on.pebble_ready(temporal_container), state)
+    state_out = context.run(context.on.relation_changed(admin_relation), state_out)
+    # The first update-status stores the database relation data, which replans.
+    for _ in range(2):
+        state_out = dataclasses.replace(state_out, containers=[with_up_check(state_out.get_container("temporal"))])
+        state_out = context.run(context.on.update_status(), state_out)
+    assert state_out.unit_status == ops.ActiveStatus("visibility migration: dual-write for 2d3h")
+
+    state_out = dataclasses.replace(
+        state_out,
+        config={**state_out.config, "visibility-migration-mode": "dual-read", "visibility-read-from-replicas": True},
+    )
+    state_out = context.run(context.on.config_changed(), state_out)
+    assert state_out.unit_status == ops.BlockedStatus(
+        "'visibility-migration-mode' cannot be combined with 'visibility-read-from-replicas'"
+    )
+
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+def test_set_task_queue_partitions_action(context, state, temporal_container, admin_relation):
+    state_out = context.run(context.on.pebble_ready(temporal_container), state)
+    state_out = context.run(context.on.relation_changed(admin_relation), state_out)
+    state_out = dataclasses.replace(state_out, containers=[with_up_check(state_out.get_container("temporal"))])
+    params = {"namespace": "payments", "task-queue": "checkout", "partitions": 2}
+
+    state_out = context.run(context.on.action("set-task-queue-partitions", params=params), state_out)
+    assert context.action_results["read-partitions"] == 4
+    assert context.action_results["write-partitions"] == 2
+    dynamic_config = (
+        state_out.get_container("temporal")
+        .get_filesystem(context)
+        .joinpath("etc/temporal/config/dynamicconfig/docker.yaml")
+    )
+    rendered = yaml.safe_load(dynamic_config.read_text())
+    assert rendered["matching.numTaskqueueReadPartitions"][0]["value"] == 4
+    assert rendered["matching.numTaskqueueWritePartitions"][0]["value"] == 2
+
+    state_out = dataclasses.replace(state_out, containers=[with_up_check(state_out.get_container("temporal"))])
+    state_out = context.run(context.on.action("set-task-queue-partitions", params=params), state_out)
+    assert context.action_results["read-partitions"] == 2
+    assert context.action_results["result"] == "task queue partitions set to 2"
+
+    # Resetting the override returns the task queue to the config option.
+    state_out = dataclasses.replace(
+        state_out,
+        config={**state_out.config, "task-queue-partitions": "payments/checkout:8"},
+        containers=[with_up_check(state_out.get_container("temporal"))],
+    )
+    params = {"namespace": "payments", "task-queue": "checkout", "reset": True}
+    state_out = context.run(context.on.action("set-task-queue-partitions", params=params), state_out)
+    assert context.action_results["read-partitions"] == 8
+    assert context.action_results["write-partitions"] == 8
+
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+def test_task_queue_partitions_config_steps(context, state, temporal_container, admin_relation):
+    state_out = context.run(context.on.pebble_ready(temporal_container), state)
+    state_out = context.run(context.on.relation_changed(admin_relation), state_out)
+
+    def rendered_partitions(state_out):
+        dynamic_config = (
+            state_out.get_container("temporal")
+            .get_filesystem(context)
+            .joinpath("etc/temporal/config/dynamicconfig/docker.yaml")
+        )
+        rendered = yaml.safe_load(dynamic_config.read_text())
+        return (
+            rendered["matching.numTaskqueueReadPartitions"][0]["value"],
+            rendered["matching.numTaskqueueWritePartitions"][0]["value"],
+        )
+
+    for partitions, expected in (("payments:8", (8, 8)), ("payments:2", (8, 2))):
+        state_out = dataclasses.replace(
+            state_out,
+            config={**state_out.config, "task-queue-partitions": partitions},
+            containers=[with_up_check(state_out.get_container("temporal"))],
+        )
+        state_out = context.run(context.on.config_changed(), state_out)
+        assert rendered_partitions(state_out) == expected
+
+    # Read partitions are only reduced once the backlog had time to drain.
+    state_out = dataclasses.replace(state_out, containers=[with_up_check(state_out.get_container("temporal"))])
+    state_out = context.run(context.on.update_status(), state_out)
+    peer_data = next(relation for relation in state_out.relations if relation.endpoint == "peer").local_app_data
+    assert json.loads(peer_data["task_queue_partitions"])["payments/"]["read"] == 8
+
+    state_out = dataclasses.replace(state_out, containers=[with_up_check(state_out.get_container("temporal"))])
+    with unittest.mock.patch("charm.time.time", return_value=time.time() + 600):
+        state_out = context.run(context.on.update_status(), state_out)
+    assert rendered_partitions(state_out) == (2, 2)
+
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+def test_set_task_queue_partitions_container_not_ready(context, state):
+    state = dataclasses.replace(state, containers=[ops.testing.Container("temporal", can_connect=False)])
+    params = {"namespace": "payments", "partitions": 2}
+    with pytest.raises(ops.testing.ActionFailed, match="temporal container not ready"):
+        context.run(context.on.action("set-task-queue-partitions", params=params), state)
+
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+def test_plan_history_shards_action(context, state):
+    params = {"workflow-start-rate": 100, "state-transitions-per-second": 2000, "history-units": 4}
+    context.run(context.on.action("plan-history-shards", params=params), state)
+    assert context.action_results == {
+        "recommended-shards": 512,
+        "shards-per-history-unit": "128",
+        "current-shards": 1,
+        "warnings": "current shards: 0.25 shards per history unit is below 64, shards are unevenly spread "
+        "and losing a unit moves a large share of the load",
+    }
+
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+def test_cluster_metadata(context, state, temporal_container, admin_relation):
+    config = {"num-history-shards": 1, "cluster-name": "green", "initial-failover-version": 2}
+    state = dataclasses.replace(state, config={**config, "enable-global-namespaces": True})
+    state_out = context.run(context.on.pebble_ready(temporal_container), state)
+    state_out = context.run(context.on.relation_changed(admin_relation), state_out)
+
+    rendered = yaml.safe_load(
+        state_out.get_container("temporal")
+        .get_filesystem(context)
+        .joinpath("etc/temporal/config/charm.yaml")
+        .read_text()
+    )
+    assert rendered["clusterMetadata"]["enableGlobalNamespace"] is True
+    assert rendered["clusterMetadata"]["currentClusterName"] == "green"
+    assert rendered["clusterMetadata"]["clusterInformation"]["green"]["initialFailoverVersion"] == 2
+
+    state_out = dataclasses.replace(
+        state_out,
+        config={**config, "cluster-name": "blue"},
+        containers=[with_up_check(state_out.get_container("temporal"))],
+    )
+    state_out = context.run(context.on.config_changed(), state_out)
+    assert state_out.unit_status == ops.BlockedStatus(
+        "value of 'cluster-name' config cannot be changed after deployment. Value should be green"
+    )
+
+    state_out = dataclasses.replace(
+        state_out,
+        config={**config, "initial-failover-version": 3},
+        containers=[with_up_check(state_out.get_container("temporal"))],
+    )
+    state_out = context.run(context.on.config_changed(), state_out)
+    assert state_out.unit_status == ops.BlockedStatus(
+        "value of 'initial-failover-version' config cannot be changed after deployment. Value should be 2"
+    )
+
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+def test_shard_migration_actions(context, state):
+    tctl = ["tctl", "--address", "temporal-k8s:7233"]
+    container = ops.testing.Container(
+        "temporal",
+        can_connect=True,
+        execs={
+            ops.testing.Exec(["tctl"]),
+            ops.testing.Exec(
+                [*tctl, "--namespace", "payments", "namespace", "describe"],
+                stdout="Name: payments\nActiveClusterName: active\nIsGlobalNamespace: false\n",
+            ),
+        },
+    )
+    state = dataclasses.replace(
+        state, containers=[container], config={"num-history-shards": 1, "enable-global-namespaces": True}
+    )
+
+    params = {"target-cluster": "green", "target-address": "temporal-k8s-green:7233", "namespaces": "payments"}
+    state_out = context.run(context.on.action("start-shard-migration", params=params), state)
+    assert [exec_args.command for exec_args in context.exec_history["temporal"]] == [
+        [*tctl, "admin", "cluster", "upsert-remote-cluster", "--frontend_address", "temporal-k8s-green:7233"],
+        [
+            "tctl",
+            "--address",
+            "temporal-k8s-green:7233",
+            "admin",
+            "cluster",
+            "upsert-remote-cluster",
+            "--frontend_address",
+            "temporal-k8s:7233",
+        ],
+        [*tctl, "--namespace", "payments", "namespace", "describe"],
+        [*tctl, "--namespace", "payments", "namespace", "update", "--promote_namespace", "true"],
+        [*tctl, "--namespace", "payments", "namespace", "update", "--clusters", "active", "green"],
+    ]
+    peer_relation = next(relation for relation in state_out.relations if relation.endpoint == "peer")
+    assert json.loads(peer_relation.local_app_data["shard_migration"])["phase"] == "replicating"
+
+    with pytest.raises(ops.testing.ActionFailed, match="a shard migration to 'green' was already started"):
+        context.run(context.on.action("start-shard-migration", params=params), state_out)
+
+    aborted = context.run(context.on.action("abort-shard-migration"), state_out)
+    assert context.exec_history["temporal"][-1].command == [
+        *tctl,
+        "--namespace",
+        "payments",
+        "namespace",
+        "update",
+        "--clusters",
+        "active",
+    ]
+    peer_relation = next(relation for relation in aborted.relations if relation.endpoint == "peer")
+    assert "shard_migration" not in peer_relation.local_app_data
+
+    state_out = context.run(context.on.action("shard-migration-status"), state_out)
+    assert context.action_results["phase"] == "replicating"
+    assert context.action_results["active-clusters"] == "payments=active"
+
+    state_out = context.run(context.on.action("finalize-shard-migration"), state_out)
+    assert context.exec_history["temporal"][-1].command == [
+        *tctl,
+        "--namespace",
+        "payments",
+        "namespace",
+        "update",
+        "--active_cluster",
+        "green",
+    ]
+    peer_relation = next(relation for relation in state_out.relations if relation.endpoint == "peer")
+    assert json.loads(peer_relation.local_app_data["shard_migration"])["phase"] == "handed-over"
+
+    # Another migration can be started once the previous one was handed over.
+    context.run(context.on.action("start-shard-migration", params={**params, "target-cluster": "blue"}), state_out)
+    assert context.action_results["result"].startswith("replicating 1 namespaces to 'blue'")
+
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+def test_shard_migration_requires_global_namespaces(context, state, temporal_container):
+    state = dataclasses.replace(state, containers=[temporal_container])
+    params = {"target-cluster": "green", "target-address": "temporal-k8s-green:7233", "namespaces": "payments"}
+    with pytest.raises(ops.testing.ActionFailed, match="enable-global-namespaces must be set on both clusters"):
+        context.run(context.on.action("start-shard-migration", params=params), state)
+
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+def test_go_runtime_from_container_limits(context, state, admin_relation, tmp_path):
+    tmp_path.joinpath("cpu.max").write_text("250000 100000\n")
+    tmp_path.joinpath("memory.max").write_text(f"{4 * 2**30}\n")
+    container = ops.testing.Container(
+        "temporal",
+        can_connect=True,
+        mounts={"cgroup": ops.testing.Mount(location="/sys/fs/cgroup", source=tmp_path)},
+    )
+    state = dataclasses.replace(state, containers=[container], config={"num-history-shards": 1, "go-gc": "50"})
+    state_out = context.run(context.on.pebble_ready(container), state)
+    state_out = context.run(context.on.relation_changed(admin_relation), state_out)
+
+    environment = state_out.get_container("temporal").plan.services["temporal"].environment
+    assert environment["GOMAXPROCS"] == 2
+    assert environment["GOMEMLIMIT"] == "3686MiB"
+    assert environment["GOGC"] == "50"
+
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+def test_container_resources(context, state):
+    state = dataclasses.replace(state, config={"num-history-shards": 1, "services": "history", "cpu-limit": "6"})
+    with unittest.mock.patch("lightkube.Client") as client:
+        client.return_value.get.return_value.spec.template.spec.containers = [
+            MagicMock(resources=None),
+            MagicMock(resources=None),
+        ]
+        client.return_value.get.return_value.spec.template.spec.containers[1].name = "temporal"
+        context.run(context.on.config_changed(), state)
+
+    patch = client.return_value.patch.call_args.kwargs["obj"]
+    assert patch["spec"]["template"]["spec"]["containers"] == [
+        {
+            "name": "temporal",
+            "resources": {
+                "requests": {"cpu": "1000m", "memory": "2048Mi"},
+                "limits": {"cpu": "6000m", "memory": "8192Mi"},
+            },
+        }
+    ]
+
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+def test_container_resources_opt_in(context, state):
+    with unittest.mock.patch("lightkube.Client") as client:
+        context.run(context.on.config_changed(), state)
+    client.assert_not_called()
+
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+def test_container_resources_transport_error(context, state):
+    state = dataclasses.replace(state, config={"num-history-shards": 1, "cpu-limit": "6"})
+    with unittest.mock.patch("lightkube.Client") as client:
+        client.return_value.get.side_effect = httpx2.ConnectError("connection refused")
+        state_out = context.run(context.on.config_changed(), state)
+    assert not isinstance(state_out.unit_status, ops.ErrorStatus)
+
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+def test_capture_profile_action(context, state, tmp_path):
+    for index in range(10):
+        old_profile = tmp_path.joinpath(f"old-{index}.pb.gz")
+        old_profile.write_bytes(b"old")
+        os.utime(old_profile, (index, index))
+    tmp_path.joinpath("temporal-k8s-0-cpu-20240101T000000Z.pb.gz").write_bytes(b"\x1f\x8bprofile")
+    container = ops.testing.Container(
+        "temporal",
+        can_connect=True,
+        execs={ops.testing.Exec(["curl"])},
+        mounts={"profiles": ops.testing.Mount(location="/var/lib/temporal/profiles", source=tmp_path)},
+    )
+    state = dataclasses.replace(state, containers=[container], config={"num-history-shards": 1, "pprof-port": 6060})
+
+    params = {"profile": "cpu", "duration": 10, "upload": True}
+    with unittest.mock.patch("pprof.time.strftime", return_value="20240101T000000Z"), unittest.mock.patch(
+        "relations.s3_archival.upload_object", return_value="s3://bucket/profiles/profile.pb.gz"
+    ) as upload_object:
+        context.run(context.on.action("capture-profile", params=params), state)
+
+    path = "/var/lib/temporal/profiles/temporal-k8s-0-cpu-20240101T000000Z.pb.gz"
+    assert context.action_results == {"path": path, "size": 9, "uri": "s3://bucket/profiles/profile.pb.gz"}
+    assert context.exec_history["temporal"][0].command[-1] == "http://localhost:6060/debug/pprof/profile?seconds=10"
+    assert upload_object.call_args.args[1:] == (
+        "profiles/temporal-k8s-0-cpu-20240101T000000Z.pb.gz",
+        b"\x1f\x8bprofile",
+    )
+    # The oldest profile is removed to keep the 10 most recent ones.
+    assert not tmp_path.joinpath("old-0.pb.gz").exists()
+    assert len(list(tmp_path.iterdir())) == 10
+
+
+def test_capture_profile_requires_pprof_port(context, state):
+    with pytest.raises(ops.testing.ActionFailed, match="set the pprof-port config option"):
+        context.run(context.on.action("capture-profile", params={"profile": "heap"}), state)
+
+
+def test_run_benchmark_action(context, state):
+    async def fake_run_benchmark(*args):
+        return [0.01, 0.02, 0.04], collections.Counter({"RPCError": 1}), 1.5
+
+    params = {"duration": 5, "concurrency": 4, "workflows": 100, "activities": 1, "namespace": "bench", "tls": False}
+    with unittest.mock.patch("benchmark.run_benchmark", side_effect=fake_run_benchmark) as run_benchmark:
+        context.run(context.on.action("run-benchmark", params=params), state)
+
+    assert run_benchmark.call_args.args == ("temporal-k8s:7233", "bench", False, 5, 4, 100, 1)
+    assert context.action_results == {
+        "completed": 3,
+        "errors": 1,
+        "throughput": "2.00",
+        "p50-ms": 20,
+        "p95-ms": 40,
+        "p99-ms": 40,
+        "elapsed-seconds": "1.5",
+        "error-types": "RPCError=1",
+    }
+
+
+def test_run_benchmark_unreachable_cluster(context, state):
+    async def fake_run_benchmark(*args):
+        raise ValueError("failed to run the benchmark against temporal:7233: connection refused")
+
+    with unittest.mock.patch("benchmark.run_benchmark", side_effect=fake_run_benchmark), pytest.raises(
+        ops.testing.ActionFailed, match="failed to run the benchmark against temporal:7233: connection refused"
+    ):
+        params = {
+            "duration": 5,
+            "concurrency": 4,
+            "workflows": 0,
+            "activities": 1,
+            "namespace": "default",
+            "tls": False,
+            "address": "temporal:7233",
+        }
+        context.run(context.on.action("run-benchmark", params=params), state)
+
+
+@pytest.mark.parametrize_skip_if(lambda leader: not leader)
+def test_event_handlers_are_profiled(context, state, temporal_container, admin_relation, hook_metrics_dir):
+    state_out = context.run(context.on.pebble_ready(temporal_container), state)
+    context.run(context.on.relation_changed(admin_relation), state_out)
+
+    profiles = {
+        profile["handler"]: profile
+        for profile in (
+            json.loads(log.message.split("* profile ", 1)[1])
+            for log in context.juju_log
+            if log.message.startswith("* profile ")
+        )
+    }
+    profile = profiles["Admin._on_schema_changed"]
+    assert profile["relation_reads"] > 0
+    assert profile["pebble_calls"] > 0
+    assert profile["wall_time_seconds"] >= 0
+    assert profile["relation_writes"] > 0
+    assert "TemporalK8SCharm._on_pre_commit" not in profiles
+    assert 'temporal_charm_handler_relation_writes{handler="Admin._on_schema_changed"}' in hook_metrics_dir.read_text()
+
+
+def test_optional_relation_libraries_are_lazy(context, state, peer_relation, s3_relation):
+    state = dataclasses.replace(state, relations=[peer_relation])
+    with context(context.on.update_status(), state) as manager:
+        assert manager.charm.s3_client is None
+        assert manager.charm.openfga is None
+        assert manager.charm.opensearch is None
+        assert manager.charm._log_forwarder is None
+        manager.run()
+
+    state = dataclasses.replace(state, relations=[peer_relation, s3_relation])
+    with context(context.on.update_status(), state) as manager:
+        assert manager.charm.s3_client is not None
+        assert manager.charm.openfga is None
+        manager.run()
@@ -0,0 +1,48 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+#
+# Learn more about testing at: https://juju.is/docs/sdk/testing
+
+
+"""Benchmark results unit tests."""
+
+import collections
+from unittest import TestCase
+
+from benchmark import benchmark_stats, percentile
+
+
+class TestBenchmark(TestCase):
+    """Unit tests for the benchmark results."""
+
+    def test_percentile(self):
+        """Percentiles are taken by the nearest-rank method."""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([3], 99), 3)
+        self.assertEqual(percentile([], 50), 0)
+
+    def test_stats(self):
+        """The latencies are reported in milliseconds, with the errors by type."""
+        stats = benchmark_stats([0.03, 0.01, 0.02, 0.5], collections.Counter({"RPCError": 2, "TimeoutError": 1}), 2)
+        self.assertEqual(
+            stats,
+            {
+                "completed": 4,
+                "errors": 3,
+                "throughput": "2.00",
+                "p50-ms": 20,
+                "p95-ms": 500,
+                "p99-ms": 500,
+                "elapsed-seconds": "2.0",
+                "error-types": "RPCError=2, TimeoutError=1",
+            },
+        )
+
+    def test_stats_without_workflows(self):
+        """An empty benchmark reports no throughput nor errors."""
+        stats = benchmark_stats([], collections.Counter(), 0)
+        self.assertEqual(stats["throughput"], "0.00")
+        self.assertEqual(stats["p99-ms"], 0)
+        self.assertNotIn("error-types", stats)
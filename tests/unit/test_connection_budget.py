@@ -0,0 +1,71 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+#
+# Learn more about testing at: https://juju.is/docs/sdk/testing
+
+
+"""Connection budget unit tests."""
+
+from unittest import TestCase
+
+import yaml
+
+from connection_budget import budget_context, connection_budget
+from rendering import render
+
+POOLS = {
+    "persistence": {"max_conns": 20, "max_idle_conns": 20},
+    "visibility": {"max_conns": 10, "max_idle_conns": 5},
+}
+
+
+class TestConnectionBudget(TestCase):
+    """Unit tests for the connection pool sizing."""
+
+    def test_split(self):
+        """The ceiling is split between units, services and pools."""
+        self.assertEqual(
+            connection_budget(300, 2, ["history", "matching"], POOLS),
+            {
+                "persistence": {"max_conns": 20, "max_idle_conns": 20},
+                "visibility": {"max_conns": 10, "max_idle_conns": 5},
+            },
+        )
+        self.assertEqual(
+            connection_budget(90, 5, ["history", "matching"], POOLS),
+            {
+                "persistence": {"max_conns": 6, "max_idle_conns": 6},
+                "visibility": {"max_conns": 3, "max_idle_conns": 3},
+            },
+        )
+
+    def test_never_exceeds_ceiling(self):
+        """The pools of all the units fit in the ceiling."""
+        for ceiling in range(8, 200):
+            with self.subTest(ceiling=ceiling):
+                budget = connection_budget(ceiling, 4, ["history"], POOLS)
+                self.assertLessEqual(4 * sum(pool["max_conns"] for pool in budget.values()), ceiling)
+
+    def test_rendered_pools_fit_ceiling(self):
+        """The pools rendered for every service and store fit in the ceiling."""
+        pools = dict(POOLS, **{"visibility-target": POOLS["visibility"]})
+        replica_pools = dict(POOLS, **{"visibility-replica": POOLS["visibility"]})
+        services = ["frontend", "history", "internal-frontend"]
+        stores = {
+            "migration": (pools, {"VISIBILITY_MIGRATION_MODE": "dual-write", "VISIBILITY_TARGET_ENDPOINTS": "db:5432"}),
+            "replica": (replica_pools, {"VISIBILITY_REPLICA_HOST": "replica", "VISIBILITY_REPLICA_PORT": 5432}),
+        }
+        for case, (case_pools, context) in stores.items():
+            for ceiling in (40, 97, 250):
+                with self.subTest(case=case, ceiling=ceiling):
+                    budget = connection_budget(ceiling, 3, services, case_pools)
+                    config = yaml.safe_load(render("config.jinja", dict(context, **budget_context(budget))))
+                    datastores = config["persistence"]["datastores"]
+                    self.assertEqual(len(datastores), len(case_pools))
+                    max_conns = sum(store["sql"]["maxConns"] for store in datastores.values())
+                    self.assertLessEqual(3 * len(services) * max_conns, ceiling)
+
+    def test_oversubscribed(self):
+        """A ceiling that cannot fit one connection per pool is rejected."""
+        with self.assertRaisesRegex(ValueError, "at least 24 are needed"):
+            connection_budget(23, 3, ["frontend", "history", "matching", "worker"], POOLS)
@@ -0,0 +1,262 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+#
+# Learn more about testing at: https://juju.is/docs/sdk/testing
+
+
+"""Dynamic config validation unit tests."""
+
+import textwrap
+from unittest import TestCase
+
+import yaml
+
+import rendering
+from dynamic_config import (
+    dynamic_config_context,
+    next_task_queue_partitions,
+    parse_dynamic_config,
+    parse_rate_limits,
+    parse_task_queue_partitions,
+    plan_task_queue_partitions,
+)
+
+OPTIONS = {
+    "global-rps-limit": 500,
+    "namespace-rps-limit": "",
+    "rate-limits": "",
+    "long-poll-interval": "50s",
+    "dynamic-config": "",
+    "task-queue-partitions": "",
+}
+
+DYNAMIC_CONFIG = textwrap.dedent(
+    """
+    history.cacheMaxSize: 4096
+    matching.forwardermaxoutstandingpolls:
+      - value: 8
+        constraints:
+          namespace: payments
+          taskQueueName: checkout
+      - value: 4
+    frontend.keepAliveMaxConnectionAge: 5m
+    """
+)
+
+
+class TestDynamicConfig(TestCase):
+    """Unit tests for the dynamic-config option."""
+
+    def test_parse(self):
+        """Plain values and constrained values are normalized to catalog keys."""
+        self.assertEqual(
+            parse_dynamic_config(DYNAMIC_CONFIG),
+            {
+                "history.cacheMaxSize": [{"value": 4096, "constraints": {}}],
+                "matching.forwarderMaxOutstandingPolls": [
+                    {"value": 8, "constraints": {"namespace": "payments", "taskQueueName": "checkout"}},
+                    {"value": 4, "constraints": {}},
+                ],
+                "frontend.keepAliveMaxConnectionAge": [{"value": "5m", "constraints": {}}],
+            },
+        )
+        self.assertEqual(parse_dynamic_config(""), {})
+
+    def test_parse_worker_and_visibility_keys(self):
+        """Worker and visibility knobs are part of the catalog."""
+        raw = textwrap.dedent(
+            """
+            worker.perNamespaceWorkerCount:
+              - value: 2
+                constraints:
+                  namespace: payments
+            worker.historyScannerEnabled: false
+            frontend.visibilityMaxPageSize: 500
+            system.visibilityPersistenceSlowQueryThreshold: 2s
+            """
+        )
+        self.assertEqual(
+            parse_dynamic_config(raw),
+            {
+                "worker.perNamespaceWorkerCount": [{"value": 2, "constraints": {"namespace": "payments"}}],
+                "worker.historyScannerEnabled": [{"value": False, "constraints": {}}],
+                "frontend.visibilityMaxPageSize": [{"value": 500, "constraints": {}}],
+                "system.visibilityPersistenceSlowQueryThreshold": [{"value": "2s", "constraints": {}}],
+            },
+        )
+
+    def test_invalid(self):
+        """Typos, wrong types, bad constraints and managed keys are rejected."""
+        invalid = {
+            "history.cacheMaxSzie: 10": "unknown key 'history.cacheMaxSzie'",
+            "history.cacheMaxSize: big": "value of 'history.cacheMaxSize' must be a int",
+            "history.cacheMaxSize: 0": "value of 'history.cacheMaxSize' must be >= 1",
+            "frontend.keepAliveMaxConnectionAge: 5 minutes": "must be a duration",
+            "history.rps: [{value: 10, constraints: {namespace: a}}]": "cannot be constrained by namespace",
+            "frontend.rps: 10": "use rate-limits",
+            "frontend.namespaceRPS: 10": "is managed by the charm",
+            "history.persistenceMaxQPS: 10": "use history-persistence-max-qps or rate-limits",
+            "matching.numTaskqueueReadPartitions: 8": "use task-queue-partitions",
+            "worker.historyScannerEnabled: 1": "value of 'worker.historyScannerEnabled' must be a bool",
+            "system.visibilityPersistenceMaxReadQPS: 10": "use rate-limits",
+            "- history.cacheMaxSize": "must be a mapping",
+        }
+        for raw, message in invalid.items():
+            with self.subTest(raw=raw), self.assertRaisesRegex(ValueError, message):
+                parse_dynamic_config(raw)
+
+    def test_render(self):
+        """Parsed entries are rendered after the charm managed keys."""
+        context = dynamic_config_context({**OPTIONS, "dynamic-config": DYNAMIC_CONFIG}, {})
+        rendered = yaml.safe_load(rendering.render("dynamic_config.jinja", context))
+        self.assertEqual(rendered["frontend.namespacerps"], [{"value": 500}])
+        self.assertEqual(rendered["history.cacheMaxSize"], [{"value": 4096}])
+        self.assertEqual(
+            rendered["matching.forwarderMaxOutstandingPolls"],
+            [{"value": 8, "constraints": {"namespace": "payments", "taskQueueName": "checkout"}}, {"value": 4}],
+        )
+        self.assertEqual(rendered["frontend.keepAliveMaxConnectionAge"], [{"value": "5m"}])
+
+
+class TestTaskQueuePartitions(TestCase):
+    """Unit tests for the task queue partitions."""
+
+    def test_parse(self):
+        """Entries default their write partitions to the read ones."""
+        self.assertEqual(
+            parse_task_queue_partitions("payments/checkout:8| orders:8,6"),
+            {"payments/checkout": {"read": 8, "write": 8}, "orders/": {"read": 8, "write": 6}},
+        )
+        self.assertEqual(parse_task_queue_partitions(""), {})
+        for raw in ("payments", "payments:eight", ":4", "payments:4,8", "payments:0"):
+            with self.subTest(raw=raw), self.assertRaises(ValueError):
+                parse_task_queue_partitions(raw)
+
+    def test_next_partitions(self):
+        """Increases are applied at once, reductions lower write partitions first."""
+        eight, two = {"read": 8, "write": 8}, {"read": 2, "write": 2}
+        self.assertEqual(next_task_queue_partitions({"read": 4, "write": 4}, eight), eight)
+
+        step = next_task_queue_partitions(eight, two)
+        self.assertEqual(step, {"read": 8, "write": 2})
+        self.assertEqual(next_task_queue_partitions(step, two), two)
+        self.assertEqual(next_task_queue_partitions(eight, {"read": 8, "write": 6}), {"read": 8, "write": 6})
+
+    def test_plan_partitions(self):
+        """Read partitions are reduced once the backlog had time to drain."""
+        targets = {"payments/": {"read": 2, "write": 2}}
+        planned = plan_task_queue_partitions({"payments/": {"read": 8, "write": 8, "since": 0}}, targets, 1000)
+        self.assertEqual(planned, {"payments/": {"read": 8, "write": 2, "since": 1000}})
+
+        self.assertEqual(plan_task_queue_partitions(planned, targets, 1300), planned)
+        self.assertEqual(
+            plan_task_queue_partitions(planned, targets, 1300, force=["payments/"]),
+            {"payments/": {"read": 2, "write": 2, "since": 1300}},
+        )
+        self.assertEqual(
+            plan_task_queue_partitions(planned, targets, 1600),
+            {"payments/": {"read": 2, "write": 2, "since": 1600}},
+        )
+
+    def test_plan_partitions_back_to_default(self):
+        """Task queues without a target step back to the default, then are dropped."""
+        planned = plan_task_queue_partitions({"orders/": {"read": 8, "write": 8, "since": 0}}, {}, 1000)
+        self.assertEqual(planned, {"orders/": {"read": 8, "write": 4, "since": 1000}})
+        self.assertEqual(plan_task_queue_partitions(planned, {}, 1600), {})
+        # New task queues start from the default partitions.
+        self.assertEqual(
+            plan_task_queue_partitions({}, {"orders/": {"read": 2, "write": 2}}, 1000),
+            {"orders/": {"read": 4, "write": 2, "since": 1000}},
+        )
+
+    def test_render(self):
+        """Partitions are rendered as constrained read and write partitions."""
+        partitions = {"payments/checkout": {"read": 8, "write": 6}, "orders/": {"read": 2, "write": 2}}
+        context = dynamic_config_context(OPTIONS, partitions)
+        rendered = yaml.safe_load(rendering.render("dynamic_config.jinja", context))
+        self.assertEqual(
+            rendered["matching.numTaskqueueReadPartitions"],
+            [
+                {"value": 2, "constraints": {"namespace": "orders"}},
+                {"value": 8, "constraints": {"namespace": "payments", "taskQueueName": "checkout"}},
+            ],
+        )
+        self.assertEqual(
+            rendered["matching.numTaskqueueWritePartitions"],
+            [
+                {"value": 2, "constraints": {"namespace": "orders"}},
+                {"value": 6, "constraints": {"namespace": "payments", "taskQueueName": "checkout"}},
+            ],
+        )
+
+
+RATE_LIMITS = textwrap.dedent(
+    """
+    frontend:
+      rps: 2400
+      namespace-rps:
+        noisy: 50
+      namespace-burst-ratio: 1.5
+    history:
+      persistence-max-qps: 9000
+    visibility:
+      max-read-qps: 50
+    """
+)
+
+
+class TestRateLimits(TestCase):
+    """Unit tests for the rate limits."""
+
+    def test_parse(self):
+        """Structured limits are merged with the namespace RPS options."""
+        self.assertEqual(
+            parse_rate_limits(RATE_LIMITS, 2000, "namespaceA:100"),
+            {
+                "frontend.namespacerps": [
+                    {"value": 2000, "constraints": {}},
+                    {"value": 100, "constraints": {"namespace": "namespaceA"}},
+                    {"value": 50, "constraints": {"namespace": "noisy"}},
+                ],
+                "frontend.rps": [{"value": 2400, "constraints": {}}],
+                "frontend.namespaceBurstRatio": [{"value": 1.5, "constraints": {}}],
+                "history.persistenceMaxQPS": [{"value": 9000, "constraints": {}}],
+                "system.visibilityPersistenceMaxReadQPS": [{"value": 50, "constraints": {}}],
+            },
+        )
+        self.assertEqual(parse_rate_limits("", 0, ""), {})
+
+    def test_invalid(self):
+        """Invalid limits are rejected with the offending entry."""
+        invalid = {
+            ("history: {rps: 10}", ""): "unknown limit history.rps",
+            ("historyy: {persistence-max-qps: 10}", ""): "unknown section 'historyy'",
+            ("frontend: {rps: -1}", ""): "frontend.rps must be a positive integer",
+            ("frontend: {namespace-burst-ratio: high}", ""): "must be a positive number",
+            ("frontend: {namespace-rps: {a: 10}}", "a:5"): "namespace 'a' is also set in namespace-rps-limit",
+            ("", "namespaceA"): "namespace-rps-limit: invalid entry 'namespaceA'",
+            ("", "namespaceA:ten"): "namespace-rps-limit: invalid entry",
+            ("", "a:1|a:2"): "duplicate namespace 'a'",
+        }
+        for (raw, namespace_rps_limit), message in invalid.items():
+            with self.subTest(raw=raw, namespace_rps_limit=namespace_rps_limit), self.assertRaisesRegex(
+                ValueError, message
+            ):
+                parse_rate_limits(raw, 2000, namespace_rps_limit)
+
+    def test_persistence_max_qps(self):
+        """Per-role persistence limits are only rendered for the unit's services."""
+        options = {**OPTIONS, "history-persistence-max-qps": 9000, "matching-persistence-max-qps": 500}
+        rate_limits = dynamic_config_context(options, {}, ["history", "frontend"])["RATE_LIMITS"]
+        self.assertEqual(rate_limits["history.persistenceMaxQPS"], [{"value": 9000, "constraints": {}}])
+        self.assertNotIn("matching.persistenceMaxQPS", rate_limits)
+
+        options["rate-limits"] = "history: {persistence-max-qps: 100}"
+        for services in (["history"], ["frontend"]):
+            with self.subTest(services=services), self.assertRaisesRegex(
+                ValueError, "history-persistence-max-qps: .* is also set in rate-limits"
+            ):
+                dynamic_config_context(options, {}, services)
+        options.update({"rate-limits": "", "history-persistence-max-qps": -1})
+        with self.assertRaisesRegex(ValueError, "history-persistence-max-qps: must be positive"):
+            dynamic_config_context(options, {}, ["history"])
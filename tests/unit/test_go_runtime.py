@@ -0,0 +1,55 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+#
+# Learn more about testing at: https://juju.is/docs/sdk/testing
+
+
+"""Go runtime tuning unit tests."""
+
+from unittest import TestCase
+
+from go_runtime import (
+    go_runtime_env,
+    parse_cpu_limit,
+    parse_memory_limit,
+    validate_go_runtime_options,
+)
+
+OPTIONS = {"go-max-procs": 0, "go-memory-limit": "", "go-gc": ""}
+
+
+class TestGoRuntime(TestCase):
+    """Unit tests for the Go runtime tuning."""
+
+    def test_parse_limits(self):
+        """Both cgroup v1 and v2 limits are parsed, unlimited ones are None."""
+        self.assertEqual(parse_cpu_limit("250000 100000\n"), 2.5)
+        self.assertEqual(parse_cpu_limit("50000\n", "100000\n"), 0.5)
+        self.assertIsNone(parse_cpu_limit("max 100000\n"))
+        self.assertIsNone(parse_cpu_limit("-1\n", "100000\n"))
+        self.assertIsNone(parse_cpu_limit(""))
+        self.assertEqual(parse_memory_limit("4294967296\n"), 4294967296)
+        self.assertIsNone(parse_memory_limit("max\n"))
+        self.assertIsNone(parse_memory_limit("9223372036854771712\n"))
+
+    def test_env(self):
+        """The environment follows the container limits unless overridden."""
+        limits = {"cpu": 2.5, "memory": 4 * 2**30}
+        self.assertEqual(go_runtime_env(limits, OPTIONS), {"GOMAXPROCS": 2, "GOMEMLIMIT": "3686MiB"})
+        self.assertEqual(go_runtime_env({"cpu": 0.5, "memory": None}, OPTIONS), {"GOMAXPROCS": 1})
+        self.assertEqual(go_runtime_env({}, OPTIONS), {})
+        self.assertEqual(
+            go_runtime_env(limits, {"go-max-procs": 8, "go-memory-limit": "3GiB", "go-gc": "off"}),
+            {"GOMAXPROCS": 8, "GOMEMLIMIT": "3GiB", "GOGC": "off"},
+        )
+
+    def test_invalid(self):
+        """Invalid overrides are rejected."""
+        invalid = {
+            "go-max-procs": (-1, "must be >= 0"),
+            "go-memory-limit": ("3 GB", "must be a size in bytes"),
+            "go-gc": ("half", "must be a percentage or 'off'"),
+        }
+        for option, (value, message) in invalid.items():
+            with self.subTest(option=option), self.assertRaisesRegex(ValueError, message):
+                validate_go_runtime_options({**OPTIONS, option: value})
@@ -0,0 +1,69 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+#
+# Learn more about testing at: https://juju.is/docs/sdk/testing
+
+
+"""Container resources unit tests."""
+
+import subprocess  # nosec B404
+import sys
+from unittest import TestCase
+
+from k8s_resources import resource_requirements
+
+OPTIONS = {"cpu-request": "", "cpu-limit": "", "memory-request": "", "memory-limit": ""}
+
+
+class TestResourceRequirements(TestCase):
+    """Unit tests for the container resources."""
+
+    def test_service_defaults(self):
+        """Each service has its own defaults, which add up."""
+        self.assertEqual(
+            resource_requirements(["history"], OPTIONS),
+            {"requests": {"cpu": "1000m", "memory": "2048Mi"}, "limits": {"cpu": "4000m", "memory": "8192Mi"}},
+        )
+        self.assertEqual(
+            resource_requirements(["frontend", "worker"], OPTIONS),
+            {"requests": {"cpu": "750m", "memory": "768Mi"}, "limits": {"cpu": "3000m", "memory": "3072Mi"}},
+        )
+
+    def test_overrides(self):
+        """Options override the defaults of the services."""
+        options = {**OPTIONS, "cpu-request": "2", "memory-limit": "12Gi"}
+        self.assertEqual(
+            resource_requirements(["history"], options),
+            {"requests": {"cpu": "2000m", "memory": "2048Mi"}, "limits": {"cpu": "4000m", "memory": "12288Mi"}},
+        )
+
+    def test_quantity_suffixes(self):
+        """Decimal and binary suffixes are parsed like Kubernetes does."""
+        options = {"cpu-request": "0.25", "cpu-limit": "1500m", "memory-request": "1G", "memory-limit": "1.5Gi"}
+        self.assertEqual(
+            resource_requirements(["worker"], options),
+            {"requests": {"cpu": "250m", "memory": "953Mi"}, "limits": {"cpu": "1500m", "memory": "1536Mi"}},
+        )
+
+    def test_lightkube_not_imported(self):
+        """Computing the resources does not import lightkube."""
+        code = (
+            "import sys, k8s_resources; "
+            "k8s_resources.resource_requirements(['history'], dict.fromkeys(k8s_resources.RESOURCE_OPTIONS, '')); "
+            "print('lightkube' in sys.modules)"
+        )
+        output = subprocess.run(  # nosec B603
+            [sys.executable, "-c", code], capture_output=True, check=True, text=True
+        ).stdout
+        self.assertEqual(output.strip(), "False")
+
+    def test_invalid(self):
+        """Invalid quantities and requests above their limit are rejected."""
+        invalid = {
+            "cpu-request": ("two", "must be a Kubernetes quantity"),
+            "memory-limit": ("2GB", "must be a Kubernetes quantity"),
+            "cpu-limit": ("100m", "'cpu-request' must not exceed 'cpu-limit'"),
+        }
+        for option, (value, message) in invalid.items():
+            with self.subTest(option=option), self.assertRaisesRegex(ValueError, message):
+                resource_requirements(["history"], {**OPTIONS, option: value})
@@ -0,0 +1,104 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+#
+# Learn more about testing at: https://juju.is/docs/sdk/testing
+
+
+"""Logging and profiling unit tests."""
+
+import json
+import logging
+import os
+import tempfile
+from unittest import TestCase, mock
+
+import hook_metrics
+import log
+
+
+class Handler:
+    """A class with profiled event handlers.
+
+    Attrs:
+        container: profiled container of the handler.
+    """
+
+    def __init__(self):
+        """Construct."""
+        self.container = log.ProfiledContainer(mock.MagicMock())
+
+    @log.log_event_handler(logging.getLogger(__name__))
+    def _on_event(self, event):
+        """Make a couple of Pebble calls and an HTTP request.
+
+        Args:
+            event: ignored.
+        """
+        self.container.can_connect()
+        self.container.push("/path", "content")
+        self.container.name  # pylint: disable=pointless-statement
+        log.count_call("http_calls")
+
+
+class TestLog(TestCase):
+    """Unit tests for the event handler profiling."""
+
+    def setUp(self):
+        """Keep the metrics out of the environment's charm directory."""
+        patcher = mock.patch.dict(os.environ, {"JUJU_CHARM_DIR": ""})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_profile_logged(self):
+        """The profile of the handler is logged as JSON."""
+        with self.assertLogs(__name__, level="INFO") as logs:
+            Handler()._on_event(None)
+
+        self.assertEqual(logs.output[0], f"INFO:{__name__}:* running Handler._on_event")
+        profile = json.loads(logs.output[-1].split("* profile ", 1)[1])
+        self.assertEqual(profile["handler"], "Handler._on_event")
+        self.assertEqual(profile["pebble_calls"], 2)
+        self.assertEqual(profile["http_calls"], 1)
+        self.assertEqual(profile["relation_writes"], 0)
+        self.assertGreaterEqual(profile["wall_time_seconds"], 0)
+
+    def test_profiled_container(self):
+        """The profiled container forwards the calls to the container."""
+        container = mock.MagicMock()
+        container.exists.return_value = True
+        self.assertTrue(log.ProfiledContainer(container).exists("/path"))
+        container.exists.assert_called_once_with("/path")
+
+
+class TestHookMetrics(TestCase):
+    """Unit tests for the event handler metrics."""
+
+    def test_metrics_textfile(self):
+        """The last sample of every handler is kept in the agent directory."""
+        with tempfile.TemporaryDirectory() as agent_dir, mock.patch.dict(
+            os.environ, {"JUJU_CHARM_DIR": os.path.join(agent_dir, "charm")}
+        ):
+            path = hook_metrics.metrics_path()
+            self.assertEqual(path, os.path.join(agent_dir, hook_metrics.HOOK_METRICS_FILE))
+            hook_metrics.write_sample(
+                path,
+                "Other._on_event",
+                {
+                    "wall_time_seconds": 1.5,
+                    "pebble_calls": 3,
+                    "relation_reads": 1,
+                    "relation_writes": 0,
+                    "http_calls": 0,
+                },
+            )
+            Handler()._on_event(None)
+            Handler()._on_event(None)
+
+            with open(path, encoding="utf-8") as metrics_file:
+                lines = metrics_file.read().splitlines()
+
+        self.assertIn("# TYPE temporal_charm_handler_wall_time_seconds gauge", lines)
+        self.assertIn('temporal_charm_handler_wall_time_seconds{handler="Other._on_event"} 1.5', lines)
+        self.assertIn('temporal_charm_handler_pebble_calls{handler="Other._on_event"} 3', lines)
+        self.assertIn('temporal_charm_handler_pebble_calls{handler="Handler._on_event"} 2', lines)
+        self.assertEqual(len([line for line in lines if 'handler="Handler._on_event"' in line]), 5)
@@ -0,0 +1,60 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+#
+# Learn more about testing at: https://juju.is/docs/sdk/testing
+
+
+"""Rendering unit tests."""
+
+import tempfile
+from unittest import TestCase, mock
+
+import rendering
+from dynamic_config import parse_rate_limits
+
+CONTEXT = {
+    "RATE_LIMITS": parse_rate_limits("", 500, "namespaceA:50"),
+    "LONG_POLL_INTERVAL": "50s",
+}
+
+
+class TestRendering(TestCase):
+    """Unit tests for template rendering."""
+
+    def setUp(self):
+        """Start every test with an empty template cache."""
+        rendering.get_environment.cache_clear()
+        rendering.get_template.cache_clear()
+        self.addCleanup(rendering.get_environment.cache_clear)
+        self.addCleanup(rendering.get_template.cache_clear)
+
+    def test_templates_are_cached(self):
+        """Templates are only loaded once per process."""
+        with mock.patch.object(rendering, "COMPILED_TEMPLATES_DIR", "/nonexistent"):
+            first = rendering.render("dynamic_config.jinja", CONTEXT)
+            environment = rendering.get_environment()
+            with mock.patch.object(environment.loader, "get_source") as get_source:
+                second = rendering.render("dynamic_config.jinja", CONTEXT)
+                get_source.assert_not_called()
+        self.assertEqual(first, second)
+
+    def test_precompiled_templates(self):
+        """Precompiled templates render the same output as the raw ones."""
+        expected = rendering.render("dynamic_config.jinja", CONTEXT)
+        rendering.get_environment.cache_clear()
+        rendering.get_template.cache_clear()
+
+        with tempfile.TemporaryDirectory() as compiled_dir:
+            rendering.compile_templates(compiled_dir)
+            with mock.patch.object(rendering, "COMPILED_TEMPLATES_DIR", compiled_dir):
+                self.assertIsInstance(rendering.get_environment().loader, rendering.ModuleLoader)
+                self.assertEqual(rendering.render("dynamic_config.jinja", CONTEXT), expected)
+
+    def test_stale_precompiled_templates(self):
+        """Compiled templates are ignored once the templates change."""
+        with tempfile.TemporaryDirectory() as compiled_dir:
+            rendering.compile_templates(compiled_dir)
+            with mock.patch.object(rendering, "COMPILED_TEMPLATES_DIR", compiled_dir), mock.patch.object(
+                rendering, "templates_digest", return_value="edited"
+            ):
+                self.assertIsInstance(rendering.get_environment().loader, rendering.FileSystemLoader)
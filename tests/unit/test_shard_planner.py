@@ -0,0 +1,42 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+#
+# Learn more about testing at: https://juju.is/docs/sdk/testing
+
+
+"""History shard planner unit tests."""
+
+from unittest import TestCase
+
+from shard_planner import is_power_of_two, plan_history_shards
+
+
+class TestShardPlanner(TestCase):
+    """Unit tests for the history shard planning."""
+
+    def test_is_power_of_two(self):
+        """Only positive powers of 2 are valid shard counts."""
+        for value in (1, 2, 512, 4096):
+            self.assertTrue(is_power_of_two(value))
+        for value in (0, -4, 6, 1000, None, "512"):
+            self.assertFalse(is_power_of_two(value))
+
+    def test_plan(self):
+        """The shards grow with the load and the history units, as a power of 2."""
+        self.assertEqual(plan_history_shards(10, 0, 2)["shards"], 512)
+        # 3000 transitions/s, times the growth factor, at 20 per shard.
+        self.assertEqual(plan_history_shards(0, 3000, 8)["shards"], 1024)
+        # The start rate is a lower bound of the transition rate.
+        self.assertEqual(plan_history_shards(1000, 100, 8)["shards"], 1024)
+        self.assertEqual(plan_history_shards(0, 0, 16)["shards"], 1024)
+
+    def test_warnings(self):
+        """Unhealthy ratios and unreachable loads are reported."""
+        plan = plan_history_shards(0, 100000, 4)
+        self.assertEqual(plan["shards"], 16384)
+        self.assertRegex(plan["warnings"][0], "needs more than 16384 shards")
+        self.assertRegex(plan["warnings"][1], "4096 shards per history unit is above 1024")
+        self.assertEqual(plan_history_shards(0, 0, 4)["warnings"], [])
+
+        with self.assertRaisesRegex(ValueError, "history-units must be >= 1"):
+            plan_history_shards(10, 0, 0)
@@ -9,7 +9,7 @@
 import json
 from unittest import TestCase
 
-from state import State
+from state import State, TransactionalState
 
 
 class TestState(TestCase):
@@ -56,15 +56,178 @@ class TestState(TestCase):
         self.assertFalse(state.is_ready())
 
 
-def make_state(data):
+class TestTransactionalState(TestCase):
+    """Unit tests for the transactional state.
+
+    Attrs:
+        maxDiff: Specifies max difference shown by failed tests.
+    """
+
+    maxDiff = None
+
+    def test_get(self):
+        """Values are decoded once and then served from the cache."""
+        data = CountingDict({"foo": json.dumps({"bar": 1})})
+        state = make_state(data, TransactionalState)
+        self.assertEqual(state.foo, {"bar": 1})
+        self.assertEqual(state.foo, {"bar": 1})
+        self.assertIsNone(state.bad)
+        self.assertEqual(data.reads, 2)
+
+    def test_set_and_commit(self):
+        """Assignments are only written to the relation on commit."""
+        data = CountingDict({"foo": json.dumps("bar")})
+        state = make_state(data, TransactionalState)
+        state.foo = 42
+        state.foo = 43
+        value = [1, 2]
+        state.list = value
+        value.append(3)
+        self.assertEqual(state.foo, 43)
+        self.assertEqual(state.list, [1, 2])
+        self.assertEqual(data, {"foo": '"bar"'})
+
+        self.assertEqual(state.commit(), 2)
+        self.assertEqual(data, {"foo": "43", "list": "[1, 2]"})
+        # Both keys are written with a single relation-set.
+        self.assertEqual(data.writes, 1)
+
+        # Nothing is written when nothing changed.
+        state.foo = 43
+        self.assertEqual(state.commit(), 0)
+        self.assertEqual(data.writes, 1)
+
+    def test_values_are_copies(self):
+        """Changing a returned value does not change the state until assigned."""
+        data = CountingDict({"foo": json.dumps({"bar": [1]})})
+        state = make_state(data, TransactionalState)
+        state.foo["bar"].append(2)
+        self.assertEqual(state.foo, {"bar": [1]})
+        self.assertEqual(state.commit(), 0)
+
+        foo = state.foo
+        foo["bar"].append(2)
+        state.foo = foo
+        state.commit()
+        self.assertEqual(data, {"foo": '{"bar": [1, 2]}'})
+
+    def test_del(self):
+        """Deletions are only applied to the relation on commit."""
+        data = CountingDict({"foo": json.dumps("bar"), "answer": json.dumps(42)})
+        state = make_state(data, TransactionalState)
+        del state.foo
+        del state.missing
+        self.assertIsNone(state.foo)
+        self.assertIn("foo", data)
+
+        self.assertEqual(state.commit(), 1)
+        self.assertEqual(data, {"answer": "42"})
+        state.foo = "again"
+        self.assertEqual(state.foo, "again")
+
+    def test_hook_reads_and_writes(self):
+        """A typical hook decodes and writes each key at most once."""
+        counts = {}
+        for state_class in (State, TransactionalState):
+            data = CountingDict(
+                {
+                    "database_connections": json.dumps({"db": {"host": "a"}, "visibility": {"host": "b"}}),
+                    "openfga": json.dumps({"store_id": "store"}),
+                    "s3": json.dumps({"region": "region"}),
+                }
+            )
+            state = make_state(data, state_class)
+            simulate_hook(state)
+            if isinstance(state, TransactionalState):
+                state.commit()
+            counts[state_class.__name__] = (data.reads, data.writes)
+            self.assertEqual(json.loads(data["num_history_shards"]), 4)
+            self.assertEqual(json.loads(data["database_connections"])["db"], {"host": "c"})
+
+        # One read per accessed key, plus one raw comparison per dirty key on commit.
+        self.assertEqual(counts, {"State": (15, 2), "TransactionalState": (6, 1)})
+
+
+def simulate_hook(state):
+    """Access the state like `_update` and `_validate` do during a hook.
+
+    Args:
+        state: state object to access.
+    """
+    if state.num_history_shards is None:
+        state.num_history_shards = 4
+    for _ in range(2):
+        state.num_history_shards  # pylint: disable=pointless-statement
+    for _ in range(4):
+        state.database_connections  # pylint: disable=pointless-statement
+    for _ in range(3):
+        state.openfga  # pylint: disable=pointless-statement
+        state.s3  # pylint: disable=pointless-statement
+    database_connections = state.database_connections
+    database_connections["db"] = {"host": "c"}
+    state.database_connections = database_connections
+    state.database_connections  # pylint: disable=pointless-statement
+
+
+class CountingDict(dict):
+    """A relation databag that counts reads and writes.
+
+    Attrs:
+        reads: number of values read.
+        writes: number of values written.
+    """
+
+    reads = 0
+    writes = 0
+
+    def get(self, key, default=None):
+        """Get a value.
+
+        Args:
+            key: key to read.
+            default: value returned when the key is missing.
+
+        Returns:
+            The stored value.
+        """
+        self.reads += 1
+        return super().get(key, default)
+
+    def update(self, *args, **kwargs):
+        """Update values, deleting those set to an empty string like relation-set.
+
+        Args:
+            args: mapping of values to write.
+            kwargs: values to write.
+        """
+        self.writes += 1
+        for key, value in dict(*args, **kwargs).items():
+            if value == "":
+                self.pop(key, None)
+            else:
+                super().__setitem__(key, value)
+
+    def __setitem__(self, key, value):
+        """Set a value.
+
+        Args:
+            key: key to write.
+            value: value to write.
+        """
+        self.writes += 1
+        super().__setitem__(key, value)
+
+
+def make_state(data, state_class=State):
     """Create state object.
 
     Args:
         data: Data to be included in state.
+        state_class: State class to instantiate.
 
     Returns:
         State object with data.
     """
     app = "myapp"
     rel = type("Rel", (), {"data": {app: data}})()
-    return State(app, lambda: rel)
+    return state_class(app, lambda: rel)